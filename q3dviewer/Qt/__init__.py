@@ -25,6 +25,8 @@ import os
 
 Q3D_QT_IMPL = os.environ.get('Q3D_QT_IMPL')
 Q3D_DEBUG = os.environ.get('Q3D_DEBUG')
+Q3D_CONTINUOUS = os.environ.get('Q3D_CONTINUOUS')
+Q3D_PROFILE = os.environ.get('Q3D_PROFILE')
 
 if Q3D_QT_IMPL not in ['PyQt5', 'PySide2', 'PySide6']:
     Q3D_QT_IMPL = None
@@ -6,6 +6,7 @@ from q3dviewer.glwidget import *
 from q3dviewer.viewer import *
 from q3dviewer.base_item import *
 from q3dviewer.base_glwidget import *
+from q3dviewer.offscreen import OffscreenRenderer
 t3 = time.time()
 
 from q3dviewer.Qt import Q3D_DEBUG
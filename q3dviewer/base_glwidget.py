@@ -6,8 +6,10 @@ Distributed under MIT license. See LICENSE for more information.
 from OpenGL.GL import *
 from math import radians, tan
 import numpy as np
-from q3dviewer.Qt import QtCore, QtGui
+from q3dviewer.Qt import QtCore, QtGui, Q3D_PROFILE
 from q3dviewer.utils.maths import frustum, euler_to_matrix, makeT
+from q3dviewer.utils.gl_helper import GLState, CameraBlock
+from q3dviewer.utils.profiler import FrameProfiler
 from q3dviewer.Qt.QtWidgets import QOpenGLWidget
 
 
@@ -29,6 +31,15 @@ class BaseGLWidget(QOpenGLWidget):
         self.need_recalc_view = True
         self.view_matrix = self.get_view_matrix()
         self.projection_matrix = self.get_projection_matrix()
+        # the scene is painted only when a redraw is requested (or keys are held),
+        # continuous paints every update, e.g. for profiling.
+        self.redraw_requested = True
+        self.continuous = False
+        self.gl_state = GLState()
+        self.camera_block = CameraBlock()
+        # the time and the gpu work of each item, see set_profiling.
+        self.profiler = FrameProfiler(enabled=Q3D_PROFILE is not None)
+        self.profiler_overlay = None
 
     def keyPressEvent(self, ev: QtGui.QKeyEvent):
         if ev.key() == QtCore.Qt.Key_Up or  \
@@ -62,12 +73,44 @@ class BaseGLWidget(QOpenGLWidget):
     def reset(self):
         pass
 
+    def request_redraw(self):
+        """
+        Mark the scene as changed, so it is painted at the next update.
+        It only sets a flag, so it can be called from any thread.
+        """
+        self.redraw_requested = True
+
+    def set_continuous(self, continuous):
+        """
+        Paint at every update even if nothing changed.
+        """
+        self.continuous = continuous
+        self.request_redraw()
+
+    def set_profiling(self, enabled, overlay=True):
+        """
+        Profile the frames (see FrameProfiler), and show the last one on
+        the glwidget if overlay. It is enabled by the Q3D_PROFILE environment
+        variable too. The overlay is updated when the scene is painted, set
+        continuous to watch it.
+        """
+        self.profiler.enabled = enabled
+        self.profiler.overlay = overlay
+        self.request_redraw()
+
+    def item_name(self, item):
+        """
+        The name of the item in the profiler.
+        """
+        return '%s%d' % (item.__class__.__name__, item._id)
+
     def add_item(self, item):
         """
         Add the item to the glwidget.
         """
         self.items.append(item)
         item.set_glwidget(self)
+        self.request_redraw()
         
     def remove_item(self, item):
         """
@@ -75,6 +118,7 @@ class BaseGLWidget(QOpenGLWidget):
         """
         self.items.remove(item)
         item.set_glwidget(None)
+        self.request_redraw()
 
     def clear(self):
         """
@@ -83,6 +127,7 @@ class BaseGLWidget(QOpenGLWidget):
         for item in self.items:
             item.set_glwidget(None)
         self.items = []
+        self.request_redraw()
         
     def initializeGL(self):
         """
@@ -103,6 +148,7 @@ class BaseGLWidget(QOpenGLWidget):
     def set_view_matrix(self, view_matrix):
         self.view_matrix = view_matrix
         self.need_recalc_view = False
+        self.request_redraw()
 
     def mouseReleaseEvent(self, ev):
         if hasattr(self, 'mousePos'):
@@ -111,12 +157,14 @@ class BaseGLWidget(QOpenGLWidget):
     def set_dist(self, dist):
         self.dist = dist
         self.need_recalc_view = True
+        self.request_redraw()
 
     def update_dist(self, delta):
         self.dist += delta
         if self.dist < 0.1:
             self.dist = 0.1
         self.need_recalc_view = True
+        self.request_redraw()
 
     def wheelEvent(self, ev):
         delta = ev.angleDelta().x()
@@ -142,6 +190,7 @@ class BaseGLWidget(QOpenGLWidget):
         self.center = twc - Rwc_new @ tco
         self.euler = new_euler
         self.need_recalc_view = True
+        self.request_redraw()
 
     def mouseMoveEvent(self, ev):
         lpos = ev.localPos()
@@ -167,13 +216,19 @@ class BaseGLWidget(QOpenGLWidget):
     def set_center(self, center):
         self.center = center
         self.need_recalc_view = True
+        self.request_redraw()
 
     def paintGL(self):
+        self.redraw_requested = False
+        self.gl_state.new_frame()
+        self.profiler.begin_frame()
         # if the camera is moved, update the model view matrix.
         if self.need_recalc_view:
             self.view_matrix = self.get_view_matrix()
             self.need_recalc_view = False
         self.update_model_view()
+        self.camera_block.update(self.view_matrix, self.projection_matrix,
+                                 self.current_width(), self.current_height())
 
         # set the background color
         bgcolor = self.color
@@ -188,26 +243,52 @@ class BaseGLWidget(QOpenGLWidget):
                 after the widget is shown, so we need to initialize it here.
                 """
                 item.initialize()
-            glMatrixMode(GL_MODELVIEW)
-            glPushMatrix()
-            glPushAttrib(GL_ALL_ATTRIB_BITS)
-            try:
-                item.paint()
-            finally:
-                glPopAttrib()
-                glMatrixMode(GL_MODELVIEW)
-                glPopMatrix()
+                self.gl_state.invalidate()
+            if self.profiler.enabled:
+                self.profiler.begin_item(self.item_name(item))
+                self.paint_item(item)
+                self.profiler.end_item()
+            else:
+                self.paint_item(item)
+        self.gl_state.restore_defaults()
         
         # Show center as a point if updated by mouse move event
         if self.enable_show_center and self.show_center:
             point_size = np.clip((self.get_K()[0, 0] / self.dist), 10, 100)
-            glPointSize(point_size)
+            self.gl_state.point_size(point_size)
             glBegin(GL_POINTS)
             glColor3f(1.0, 0.0, 0.0)  # Red color for the center point
             glVertex3f(*self.center)
             glEnd()
             self.show_center = False
+            # paint once more to hide the center point.
+            self.request_redraw()
+        self.profiler.end_frame(self.gl_state.issued)
+        if self.profiler.enabled and self.profiler.overlay:
+            self.paint_profiler_overlay()
+
+    def paint_profiler_overlay(self):
+        """
+        Show the last profiled frame on the top left of the glwidget.
+        """
+        if self.profiler_overlay is None:
+            from q3dviewer.custom_items.text_item import Text2DItem
+            font = QtGui.QFont('Monospace', 9)
+            font.setStyleHint(QtGui.QFont.StyleHint.TypeWriter)
+            self.profiler_overlay = Text2DItem(pos=(10, 20), font=font, color='lime')
+            self.profiler_overlay.set_glwidget(self)
+        self.profiler_overlay.text = self.profiler.summary()
+        self.profiler_overlay.paint()
+        self.gl_state.restore_defaults()
     
+    def paint_item(self, item):
+        """
+        Paint an item from the default state, only the changed state is set
+        again (see GLState).
+        """
+        self.gl_state.restore_defaults()
+        item.paint()
+
     def update_movement(self):
         """
         Update the movement of the camera based on the active keys.
@@ -287,13 +368,20 @@ class BaseGLWidget(QOpenGLWidget):
     def set_euler(self, euler):
         self.euler = euler
         self.need_recalc_view = True
+        self.request_redraw()
 
     def set_color(self, color):
         self.color = color
+        self.request_redraw()
 
     def update(self):
+        """
+        Called by the update timer of the viewer, paint the scene only
+        if it is changed, some keys are held, or continuous is set.
+        """
         self.update_movement()
-        super().update()
+        if self.continuous or self.redraw_requested or self.active_keys:
+            super().update()
 
     def update_model_projection(self):
         glMatrixMode(GL_PROJECTION)
@@ -331,18 +419,22 @@ class BaseGLWidget(QOpenGLWidget):
         self.euler[1] = (self.euler[1] + np.pi) % (2 * np.pi) - np.pi
         self.euler[0] = np.clip(self.euler[0], 0, np.pi)
         self.need_recalc_view = True
+        self.request_redraw()
 
     def translate(self, trans):
         self.center += trans
         self.need_recalc_view = True
+        self.request_redraw()
 
     def change_show_center(self, state):
         self.enable_show_center = state
+        self.request_redraw()
 
     def resizeEvent(self, event):
         super().resizeEvent(event)
         self.projection_matrix = self.get_projection_matrix()
         self.update_model_projection()
+        self.request_redraw()
 
     def capture_frame(self):
         self.makeCurrent()  # Ensure the OpenGL context is current
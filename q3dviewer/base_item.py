@@ -22,15 +22,26 @@ class BaseItem(QObject):
         
     def glwidget(self):
         return self._glwidget
+
+    def request_redraw(self):
+        """
+        Ask the glwidget to paint the item again, call it when the item is changed.
+        It can be called from any thread.
+        """
+        if self._glwidget is not None:
+            self._glwidget.request_redraw()
     
     def hide(self):
         self._visible = False
+        self.request_redraw()
         
     def show(self):
         self._visible = True
+        self.request_redraw()
     
     def set_visible(self, vis):
         self._visible = vis
+        self.request_redraw()
         
     def visible(self):
         return self._visible
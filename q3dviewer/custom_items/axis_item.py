@@ -52,9 +52,11 @@ class AxisItem(BaseItem):
 
     def set_size(self, size):
         self.size = size
+        self.request_redraw()
 
     def set_width(self, width):
         self.width = width
+        self.request_redraw()
         
     def set_transform(self, transform):
         """
@@ -62,9 +64,11 @@ class AxisItem(BaseItem):
         """
         self.T = transform
         self.need_update_setting = True
+        self.request_redraw()
 
     def paint(self):
-        glLineWidth(self.width)
+        state = self.glwidget().gl_state
+        state.line_width(self.width)
 
         glPushMatrix()
         glMultMatrixf(self.T.T)
@@ -76,9 +80,10 @@ class AxisItem(BaseItem):
         glColorPointer(3, GL_FLOAT, 0, self.colors)
 
         glDrawArrays(GL_LINES, 0, len(self.vertices))
+        self.glwidget().profiler.count_draw()
 
         glDisableClientState(GL_VERTEX_ARRAY)
         glDisableClientState(GL_COLOR_ARRAY)
         glPopMatrix()
 
-        glLineWidth(1)
+        state.line_width(1)
@@ -6,6 +6,7 @@ Distributed under MIT license. See LICENSE for more information.
 from q3dviewer.custom_items.cloud_item import CloudItem
 from pathlib import Path
 import os
+import numpy as np
 from q3dviewer.Qt.QtWidgets import QPushButton, QLabel, QLineEdit, QMessageBox
 from q3dviewer.utils.cloud_io import save_pcd, save_ply, save_e57, save_las, load_pcd, load_ply, load_e57, load_las
 
@@ -27,9 +28,14 @@ class CloudIOItem(CloudItem):
             - 'SQUARE': Draw each point as a square in 3D space.
             - 'SPHERE': Draw each point as a sphere in 3D space.
         depth_test (bool): Whether to enable depth testing. If True, points closer to the camera will appear in front of farther ones.
+        cache_dir (str): The directory of the q3d cache. If set, a loaded file is saved as a q3d file in it,
+            and the next load of the same file reads the cache instead of parsing the file.
     """
-    def __init__(self, **kwargs):
+    def __init__(self, cache_dir=None, **kwargs):
         super().__init__(**kwargs)
+        # if set, a loaded file is cached as a q3d file in cache_dir,
+        # and it is memory mapped from the cache when it is opened again.
+        self.cache_dir = cache_dir
         self.save_path = str(Path(os.path.expanduser("~"), "data.pcd"))
 
     def add_setting(self, layout):
@@ -64,6 +70,9 @@ class CloudIOItem(CloudItem):
         elif self.save_path.endswith(".las"):
             from q3dviewer.utils.cloud_io import save_las
             func = save_las
+        elif self.save_path.endswith(".q3d"):
+            from q3dviewer.utils.cloud_io import save_q3d
+            func = save_q3d
         elif self.save_path.endswith(".tif") or self.save_path.endswith(".tiff"):
             print("Do not support save as tif type!")
         else:
@@ -79,23 +88,139 @@ class CloudIOItem(CloudItem):
 
     def load(self, file, append=False):
         # print("Try to load %s ..." % file)
-        if file.endswith(".pcd"):
-            from q3dviewer.utils.cloud_io import load_pcd
-            cloud = load_pcd(file)
-        elif file.endswith(".ply"):
-            from q3dviewer.utils.cloud_io import load_ply
-            cloud = load_ply(file)
-        elif file.endswith(".e57"):
-            from q3dviewer.utils.cloud_io import load_e57
-            cloud = load_e57(file)
-        elif file.endswith(".las"):
-            from q3dviewer.utils.cloud_io import load_las
-            cloud = load_las(file)
+        from q3dviewer.utils.cloud_io import load_cloud, cache_cloud, load_q3d, read_q3d_info
+        q3d_file = file if file.lower().endswith(".q3d") else None
+        if q3d_file is None and self.cache_dir is not None:
+            try:
+                q3d_file = cache_cloud(file, self.cache_dir, lod=self.lod)
+            except OSError as e:
+                print("Failed to cache %s: %s" % (file, e))
+        lod_nodes = None
+        if q3d_file is not None:
+            cloud = load_q3d(q3d_file)
+            if self.lod:
+                lod_nodes = read_q3d_info(q3d_file)['lod_nodes']
         else:
+            cloud = load_cloud(file)
+        if cloud is None:
             print("Not supported file type.")
             return
-        self.set_data(data=cloud, append=append)
+        self.set_data(data=cloud, append=append, lod_nodes=lod_nodes)
+        self.update_color_mode(cloud)
+        return cloud
+
+    def load_stream(self, file, append=False, progress=None, chunk_size=1000000):
+        """
+        Load a cloud file chunk by chunk, each chunk is shown as soon as it is loaded.
+        Only las/laz, pcd and q3d files (including the q3d cache) are streamed,
+        other files are loaded at once.
+        Args:
+            progress: called as progress(loaded_points, total_points, center) after each chunk,
+                where center is the mean of the points loaded so far.
+        Returns:
+            the center of the loaded points, or None if the file is not loaded.
+        """
+        from q3dviewer.utils.cloud_io import q3d_cache_path, load_q3d, Q3DWriter
+        lower = file.lower()
+        writer = None
+        cache = None
+        if self.cache_dir is not None and lower.endswith((".las", ".laz", ".pcd")):
+            cache = q3d_cache_path(file, self.cache_dir)
+            if os.path.exists(cache):
+                file = cache
+                lower = file.lower()
+        if lower.endswith(".q3d"):
+            q3d_cloud = load_q3d(file)
+            total = q3d_cloud.shape[0]
+            chunks = (q3d_cloud[i:i + chunk_size] for i in range(0, total, chunk_size))
+        elif lower.endswith((".las", ".laz")):
+            from q3dviewer.utils.cloud_io import iter_las, las_point_count
+            total = las_point_count(file)
+            chunks = iter_las(file, chunk_size)
+        elif lower.endswith(".pcd"):
+            from q3dviewer.utils.cloud_io import iter_pcd, read_pcd_header
+            total = read_pcd_header(file)['points']
+            chunks = iter_pcd(file, chunk_size)
+        else:
+            cloud = self.load(file, append=append)
+            if cloud is None:
+                return None
+            center = np.nanmean(cloud['xyz'].astype(np.float64), axis=0)
+            if progress is not None:
+                progress(cloud.shape[0], cloud.shape[0], center)
+            return center
+
+        if cache is not None and not lower.endswith(".q3d"):
+            # write the cache while streaming
+            try:
+                os.makedirs(os.path.dirname(cache), exist_ok=True)
+                writer = Q3DWriter(cache)
+            except OSError as e:
+                print("Failed to cache %s: %s" % (file, e))
+
+        xyz_sum = np.zeros(3)
+        num = 0
+        loaded = 0
+        try:
+            for i, cloud in enumerate(chunks):
+                if writer is not None:
+                    writer.write(cloud)
+                if i > 0:
+                    # do not run ahead of the renderer, the waiting chunks would pile up.
+                    self.wait_for_upload(timeout=1.0)
+                else:
+                    self.update_color_mode(cloud)
+                self.set_data(data=cloud, append=(append or i > 0))
+                xyz = cloud['xyz'].astype(np.float64)
+                valid = np.isfinite(xyz).all(axis=1)
+                xyz_sum += xyz[valid].sum(axis=0)
+                num += np.count_nonzero(valid)
+                loaded += cloud.shape[0]
+                if progress is not None:
+                    progress(loaded, total, xyz_sum / max(num, 1))
+        except BaseException:
+            if writer is not None:
+                writer.abort()
+            raise
+        if writer is not None:
+            writer.close()
+        return xyz_sum / max(num, 1)
+
+    def load_files(self, files, append=False, progress=None, max_workers=None,
+                   ordered=False, use_process=False):
+        """
+        Load many cloud files concurrently (see cloud_io.iter_clouds),
+        each cloud is shown as soon as it is loaded.
+        Args:
+            progress: called as progress(finished_files, total_files, file, center) after each file,
+                where center is the mean of the points loaded so far.
+        Returns:
+            the center of the loaded points.
+        """
+        from q3dviewer.utils.cloud_io import iter_clouds
+        xyz_sum = np.zeros(3)
+        num = 0
+        loaded = 0
+        for i, (index, cloud, cloud_sum, cloud_num) in enumerate(iter_clouds(
+                files, max_workers=max_workers, ordered=ordered,
+                use_process=use_process, cache_dir=self.cache_dir)):
+            if cloud is not None:
+                if loaded > 0:
+                    # do not run ahead of the renderer, the waiting clouds would pile up.
+                    self.wait_for_upload(timeout=1.0)
+                else:
+                    self.update_color_mode(cloud)
+                self.set_data(data=cloud, append=(append or loaded > 0))
+                xyz_sum += cloud_sum
+                num += cloud_num
+                loaded += 1
+            if progress is not None:
+                progress(i + 1, len(files), files[index], xyz_sum / max(num, 1))
+        return xyz_sum / max(num, 1)
 
+    def update_color_mode(self, cloud):
+        if cloud.shape[0] == 0:
+            return
         has_intensity = cloud['irgb'][0] & 0xff000000 > 0
         has_rgb = cloud['irgb'][0] & 0x00ffffff > 0
 
@@ -106,7 +231,5 @@ class CloudIOItem(CloudItem):
         else:
             self.set_color_mode('FLAT')
 
-        return cloud
-
     def set_path(self, path):
         self.save_path = path
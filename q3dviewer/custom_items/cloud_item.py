@@ -10,10 +10,14 @@ from OpenGL.GL import *
 from OpenGL.GL import shaders
 
 import threading
+import ctypes
 import os
 from q3dviewer.Qt.QtWidgets import QLabel, QLineEdit, QDoubleSpinBox, QSpinBox, QComboBox, QCheckBox
 from q3dviewer.utils.range_slider import RangeSlider
 from q3dviewer.utils import set_uniform
+from q3dviewer.utils.gl_helper import compile_program, resize_buffer, resize_persistent_buffer
+from q3dviewer.utils.octree import build_lod, select_lod_nodes, lod_node_type
+from q3dviewer.utils.maths import frustum_planes, aabb_in_frustum
 from q3dviewer.utils import text_to_rgba
 from q3dviewer.Qt import Q3D_DEBUG
 
@@ -38,11 +42,20 @@ class CloudItem(BaseItem):
             - 'SQUARE': Draw each point as a square in 3D space.
             - 'SPHERE': Draw each point as a sphere in 3D space.
         depth_test (bool): Whether to enable depth testing. If True, points closer to the camera will appear in front of farther ones.
+        persistent_map (bool): If True, the VBO is allocated with immutable storage and kept persistently mapped,
+            so appended points are written directly into GPU-visible memory (requires OpenGL 4.4).
+        lod (bool): If True, the points are organized in a level-of-detail octree, and only the nodes
+            whose projected size is large enough are drawn, up to `point_budget` points per frame.
+            Each set_data call builds its own octree, so it works best with a few large point sets.
+        point_budget (int): The maximum number of points drawn per frame when `lod` is enabled.
     """
     def __init__(self, size, alpha, 
                  color_mode='I', 
                  color='white', 
-                 point_type='PIXEL'):
+                 point_type='PIXEL',
+                 persistent_map=False,
+                 lod=False,
+                 point_budget=10000000):
         super().__init__()
         self.STRIDE = 16  # stride of cloud array
         self.valid_buff_top = 0
@@ -51,6 +64,8 @@ class CloudItem(BaseItem):
         self.size = size
         self.point_type = point_type
         self.mutex = threading.Lock()
+        self.uploaded = threading.Event()
+        self.uploaded.set()
         self.data_type = [('xyz', '<f4', (3,)), ('irgb', '<u4')]
         self.color = color
         try:
@@ -62,6 +77,37 @@ class CloudItem(BaseItem):
         self.point_type_table = {'PIXEL': 0, 'SQUARE': 1, 'SPHERE': 2}
         self.color_mode = self.mode_table[color_mode]
         self.CAPACITY = 10000000  # 10MB * 3 (x,y,z, color) * 4
+        # the capacity grows geometrically, so appending is amortized O(1).
+        # set growth_factor <= 1 to grow by fixed CAPACITY steps.
+        self.growth_factor = 2.0
+        self.persistent_map = persistent_map
+        self.mapped_ptr = None
+        self.draw_fence = None
+        self.lod = lod
+        self.point_budget = point_budget
+        self.lod_spacing = 1.0  # target point spacing in pixels
+        self.lod_nodes = np.empty((0), lod_node_type)
+        self.wait_lod_nodes = []
+        self.need_build_lod = False
+        # the octree is (re)built by the lod thread, the points are drawn
+        # without it until it is ready. every append adds a subtree, the
+        # last half of them is merged when there are more than MAX_LOD_TREES.
+        self.MAX_LOD_TREES = 16
+        self.lod_thread = None
+        self.lod_result = None
+        self.lod_epoch = 0  # changed when the uploaded points are replaced
+        self.lod_ranges = None
+        self.lod_view = None
+        self.drawn_points = 0
+        # the vbo is split into chunks of the append stream,
+        # chunks outside the view frustum are not drawn.
+        self.CHUNK_SIZE = 65536
+        self.chunk_bmin = np.empty((0, 3), np.float32)
+        self.chunk_bmax = np.empty((0, 3), np.float32)
+        self.chunk_ranges = None
+        self.chunk_view = None
+        self.culled_chunks = 0
+        self.drawn_chunks = 0
         self.vmin = 0
         self.vmax = 255
         self.buff = np.empty((0), self.data_type)
@@ -124,10 +170,24 @@ class CloudItem(BaseItem):
         self.slider_v.rangeChanged.connect(self._on_range)
         layout.addWidget(self.slider_v)
 
+        checkbox_lod = QCheckBox("Level of Detail")
+        checkbox_lod.setChecked(self.lod)
+        checkbox_lod.toggled.connect(self.set_lod)
+        layout.addWidget(checkbox_lod)
+
+        box_budget = QSpinBox()
+        box_budget.setPrefix("Point Budget (M): ")
+        box_budget.setRange(1, 1000)
+        box_budget.setValue(max(self.point_budget // 1000000, 1))
+        box_budget.valueChanged.connect(
+            lambda v: self.set_point_budget(v * 1000000))
+        layout.addWidget(box_budget)
+
     def _on_range(self, lower, upper):
         self.vmin = lower
         self.vmax = upper
         self.need_update_setting = True
+        self.request_redraw()
 
     def _on_color_mode(self, index):
         self.color_mode = index
@@ -141,6 +201,7 @@ class CloudItem(BaseItem):
             self.slider_v.show()
 
         self.need_update_setting = True
+        self.request_redraw()
 
     def set_color_mode(self, color_mode):
         if color_mode in {'FLAT', 'RGB', 'I', 'GRAY'}:
@@ -149,6 +210,7 @@ class CloudItem(BaseItem):
             except:
                 self.color_mode = self.mode_table[color_mode]
                 self.need_update_setting = True
+                self.request_redraw()
         else:
             print(f"Invalid color mode: {color_mode}")
 
@@ -161,10 +223,12 @@ class CloudItem(BaseItem):
         # self.size = 1
         # self.box_size.setValue(self.size)
         self.need_update_setting = True
+        self.request_redraw()
 
     def set_alpha(self, alpha):
         self.alpha = alpha
         self.need_update_setting = True
+        self.request_redraw()
 
     def set_flat_rgb(self, color):
         try:
@@ -176,18 +240,43 @@ class CloudItem(BaseItem):
         try:
             self.flat_rgb = text_to_rgba(color, flat=True)
             self.need_update_setting = True
+            self.request_redraw()
         except ValueError:
             print(f"Invalid color: {color}, please use matplotlib color format")
 
     def set_size(self, size):
         self.size = size
         self.need_update_setting = True
+        self.request_redraw()
+
+    def set_lod(self, lod):
+        if lod and not self.lod:
+            # the existing points have no octree yet, and a running build
+            # may miss the points appended without lod.
+            self.need_build_lod = True
+            self.lod_epoch += 1
+        self.lod = lod
+        self.lod_view = None
+        self.request_redraw()
+
+    def set_point_budget(self, point_budget):
+        self.point_budget = point_budget
+        self.lod_view = None
+        self.request_redraw()
 
     def clear(self):
         data = np.empty((0), self.data_type)
         self.set_data(data)
 
-    def set_data(self, data, append=False):
+    def set_data(self, data, append=False, lod_nodes=None):
+        """
+        Set or append the points.
+        Args:
+            data: a cloud array ([('xyz','<f4',(3,)),('irgb','<u4')]),
+                or a (N, 3) / (N, 4) float array (x, y, z, irgb viewed as float).
+            lod_nodes: a LOD octree of data built by build_lod (data must be in its order),
+                so it is not built again when lod is enabled.
+        """
         if not isinstance(data, np.ndarray):
             raise ValueError("Input data must be a numpy array.")
 
@@ -203,23 +292,50 @@ class CloudItem(BaseItem):
                 data = np.rec.fromarrays(
                     [xyz, color[:data.shape[0]]], dtype=self.data_type)
 
+        nodes = None
+        if self.lod and lod_nodes is not None and lod_nodes.shape[0] > 0:
+            nodes = lod_nodes
+        elif self.lod and data.shape[0] > 0:
+            # build the octree in the caller's thread, not in the render thread.
+            index, nodes = build_lod(data['xyz'])
+            data = data[index]
+
         with self.mutex:
             if append:
                 if self.wait_add_data is None:
+                    offset = 0
                     self.wait_add_data = data
                 else:
+                    offset = self.wait_add_data.shape[0]
                     self.wait_add_data = np.concatenate(
                         [self.wait_add_data, data])
                 self.add_buff_loc = self.valid_buff_top
             else:
+                offset = 0
+                self.wait_lod_nodes = []
                 self.wait_add_data = data
                 self.add_buff_loc = 0
+            if nodes is not None:
+                self.wait_lod_nodes.append((offset, nodes))
+            elif self.lod and data.shape[0] > 0:
+                self.need_build_lod = True
+            self.uploaded.clear()
+        self.request_redraw()
+
+    def wait_for_upload(self, timeout=None):
+        """
+        Block until the data given to set_data is uploaded to the GPU.
+        Use it to keep a loader thread from running ahead of the renderer.
+        Returns False if the timeout expires (e.g. the viewer is not painting).
+        """
+        return self.uploaded.wait(timeout)
 
 
     def update_setting(self):
         if (self.need_update_setting is False):
             return
-        glUseProgram(self.program)
+        state = self.glwidget().gl_state
+        state.use_program(self.program)
         set_uniform(self.program, int(self.flat_rgb), 'flat_rgb')
         set_uniform(self.program, int(self.color_mode), 'color_mode')
         set_uniform(self.program, float(self.vmax), 'vmax')
@@ -227,9 +343,43 @@ class CloudItem(BaseItem):
         set_uniform(self.program, float(self.alpha), 'alpha')
         set_uniform(self.program, int(self.size), 'point_size')
         set_uniform(self.program, int(self.point_type_table[self.point_type]), 'point_type')
-        glUseProgram(0)
+        state.use_program(0)
         self.need_update_setting = False
 
+    def next_capacity(self, new_buff_top):
+        buff_capacity = max(self.buff.shape[0], self.CAPACITY)
+        while (new_buff_top > buff_capacity):
+            if self.growth_factor > 1:
+                buff_capacity = int(buff_capacity * self.growth_factor)
+            else:
+                buff_capacity += self.CAPACITY
+        return min(buff_capacity, self.max_cloud_size)
+
+    def resize_vbo(self, buff_capacity, copy_size):
+        # create a new vbo, and copy the valid points from the old vbo on gpu side.
+        if self.persistent_map:
+            self.vbo, self.mapped_ptr = resize_persistent_buffer(
+                self.vbo, buff_capacity * self.STRIDE, copy_size * self.STRIDE)
+        else:
+            self.vbo = resize_buffer(
+                self.vbo, buff_capacity * self.STRIDE, copy_size * self.STRIDE)
+
+    def upload(self, offset, data):
+        data = np.ascontiguousarray(data)
+        if self.persistent_map:
+            # wait for the gpu if we overwrite points which may be still in use.
+            if self.draw_fence is not None and offset < self.valid_buff_top:
+                glClientWaitSync(self.draw_fence, GL_SYNC_FLUSH_COMMANDS_BIT,
+                                 1000000000)
+            ctypes.memmove(self.mapped_ptr + offset * self.STRIDE,
+                           data.ctypes.data, data.nbytes)
+        else:
+            glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+            glBufferSubData(GL_ARRAY_BUFFER, offset * self.STRIDE,
+                            data.nbytes, data)
+            glBindBuffer(GL_ARRAY_BUFFER, 0)
+        self.glwidget().profiler.count_upload(data.nbytes)
+
     def update_render_buffer(self):
         # Ensure there is data waiting to be added to the buffer
         if (self.wait_add_data is None):
@@ -238,73 +388,192 @@ class CloudItem(BaseItem):
         self.mutex.acquire()
 
         new_buff_top = self.add_buff_loc + self.wait_add_data.shape[0]
-        if new_buff_top > self.buff.shape[0]:
+        update_start = self.add_buff_loc
+        if update_start < self.valid_buff_top:
+            # a running lod build is for the replaced points
+            self.lod_epoch += 1
+        if new_buff_top > self.max_cloud_size:
+            # if exceed the maximum cloud size, keep every second point until it fits
+            new_buff = np.concatenate(
+                [self.buff[:self.add_buff_loc], self.wait_add_data])
+            while new_buff.shape[0] > self.max_cloud_size:
+                new_buff = new_buff[::2]
+            print("[Cloud Item] Exceed maximum cloud size %d, reduce the data size" % self.max_cloud_size)
+            new_buff_top = new_buff.shape[0]
+            self.buff = np.empty((self.max_cloud_size), self.data_type)
+            self.buff[:new_buff_top] = new_buff
+            self.resize_vbo(self.max_cloud_size, 0)
+            self.upload(0, self.buff[:new_buff_top])
+            # the node ranges are broken by the reduction, rebuild them.
+            self.wait_lod_nodes = []
+            self.lod_nodes = np.empty((0), lod_node_type)
+            self.need_build_lod = self.lod
+            self.lod_epoch += 1
+            update_start = 0
+        elif new_buff_top > self.buff.shape[0]:
             # if need to update buff capacity, create new cpu buff and new vbo
-            buff_capacity = self.buff.shape[0]
-            while (new_buff_top > buff_capacity):
-                buff_capacity += self.CAPACITY
+            buff_capacity = self.next_capacity(new_buff_top)
             if Q3D_DEBUG is not None:
                 print("[Cloud Item] Update capacity to %d" % buff_capacity)
             new_buff = np.empty((buff_capacity), self.data_type)
             new_buff[:self.add_buff_loc] = self.buff[:self.add_buff_loc]
             new_buff[self.add_buff_loc:new_buff_top] = self.wait_add_data
             self.buff = new_buff
-
-            # if exceed the maximum cloud size, randomly select half of the points
-            exceed_flag = False
-            while new_buff.shape[0] > self.max_cloud_size:
-                exceed_flag = True
-                new_buff_half = new_buff[:new_buff_top:2]
-                new_buff_top = new_buff_half.shape[0]
-                new_buff = new_buff_half
-            if exceed_flag:
-                print("[Cloud Item] Exceed maximum cloud size %d, reduce the data size" % self.max_cloud_size)
-                self.buff = self.buff[:self.max_cloud_size]
-                self.buff[:new_buff_top] = new_buff
-
-
-            glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
-            glBufferData(GL_ARRAY_BUFFER, self.buff.nbytes,
-                         self.buff, GL_DYNAMIC_DRAW)
-            glBindBuffer(GL_ARRAY_BUFFER, 0)
+            self.resize_vbo(buff_capacity, self.add_buff_loc)
+            self.upload(self.add_buff_loc, self.buff[self.add_buff_loc:new_buff_top])
         else:
             self.buff[self.add_buff_loc:new_buff_top] = self.wait_add_data
-            glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
-            glBufferSubData(GL_ARRAY_BUFFER, self.add_buff_loc * self.STRIDE,
-                            self.wait_add_data.shape[0] * self.STRIDE,
-                            self.wait_add_data)
+            self.upload(self.add_buff_loc, self.buff[self.add_buff_loc:new_buff_top])
+        if self.add_buff_loc == 0:
+            self.lod_nodes = np.empty((0), lod_node_type)
+        for offset, nodes in self.wait_lod_nodes:
+            self.add_lod_nodes(nodes, self.add_buff_loc + offset)
+        self.wait_lod_nodes = []
+        self.lod_view = None
         self.valid_buff_top = new_buff_top
+        self.update_chunk_bounds(update_start)
         self.wait_add_data = None
+        self.uploaded.set()
         self.mutex.release()
 
+    def update_chunk_bounds(self, start):
+        # update the bounding boxes of the chunks from the point start to the top.
+        num_chunks = -(-self.valid_buff_top // self.CHUNK_SIZE)
+        first_chunk = start // self.CHUNK_SIZE
+        self.chunk_bmin = np.resize(self.chunk_bmin, (num_chunks, 3))
+        self.chunk_bmax = np.resize(self.chunk_bmax, (num_chunks, 3))
+        if first_chunk < num_chunks:
+            xyz = self.buff['xyz'][first_chunk * self.CHUNK_SIZE:self.valid_buff_top]
+            starts = np.arange(0, xyz.shape[0], self.CHUNK_SIZE)
+            # fmin/fmax ignore nan points, a chunk of nan points is never drawn.
+            self.chunk_bmin[first_chunk:] = np.fmin.reduceat(xyz, starts, axis=0)
+            self.chunk_bmax[first_chunk:] = np.fmax.reduceat(xyz, starts, axis=0)
+        self.chunk_view = None
+
+    def select_chunk_ranges(self, view_matrix, project_matrix):
+        # the squares and spheres have a size in 3D space (cm)
+        margin = 0 if self.point_type == 'PIXEL' else self.size / 100
+        view = (view_matrix.tobytes(), project_matrix.tobytes(), margin)
+        if self.chunk_view != view:
+            planes = frustum_planes(project_matrix @ view_matrix)
+            visible = aabb_in_frustum(planes, self.chunk_bmin - margin,
+                                      self.chunk_bmax + margin)
+            # merge the runs of visible chunks into ranges
+            edges = np.diff(np.r_[0, visible.astype(np.int8), 0])
+            starts = np.flatnonzero(edges == 1)
+            ends = np.flatnonzero(edges == -1)
+            first = starts * self.CHUNK_SIZE
+            count = np.minimum(ends * self.CHUNK_SIZE, self.valid_buff_top) - first
+            self.chunk_ranges = (first.astype(np.int32), count.astype(np.int32))
+            self.drawn_chunks = int(visible.sum())
+            self.culled_chunks = visible.shape[0] - self.drawn_chunks
+            self.chunk_view = view
+        return self.chunk_ranges
+
+    def add_lod_nodes(self, nodes, point_offset):
+        nodes = nodes.copy()
+        nodes['first'] += point_offset
+        nodes['parent'][nodes['parent'] >= 0] += self.lod_nodes.shape[0]
+        self.lod_nodes = np.concatenate([self.lod_nodes, nodes])
+
+    def update_lod(self):
+        if self.lod_result is not None:
+            self.swap_lod()
+        if not self.lod or self.lod_thread is not None:
+            return
+        with self.mutex:
+            roots = self.lod_nodes['first'][self.lod_nodes['parent'] < 0]
+            if self.need_build_lod:
+                # build the octree for all the points
+                start = 0
+            elif roots.shape[0] > self.MAX_LOD_TREES:
+                # merge the last half of the subtrees (the smaller ones),
+                # so the subtrees grow geometrically.
+                start = int(roots[roots.shape[0] // 2])
+            else:
+                return
+            end = self.valid_buff_top
+            if end == 0:
+                self.need_build_lod = False
+                return
+            data = self.buff[start:end].copy()
+            self.lod_thread = threading.Thread(
+                target=self.build_lod_loop,
+                args=(self.lod_epoch, start, end, data), daemon=True)
+            self.lod_thread.start()
+
+    def build_lod_loop(self, epoch, start, end, data):
+        # build the octree of the points [start, end) out of the render thread.
+        index, nodes = build_lod(data['xyz'])
+        self.lod_result = (epoch, start, end, data[index], nodes)
+        self.request_redraw()
+
+    def swap_lod(self):
+        # replace the subtrees of the points [start, end) by the built octree,
+        # and upload the reordered points.
+        with self.mutex:
+            epoch, start, end, data, nodes = self.lod_result
+            self.lod_result = None
+            self.lod_thread = None
+            if epoch != self.lod_epoch:
+                return
+            old = self.lod_nodes
+            head = np.count_nonzero(old['first'] < start)
+            tail = old[np.count_nonzero(old['first'] < end):].copy()
+            tail['parent'][tail['parent'] >= 0] -= old.shape[0] - tail.shape[0]
+            self.lod_nodes = old[:head]
+            self.add_lod_nodes(nodes, start)
+            self.add_lod_nodes(tail, 0)
+            self.buff[start:end] = data
+            self.upload(start, data)
+            self.update_chunk_bounds(start)
+            if start == 0:
+                self.need_build_lod = False
+            self.lod_view = None
+
+    def select_lod_ranges(self, view_matrix, project_matrix, width):
+        # the node selection only changes with the camera or the nodes.
+        view = (view_matrix.tobytes(), project_matrix.tobytes(), width)
+        if self.lod_view != view:
+            self.lod_ranges = select_lod_nodes(
+                self.lod_nodes, view_matrix, project_matrix, width,
+                self.point_budget, self.lod_spacing)
+            self.lod_view = view
+        return self.lod_ranges
+
     def initialize_gl(self):
         vertex_shader = open(self.path + '/../shaders/cloud_vert.glsl', 'r').read()
         fragment_shader = open(self.path + '/../shaders/cloud_frag.glsl', 'r').read()
-        self.program = shaders.compileProgram(
+        self.program = compile_program(
             shaders.compileShader(vertex_shader, GL_VERTEX_SHADER),
             shaders.compileShader(fragment_shader, GL_FRAGMENT_SHADER),
         )
         self.max_cloud_size = glGetIntegerv(
             GL_MAX_SHADER_STORAGE_BLOCK_SIZE) // self.STRIDE
+        if self.persistent_map and not bool(glBufferStorage):
+            print("[Cloud Item] glBufferStorage is not supported, disable persistent mapping")
+            self.persistent_map = False
         # Bind attribute locations
         self.vbo = glGenBuffers(1)
 
     def paint(self):
+        state = self.glwidget().gl_state
         self.update_render_buffer()
+        self.update_lod()
         self.update_setting()
         
-        glEnable(GL_BLEND)
-        glEnable(GL_PROGRAM_POINT_SIZE)
-        glEnable(GL_POINT_SPRITE)
-        glEnable(GL_DEPTH_TEST)
+        state.enable(GL_BLEND)
+        state.enable(GL_PROGRAM_POINT_SIZE)
+        state.enable(GL_POINT_SPRITE)
+        state.enable(GL_DEPTH_TEST)
         
         if self.alpha < 0.9:
-            glDepthFunc(GL_ALWAYS)
+            state.depth_func(GL_ALWAYS)
         else:
-            glDepthFunc(GL_LESS)
+            state.depth_func(GL_LESS)
 
-        glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
-        glUseProgram(self.program)
+        state.blend_func(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+        state.use_program(self.program)
         glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
         glVertexAttribPointer(0, 3, GL_FLOAT, GL_FALSE,
                               self.STRIDE, ctypes.c_void_p(0))
@@ -313,21 +582,34 @@ class CloudItem(BaseItem):
         glEnableVertexAttribArray(0)
         glEnableVertexAttribArray(1)
 
+        # the matrices are in the camera block of the glwidget
         view_matrix = self.glwidget().view_matrix
-        set_uniform(self.program, view_matrix, 'view_matrix')
         project_matrix = self.glwidget().projection_matrix
-        set_uniform(self.program, project_matrix, 'projection_matrix')
         width = self.glwidget().current_width()
-        focal = project_matrix[0, 0] * width / 2
-        set_uniform(self.program, float(focal), 'focal')
 
-        glDrawArrays(GL_POINTS, 0, self.valid_buff_top)
+        if self.lod and not self.need_build_lod and self.lod_nodes.shape[0] > 0:
+            first, count = self.select_lod_ranges(
+                view_matrix, project_matrix, width)
+            if first.shape[0] > 0:
+                glMultiDrawArrays(GL_POINTS, first, count, first.shape[0])
+                self.glwidget().profiler.count_draw()
+            self.drawn_points = int(count.sum())
+        else:
+            first, count = self.select_chunk_ranges(view_matrix, project_matrix)
+            if first.shape[0] > 0:
+                glMultiDrawArrays(GL_POINTS, first, count, first.shape[0])
+                self.glwidget().profiler.count_draw()
+            self.drawn_points = int(count.sum())
+        if self.persistent_map:
+            if self.draw_fence is not None:
+                glDeleteSync(self.draw_fence)
+            self.draw_fence = glFenceSync(GL_SYNC_GPU_COMMANDS_COMPLETE, 0)
 
         # unbind VBO
         glDisableVertexAttribArray(0)
         glDisableVertexAttribArray(1)
         glBindBuffer(GL_ARRAY_BUFFER, 0)
-        glUseProgram(0)
-        glDisable(GL_POINT_SPRITE)
-        glDisable(GL_PROGRAM_POINT_SIZE)
-        glDisable(GL_BLEND)
+        state.use_program(0)
+        state.disable(GL_POINT_SPRITE)
+        state.disable(GL_PROGRAM_POINT_SIZE)
+        state.disable(GL_BLEND)
@@ -8,6 +8,7 @@ import numpy as np
 from OpenGL.GL import *
 from OpenGL.GL import shaders
 from q3dviewer.utils import set_uniform
+from q3dviewer.utils.gl_helper import compile_program
 from q3dviewer.utils import text_to_rgba
 
 # Vertex and Fragment shader source code
@@ -18,13 +19,17 @@ layout(location = 1) in vec2 texCoord;
 
 out vec2 TexCoord;
 
-uniform mat4 view_matrix;
-uniform mat4 project_matrix;
+layout(std140) uniform Camera {
+    mat4 view_matrix;
+    mat4 projection_matrix;
+    vec2 focal;
+    vec2 win_size;
+};
 uniform mat4 model_matrix;
 
 void main()
 {
-    gl_Position = project_matrix * view_matrix * model_matrix * vec4(position, 1.0);
+    gl_Position = projection_matrix * view_matrix * model_matrix * vec4(position, 1.0);
     TexCoord = texCoord;
 }
 """
@@ -92,16 +97,15 @@ class FrameItem(BaseItem):
         glVertexAttribPointer(1, 2, GL_FLOAT, GL_FALSE,
                               20, ctypes.c_void_p(12))
         glEnableVertexAttribArray(1)
-        project_matrix = self.glwidget().get_projection_matrix()
         # Compile shaders and create shader program
-        self.program = shaders.compileProgram(
+        self.program = compile_program(
             shaders.compileShader(vertex_shader_source, GL_VERTEX_SHADER),
             shaders.compileShader(fragment_shader_source, GL_FRAGMENT_SHADER),
         )
-        glUseProgram(self.program)
+        state = self.glwidget().gl_state
+        state.use_program(self.program)
         set_uniform(self.program, np.eye(4), 'model_matrix')
-        set_uniform(self.program, project_matrix, 'project_matrix')
-        glUseProgram(0)
+        state.use_program(0)
         self.texture = glGenTextures(1)
         self.set_data(img=self.img)
         
@@ -135,12 +139,14 @@ class FrameItem(BaseItem):
             ])
             Twc = Twc @ M_conv
         self.Twc = Twc
+        self.request_redraw()
 
     def set_data(self, img=None, transform=None, is_opencv_coord=False):
         if transform is not None:
             self.set_transform(transform, is_opencv_coord)
         self.img = img
         self.need_updating = True
+        self.request_redraw()
 
     def update_img_buffer(self):
         if self.need_updating:
@@ -157,6 +163,7 @@ class FrameItem(BaseItem):
             # Load image
             glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA, img.shape[1],
                          img.shape[0], 0, GL_RGBA, GL_UNSIGNED_BYTE, img)
+            self.glwidget().profiler.count_upload(img.nbytes)
             glGenerateMipmap(GL_TEXTURE_2D)
             glBindTexture(GL_TEXTURE_2D, 0)
             self.need_updating = False
@@ -166,27 +173,27 @@ class FrameItem(BaseItem):
             self.rgba = text_to_rgba(color)
         except ValueError:
             raise ValueError("Invalid color format")
+        self.request_redraw()
 
     def set_line_width(self, width):
         self.width = width
+        self.request_redraw()
 
     def paint(self):
+        state = self.glwidget().gl_state
         self.view_matrix = self.glwidget().view_matrix
-        project_matrix = self.glwidget().projection_matrix
 
-        glEnable(GL_DEPTH_TEST)
-        glEnable(GL_BLEND)
-        glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+        state.enable(GL_DEPTH_TEST)
+        state.enable(GL_BLEND)
+        state.blend_func(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
 
         if self.img is not None:
             self.update_img_buffer()
-            glUseProgram(self.program)
-            set_uniform(self.program, self.view_matrix, 'view_matrix')
-            set_uniform(self.program, project_matrix, 'project_matrix')
+            state.use_program(self.program)
             set_uniform(self.program, self.T, 'model_matrix')
-            glBindVertexArray(self.vao)
-            glBindVertexArray(0)
-            glUseProgram(0)
+            state.bind_vertex_array(self.vao)
+            state.bind_vertex_array(0)
+            state.use_program(0)
 
         # if self.texture is not None:
         #     glBindTexture(GL_TEXTURE_2D, self.texture)
@@ -194,17 +201,19 @@ class FrameItem(BaseItem):
         #     glDrawElements(GL_TRIANGLES, 6, GL_UNSIGNED_INT, None)
         #     glBindTexture(GL_TEXTURE_2D, 0)
         
-        glLineWidth(self.width)
+        state.line_width(self.width)
         # set color to bule
         glColor4f(*self.rgba)
         glBindBuffer(GL_ARRAY_BUFFER, self.line_vbo)
         glEnableClientState(GL_VERTEX_ARRAY)
+        glPushMatrix()
         glMultMatrixf(self.T.T)
         glVertexPointer(3, GL_FLOAT, 0, None)
         glDrawArrays(GL_LINES, 0, len(self.line_vertices))
+        self.glwidget().profiler.count_draw()
+        glPopMatrix()
         glDisableClientState(GL_VERTEX_ARRAY)
         glBindBuffer(GL_ARRAY_BUFFER, 0)
 
-        glDisable(GL_DEPTH_TEST)
-        glDisable(GL_BLEND)
+        state.disable(GL_BLEND)
 
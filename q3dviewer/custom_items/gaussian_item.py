@@ -8,31 +8,154 @@ from q3dviewer.base_item import BaseItem
 from OpenGL.GL import *
 import numpy as np
 import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from q3dviewer.Qt.QtWidgets import QComboBox, QLabel
 from OpenGL.GL import shaders
 from q3dviewer.utils import set_uniform
+from q3dviewer.utils.gl_helper import compile_program
+from q3dviewer.utils.cloud_io import gsdata_type, compress_gs
 
 
 def div_round_up(x, y):
     return int((x + y - 1) / y)
 
 
+RADIX_KEY_BITS = 16  # bits of the quantized depth keys
+RADIX_BITS = 4  # bits sorted per radix pass
+RADIX_BLOCK = 256  # indices per invocation of radix_sort.glsl
+SCAN_BLOCK = 512  # values per workgroup of prefix_sum.glsl
+TILE_SIZE = 16  # pixels of a tile side in the tile render mode
+
+
+def scan_levels(size):
+    """
+    The levels of the prefix sum of size values, which share one buffer:
+    (data offset, size, offset of the block sums) of each level,
+    and the size of the buffer.
+    """
+    levels = []
+    offset = 0
+    while True:
+        blocks = div_round_up(size, SCAN_BLOCK)
+        levels.append((offset, size, offset + size))
+        offset += size
+        size = blocks
+        if blocks == 1:
+            return levels, offset + 1
+
+
+def parallel_argsort(keys, pool=None, workers=1):
+    """
+    Argsort float keys on several threads (numpy releases the GIL while sorting).
+    The keys are split into buckets of about the same size by sampled
+    splitters, each bucket is sorted by a worker and the buckets are already
+    in order, so no merge is needed.
+    """
+    if pool is None or workers <= 1 or keys.shape[0] < 1 << 20:
+        return np.argsort(keys)
+    sample = np.sort(keys[::max(keys.shape[0] // (workers * 64), 1)])
+    splitters = sample[np.linspace(0, sample.shape[0], workers + 1)[1:-1].astype(np.int64)]
+    bucket = np.searchsorted(splitters, keys).astype(np.uint8)
+    # a stable sort on uint8 is a counting sort
+    order = np.argsort(bucket, kind='stable')
+    bounds = np.searchsorted(bucket[order], np.arange(workers + 1))
+
+    def sort_bucket(i):
+        idx = order[bounds[i]:bounds[i + 1]]
+        idx[:] = idx[np.argsort(keys[idx])]
+
+    list(pool.map(sort_bucket, range(workers)))
+    return order
+
+
 class GaussianItem(BaseItem):
-    def __init__(self, **kwds):
+    """
+    An OpenGL item for 3D Gaussians.
+    Attributes:
+        sort_backend: how the gaussians are sorted by depth every frame.
+            'torch': torch.argsort on CUDA.
+            'radix': a radix sort on 16 bits depth keys by compute shaders.
+            'bitonic': a bitonic sort by compute shaders.
+            'cpu': np.argsort on a worker thread, the sorted indices are
+                uploaded when they are ready, so drawing never waits for it.
+            'auto': 'torch' if CUDA is available, else 'radix' or 'cpu',
+                whichever is faster on the first data.
+        sort_threshold: the gaussians are sorted again when the view
+            direction moved more than this since the last sort.
+        refine_bits: for a smaller motion, the radix backend sorts only the
+            high bits (a multiple of 4) of the keys, starting from the
+            previous order (0 to keep the previous order).
+        upload_chunk_bytes: the gaussians are uploaded by chunks of this size,
+            one chunk per frame, and drawn as soon as they are uploaded.
+        compact: keep the gaussians compressed on the GPU (see compress_gs),
+            about 1/3.5 of the memory for sh_dim = 48.
+        cull: with the 'radix' and 'bitonic' backends, the preprocess moves
+            the visible gaussians to the front of the index, and only these
+            are sorted (by the radix sort) and drawn. The gaussians are then
+            sorted again whenever the view changes.
+        alpha_threshold: the gaussians more transparent than this are culled.
+        tiled: render by screen tiles (gau_tile.glsl) instead of drawing a
+            quad per gaussian: the gaussians of every tile are blended front
+            to back by a compute shader, which stops once the tile is opaque.
+            Selected by the last item of the render mode combo.
+    """
+    def __init__(self, sort_backend='auto', sort_threshold=0.1,
+                 refine_bits=12, upload_chunk_bytes=64 << 20, compact=False,
+                 cull=True, alpha_threshold=1 / 255., **kwds):
         super().__init__()
         self.need_updateGS = False
         self.sh_dim = 0
-        self.gs_data = np.empty([0])
+        self.gs_data = np.empty([0])  # float32 or compact (as uint32 words)
+        self.gs_pw = np.empty([0, 3], dtype=np.float32)  # the positions
+        self.compact = compact
+        self.codebook = None  # the ranges of the compact gaussians
+        self.gs_num = 0  # the number of uploaded gaussians
+        self.gs_capacity = 0  # the size of ssbo_gs in bytes
+        self.upload_chunk_bytes = upload_chunk_bytes
         self.prev_Rz = np.array([np.inf, np.inf, np.inf])
+        self.refine_Rz = self.prev_Rz
+        self.sort_threshold = sort_threshold
+        self.refine_bits = refine_bits
+        self.cull = cull
+        self.alpha_threshold = alpha_threshold
+        self.prep_camera = None  # the camera block of the last preprocess
+        self.tiled = False
+        self.tile_shape = None  # (width, height, number of gaussians) of the tile buffers
+        self.tile_dirty = True  # the tile image needs to be rendered again
+        self.pair_capacity = 0  # the size of the (tile, gaussian) pair buffers
         self.path = os.path.dirname(__file__)
-        try:
-            import torch
-            if not torch.cuda.is_available():
-                raise ImportError
-            self.cuda_pw = None
-            self.sort = self.torch_sort
-        except ImportError:
-            self.sort = self.openg_sort
+        self.cuda_pw = None
+        self.gs_center = np.zeros(3)  # bounding sphere of the gaussians
+        self.gs_radius = 0.
+        if sort_backend == 'auto':
+            try:
+                import torch
+                if not torch.cuda.is_available():
+                    raise ImportError
+                sort_backend = 'torch'
+            except ImportError:
+                pass
+        self.sorts = {'torch': self.torch_sort,
+                      'radix': self.radix_sort,
+                      'bitonic': self.openg_sort,
+                      'cpu': self.cpu_sort}
+        if sort_backend not in self.sorts and sort_backend != 'auto':
+            raise ValueError("Unknown sort backend: %s" % sort_backend)
+        self.sort_backend = sort_backend
+        self.sort = self.sorts.get(sort_backend, self.select_sort)
+
+        # the cpu sort runs on this thread.
+        self.sort_thread = None
+        self.sort_cond = threading.Condition()
+        self.sort_request = None  # the Rz to sort for
+        self.sort_generation = 0  # increased by set_data, drops stale results
+        self.sort_pw = None
+        self.sort_pool = None
+        self.sort_workers = max(os.cpu_count() or 1, 1)
+        self.index_ready = None  # sorted indices waiting for upload
+        self.index_back = None  # the other buffer, written by the sort thread
 
     def add_setting(self, layout):
         label_render_mode = QLabel("Render Mode:")
@@ -41,13 +164,19 @@ class GaussianItem(BaseItem):
         combo.addItem("render normal guassian")
         combo.addItem("render ball")
         combo.addItem("render inverse guassian")
+        combo.addItem("render by tiles")
         combo.currentIndexChanged.connect(self.onComboboxSelection)
         layout.addWidget(combo)
 
     def onComboboxSelection(self, index):
-        glUseProgram(self.program)
-        set_uniform(self.program, index, 'render_mod')
-        glUseProgram(0)
+        # the last mode renders the normal guassians by tiles
+        self.tiled = index == 3
+        self.tile_dirty = True
+        state = self.glwidget().gl_state
+        state.use_program(self.program)
+        set_uniform(self.program, 0 if self.tiled else index, 'render_mod')
+        state.use_program(0)
+        self.request_redraw()
 
     def initialize_gl(self):
         fragment_shader = open(
@@ -57,14 +186,38 @@ class GaussianItem(BaseItem):
         sort_shader = open(
             self.path + '/../shaders/sort_by_key.glsl', 'r').read()
         prep_shader = open(self.path + '/../shaders/gau_prep.glsl', 'r').read()
-
-        self.sort_program = shaders.compileProgram(
+        radix_shader = open(
+            self.path + '/../shaders/radix_sort.glsl', 'r').read()
+        scan_shader = open(
+            self.path + '/../shaders/prefix_sum.glsl', 'r').read()
+        tile_shader = open(
+            self.path + '/../shaders/gau_tile.glsl', 'r').read()
+        tile_vertex_shader = open(
+            self.path + '/../shaders/gau_tile_vert.glsl', 'r').read()
+        tile_fragment_shader = open(
+            self.path + '/../shaders/gau_tile_frag.glsl', 'r').read()
+
+        self.sort_program = compile_program(
             shaders.compileShader(sort_shader, GL_COMPUTE_SHADER))
 
-        self.prep_program = shaders.compileProgram(
+        self.radix_program = compile_program(
+            shaders.compileShader(radix_shader, GL_COMPUTE_SHADER))
+
+        self.scan_program = compile_program(
+            shaders.compileShader(scan_shader, GL_COMPUTE_SHADER))
+
+        self.prep_program = compile_program(
             shaders.compileShader(prep_shader, GL_COMPUTE_SHADER))
 
-        self.program = shaders.compileProgram(
+        self.tile_program = compile_program(
+            shaders.compileShader(tile_shader, GL_COMPUTE_SHADER))
+
+        self.tile_draw_program = compile_program(
+            shaders.compileShader(tile_vertex_shader, GL_VERTEX_SHADER),
+            shaders.compileShader(tile_fragment_shader, GL_FRAGMENT_SHADER),
+        )
+
+        self.program = compile_program(
             shaders.compileShader(vertex_shader, GL_VERTEX_SHADER),
             shaders.compileShader(fragment_shader, GL_FRAGMENT_SHADER),
         )
@@ -99,41 +252,64 @@ class GaussianItem(BaseItem):
         self.ssbo_gi = glGenBuffers(1)
         self.ssbo_dp = glGenBuffers(1)
         self.ssbo_pp = glGenBuffers(1)
-
-        width = self.glwidget().current_width()
-        height = self.glwidget().current_height()
-
-        # set constant parameter for gaussian shader
-        project_matrix = self.glwidget().get_projection_matrix()
-        focal_x = project_matrix[0, 0] * width / 2
-        focal_y = project_matrix[1, 1] * height / 2
-        glUseProgram(self.prep_program)
-        set_uniform(self.prep_program,
-                    project_matrix, 'projection_matrix')
-        set_uniform(self.prep_program, np.array([focal_x, focal_y]), 'focal')
-        glUseProgram(0)
-
-        glUseProgram(self.program)
-        set_uniform(self.program, np.array([width, height]), 'win_size')
+        # the second index buffer and the histogram of the radix sort
+        self.ssbo_gi_tmp = glGenBuffers(1)
+        self.ssbo_hist = glGenBuffers(1)
+        # the codebook of the compact gaussians
+        self.ssbo_cb = glGenBuffers(1)
+        # the indirect draw command, its instance count is the number of
+        # the visible gaussians when culling.
+        self.draw_buffer = glGenBuffers(1)
+        glBindBuffer(GL_SHADER_STORAGE_BUFFER, self.draw_buffer)
+        glBufferData(GL_SHADER_STORAGE_BUFFER, 6 * 4, None, GL_DYNAMIC_DRAW)
+        glBindBufferBase(GL_SHADER_STORAGE_BUFFER, 5, self.draw_buffer)
+        glBindBuffer(GL_SHADER_STORAGE_BUFFER, 0)
+        # the buffers of the tile render mode, allocated when it is used.
+        self.ssbo_pair_offset = glGenBuffers(1)  # the first pair of every gaussian
+        self.ssbo_tile_range = glGenBuffers(1)  # the first pair of every tile
+        self.ssbo_pair_tile = glGenBuffers(1)
+        self.ssbo_pair_gs = glGenBuffers(1)
+        self.ssbo_pair_index = glGenBuffers(1)
+        self.ssbo_pair_tmp = glGenBuffers(1)
+        self.ssbo_pair_hist = glGenBuffers(1)
+        self.tile_texture = glGenTextures(1)
+
+        # set constant parameter for gaussian shader,
+        # the camera (matrices, focal, window size) is in the camera block.
+        state = self.glwidget().gl_state
+        state.use_program(self.prep_program)
+        set_uniform(self.prep_program, float(self.alpha_threshold), 'alpha_threshold')
+        state.use_program(0)
+
+        state.use_program(self.program)
         set_uniform(self.program, 0, 'render_mod')
-        glUseProgram(0)
-
-        # opengl settings
-        glDisable(GL_CULL_FACE)
-        glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+        state.use_program(0)
 
     def updateGS(self):
+        state = self.glwidget().gl_state
         if (self.need_updateGS):
+            num = self.gs_data.shape[0]
             # compute sorting size
-            self.num_sort = int(2**np.ceil(np.log2(self.gs_data.shape[0])))
+            self.num_sort = int(2**np.ceil(np.log2(max(num, 1))))
+            self.gs_num = 0
 
-            # set input gaussian data
+            # allocate the gaussian data, it is uploaded by upload_chunk.
             glBindBuffer(GL_SHADER_STORAGE_BUFFER, self.ssbo_gs)
-            glBufferData(GL_SHADER_STORAGE_BUFFER, self.gs_data.nbytes,
-                         self.gs_data.reshape(-1), GL_STATIC_DRAW)
+            if self.gs_data.nbytes > self.gs_capacity:
+                glBufferData(GL_SHADER_STORAGE_BUFFER, self.gs_data.nbytes,
+                             None, GL_STATIC_DRAW)
+                self.gs_capacity = self.gs_data.nbytes
             glBindBufferBase(GL_SHADER_STORAGE_BUFFER, 0, self.ssbo_gs)
             glBindBuffer(GL_SHADER_STORAGE_BUFFER, 0)
 
+            if self.codebook is not None:
+                glBindBuffer(GL_SHADER_STORAGE_BUFFER, self.ssbo_cb)
+                glBufferData(GL_SHADER_STORAGE_BUFFER, self.codebook.nbytes,
+                             self.codebook, GL_STATIC_DRAW)
+                self.glwidget().profiler.count_upload(self.codebook.nbytes)
+                glBindBufferBase(GL_SHADER_STORAGE_BUFFER, 4, self.ssbo_cb)
+                glBindBuffer(GL_SHADER_STORAGE_BUFFER, 0)
+
             # set depth for sorting
             glBindBuffer(GL_SHADER_STORAGE_BUFFER, self.ssbo_dp)
             glBufferData(GL_SHADER_STORAGE_BUFFER,
@@ -141,75 +317,442 @@ class GaussianItem(BaseItem):
             glBindBufferBase(GL_SHADER_STORAGE_BUFFER, 2, self.ssbo_dp)
             glBindBuffer(GL_SHADER_STORAGE_BUFFER, 0)
 
-            # set index for sorting (the index need be initialized)
-            gi = np.arange(self.num_sort, dtype=np.uint32)
+            # set index for sorting
             glBindBuffer(GL_SHADER_STORAGE_BUFFER, self.ssbo_gi)
             glBufferData(GL_SHADER_STORAGE_BUFFER,
-                         self.num_sort * 4, gi, GL_STATIC_DRAW)
+                         self.num_sort * 4, None, GL_STATIC_DRAW)
             glBindBufferBase(GL_SHADER_STORAGE_BUFFER, 1, self.ssbo_gi)
             glBindBuffer(GL_SHADER_STORAGE_BUFFER, 0)
 
+            # the index need be initialized (index[i] = i), and the depths of
+            # the gaussians not uploaded yet are infinite, so they are sorted last.
+            state.use_program(self.radix_program)
+            set_uniform(self.radix_program, 2, 'mode')
+            set_uniform(self.radix_program, self.num_sort, 'gs_num')
+            glDispatchCompute(div_round_up(self.num_sort, 64), 1, 1)
+            self.glwidget().profiler.count_dispatch()
+            glMemoryBarrier(GL_SHADER_STORAGE_BARRIER_BIT)
+            state.use_program(0)
+
+            if self.sort_backend in ['radix', 'auto']:
+                self.init_radix_sort()
+
             # set preprocess buffer
             # the dim of preprocess data is 12 u(3),
             # covinv(3), color(3), area(2), alpha(1)
             glBindBuffer(GL_SHADER_STORAGE_BUFFER, self.ssbo_pp)
             glBufferData(GL_SHADER_STORAGE_BUFFER,
-                         self.gs_data.shape[0] * 4 * 12,
+                         num * 4 * 12,
                          None, GL_STATIC_DRAW)
             glBindBufferBase(GL_SHADER_STORAGE_BUFFER, 3, self.ssbo_pp)
             glBindBuffer(GL_SHADER_STORAGE_BUFFER, 0)
 
-            glUseProgram(self.prep_program)
+            state.use_program(self.prep_program)
             set_uniform(self.prep_program, self.sh_dim, 'sh_dim')
-            set_uniform(self.prep_program,
-                        self.gs_data.shape[0], 'gs_num')
-            glUseProgram(0)
+            set_uniform(self.prep_program, int(self.codebook is not None), 'compact')
+            set_uniform(self.prep_program, self.num_sort, 'sort_num')
+            state.use_program(0)
+            self.prep_camera = None
             self.need_updateGS = False
 
+    def upload_chunk(self):
+        """
+        Upload the next chunk of the gaussian data, the uploaded gaussians
+        are drawn from this frame on.
+        """
+        state = self.glwidget().gl_state
+        num = self.gs_data.shape[0]
+        if self.gs_num >= num:
+            return
+        chunk = max(self.upload_chunk_bytes // (self.gs_data.itemsize *
+                                                self.gs_data.shape[1]), 1)
+        end = min(self.gs_num + chunk, num)
+        data = self.gs_data[self.gs_num:end]
+        glBindBuffer(GL_SHADER_STORAGE_BUFFER, self.ssbo_gs)
+        glBufferSubData(GL_SHADER_STORAGE_BUFFER,
+                        self.gs_num * data[0].nbytes, data.nbytes, data)
+        glBindBuffer(GL_SHADER_STORAGE_BUFFER, 0)
+        self.glwidget().profiler.count_upload(data.nbytes)
+        self.gs_num = end
+        state.use_program(self.prep_program)
+        set_uniform(self.prep_program, self.gs_num, 'gs_num')
+        state.use_program(0)
+        # sort again with the new gaussians
+        self.prev_Rz = np.array([np.inf, np.inf, np.inf])
+        self.prep_camera = None
+        self.sort_pw = None
+        self.cuda_pw = None
+        if self.gs_num < num:
+            # paint again for the next chunk.
+            self.request_redraw()
+
+    def culling(self):
+        # only the gpu sorts can sort the index made by the preprocess.
+        return self.cull and self.sort_backend in ['radix', 'bitonic']
+
     def paint(self):
+        state = self.glwidget().gl_state
         # get current view matrix
         self.view_matrix = self.glwidget().view_matrix
 
         # if gaussian data is update, renew vao, ssbo, etc...
         self.updateGS()
+        self.upload_chunk()
 
-        if (self.gs_data.shape[0] == 0):
+        if (self.gs_num == 0):
             return
 
-        # preprocess and sort gaussian by compute shader.
-        self.preprocessGS()
-        self.try_sort()
-        glEnable(GL_BLEND)
+        # preprocess and sort gaussian by compute shader, nothing changes if
+        # the camera (view, projection, focal and window size) does not.
+        camera = self.glwidget().camera_block.data
+        if self.prep_camera is None or np.any(self.prep_camera != camera):
+            culling = self.culling()
+            self.preprocessGS(culling)
+            self.prep_camera = camera.copy()
+            if culling:
+                # the index is compacted again, sort all of it.
+                self.sort()
+            else:
+                self.try_sort()
+            self.tile_dirty = True
+        self.upload_sorted_index()
+        if self.tiled:
+            self.render_tiles()
+            self.draw_tiles()
+            return
+        state.enable(GL_BLEND)
+        state.blend_func(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
         # draw by vert shader
-        glUseProgram(self.program)
+        state.use_program(self.program)
         # bind vao and ebo
-        glBindVertexArray(self.vao)
+        state.bind_vertex_array(self.vao)
         glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.ebo)
-        # draw instances
-        glDrawElementsInstanced(
-            GL_TRIANGLES, 6, GL_UNSIGNED_INT, None, self.gs_data.shape[0])
+        # draw instances, the instance count is in the draw buffer
+        glBindBuffer(GL_DRAW_INDIRECT_BUFFER, self.draw_buffer)
+        glDrawElementsIndirect(GL_TRIANGLES, GL_UNSIGNED_INT, None)
+        self.glwidget().profiler.count_draw()
+        glBindBuffer(GL_DRAW_INDIRECT_BUFFER, 0)
         # upbind vao and ebo
         glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, 0)
-        glBindVertexArray(0)
-        glUseProgram(0)
-        glDisable(GL_BLEND)
+        state.bind_vertex_array(0)
+        state.use_program(0)
+        state.disable(GL_BLEND)
 
     def try_sort(self):
         # don't sort if the depths are not change.
         Rz = self.view_matrix[2, :3]
-        if (np.linalg.norm(self.prev_Rz - Rz) > 0.1):
-            # import torch
-            # torch.cuda.synchronize()
-            # start = time.time()
+        if (np.linalg.norm(self.prev_Rz - Rz) > self.sort_threshold):
             self.sort()
             self.prev_Rz = Rz
-            # torch.cuda.synchronize()
-            # end = time.time()
-            # time_diff = end - start
-            # print(time_diff)
+            self.refine_Rz = Rz
+        elif self.sort_backend == 'radix' and self.refine_bits > 0 and \
+                np.any(self.refine_Rz != Rz):
+            # a small motion, the order of the last frame is almost sorted.
+            self.radix_sort(self.refine_bits)
+            self.refine_Rz = Rz
+
+    def select_sort(self):
+        """
+        Time the radix sort and the cpu sort on the current data,
+        and keep the faster one.
+        """
+        self.radix_sort()  # the first run compiles and allocates
+        glFinish()
+        t0 = time.perf_counter()
+        self.radix_sort()
+        glFinish()
+        t_radix = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        self.sort_cpu_index(self.view_matrix[2, :3].astype(np.float32),
+                            self.get_sort_pw())
+        t_cpu = time.perf_counter() - t0
+        self.sort_backend = 'cpu' if t_cpu < t_radix else 'radix'
+        self.sort = self.sorts[self.sort_backend]
+        print("[Gaussian Item] Sort backend: %s (radix %.1f ms, cpu %.1f ms)" %
+              (self.sort_backend, t_radix * 1e3, t_cpu * 1e3))
+        self.sort()
+
+    def cpu_sort(self):
+        # ask the sort thread to sort for the current view, don't wait for it.
+        if self.sort_thread is None:
+            self.sort_thread = threading.Thread(target=self.sort_loop, daemon=True)
+            self.sort_thread.start()
+        with self.sort_cond:
+            self.sort_request = (self.view_matrix[2, :3].astype(np.float32),
+                                 self.get_sort_pw())
+            self.sort_cond.notify()
+
+    def get_sort_pw(self):
+        # the positions of the gaussians, contiguous for the matmul.
+        if self.sort_pw is None:
+            self.sort_pw = np.ascontiguousarray(self.gs_pw[:self.gs_num])
+        return self.sort_pw
+
+    def sort_cpu_index(self, Rz, pw):
+        # depth order of the gaussians, the translation does not change it.
+        if self.sort_pool is None and self.sort_workers > 1:
+            self.sort_pool = ThreadPoolExecutor(self.sort_workers)
+        return parallel_argsort(pw @ Rz, self.sort_pool, self.sort_workers)
+
+    def sort_loop(self):
+        while True:
+            with self.sort_cond:
+                while self.sort_request is None:
+                    self.sort_cond.wait()
+                Rz, pw = self.sort_request
+                self.sort_request = None
+                generation = self.sort_generation
+            index = self.sort_cpu_index(Rz, pw)
+            with self.sort_cond:
+                if generation != self.sort_generation:
+                    continue
+                back = self.index_back
+                if back is None or back.shape[0] != index.shape[0]:
+                    back = np.empty(index.shape[0], dtype=np.uint32)
+            np.copyto(back, index, casting='unsafe')
+            with self.sort_cond:
+                if generation != self.sort_generation:
+                    continue
+                # swap the buffers, the old one is written next time.
+                self.index_back = self.index_ready
+                self.index_ready = back
+            self.request_redraw()
+
+    def upload_sorted_index(self):
+        # upload the indices sorted by the cpu sort thread, if any.
+        with self.sort_cond:
+            if self.index_ready is None:
+                return
+            index = self.index_ready
+            glBindBuffer(GL_SHADER_STORAGE_BUFFER, self.ssbo_gi)
+            glBufferSubData(GL_SHADER_STORAGE_BUFFER, 0, index.nbytes, index)
+            glBindBuffer(GL_SHADER_STORAGE_BUFFER, 0)
+            self.glwidget().profiler.count_upload(index.nbytes)
+            self.index_back = index
+            self.index_ready = None
+            self.tile_dirty = True
+
+    def init_radix_sort(self):
+        num = self.gs_data.shape[0]
+        # the histogram is scanned level by level in the same buffer.
+        _, hist_size = scan_levels(div_round_up(num, RADIX_BLOCK) << RADIX_BITS)
+        glBindBuffer(GL_SHADER_STORAGE_BUFFER, self.ssbo_gi_tmp)
+        glBufferData(GL_SHADER_STORAGE_BUFFER,
+                     self.num_sort * 4, None, GL_DYNAMIC_DRAW)
+        glBindBuffer(GL_SHADER_STORAGE_BUFFER, self.ssbo_hist)
+        glBufferData(GL_SHADER_STORAGE_BUFFER,
+                     hist_size * 4, None, GL_DYNAMIC_DRAW)
+        glBindBufferBase(GL_SHADER_STORAGE_BUFFER, 7, self.ssbo_hist)
+        glBindBuffer(GL_SHADER_STORAGE_BUFFER, 0)
+
+    def prefix_sum(self, size):
+        state = self.glwidget().gl_state
+        # exclusive scan of the buffer bound to binding 7
+        levels, _ = scan_levels(size)
+        state.use_program(self.scan_program)
+        set_uniform(self.scan_program, 0, 'mode')
+        for offset, size, sums_offset in levels:
+            set_uniform(self.scan_program, offset, 'data_offset')
+            set_uniform(self.scan_program, size, 'num')
+            set_uniform(self.scan_program, sums_offset, 'sums_offset')
+            glDispatchCompute(div_round_up(size, SCAN_BLOCK), 1, 1)
+            self.glwidget().profiler.count_dispatch()
+            glMemoryBarrier(GL_SHADER_STORAGE_BARRIER_BIT)
+        set_uniform(self.scan_program, 1, 'mode')
+        for offset, size, sums_offset in levels[-2::-1]:
+            set_uniform(self.scan_program, offset, 'data_offset')
+            set_uniform(self.scan_program, size, 'num')
+            set_uniform(self.scan_program, sums_offset, 'sums_offset')
+            glDispatchCompute(div_round_up(size, SCAN_BLOCK), 1, 1)
+            self.glwidget().profiler.count_dispatch()
+            glMemoryBarrier(GL_SHADER_STORAGE_BARRIER_BIT)
+
+    def radix_sort(self, bits=RADIX_KEY_BITS):
+        state = self.glwidget().gl_state
+        # sort by the high bits of the keys, the full keys by default.
+        # the depths are quantized in log scale, between the near plane
+        # and the far side of the bounding sphere of the gaussians.
+        proj = self.glwidget().projection_matrix
+        near = proj[2, 3] / (proj[2, 2] - 1)
+        center_depth = -(self.view_matrix[2, :3] @ self.gs_center +
+                         self.view_matrix[2, 3])
+        near = max(near, center_depth - self.gs_radius)
+        far = max(center_depth + self.gs_radius, near * 2)
+        state.use_program(self.radix_program)
+        set_uniform(self.radix_program, 0, 'key_type')
+        set_uniform(self.radix_program, self.gs_num, 'gs_num')
+        set_uniform(self.radix_program, RADIX_BLOCK, 'block_size')
+        set_uniform(self.radix_program, float(np.log(near)), 'log_near')
+        set_uniform(self.radix_program, float(np.log(far / near)), 'log_range')
+        glBindBufferBase(GL_SHADER_STORAGE_BUFFER, 7, self.ssbo_hist)
+        shifts = range(RADIX_KEY_BITS - bits, RADIX_KEY_BITS, RADIX_BITS)
+        self.ssbo_gi, self.ssbo_gi_tmp = self.radix_passes(
+            self.ssbo_gi, self.ssbo_gi_tmp, self.gs_num, shifts)
+        # draw with the sorted indices.
+        glBindBufferBase(GL_SHADER_STORAGE_BUFFER, 1, self.ssbo_gi)
+        state.use_program(0)
+
+    def radix_passes(self, src, dst, num, shifts):
+        state = self.glwidget().gl_state
+        # stable sort of the index src by the digits at shifts, the keys are
+        # set by the caller. returns the sorted index and the other buffer.
+        blocks = div_round_up(num, RADIX_BLOCK)
+        for shift in shifts:
+            glBindBufferBase(GL_SHADER_STORAGE_BUFFER, 1, src)
+            glBindBufferBase(GL_SHADER_STORAGE_BUFFER, 6, dst)
+            state.use_program(self.radix_program)
+            set_uniform(self.radix_program, shift, 'shift')
+            set_uniform(self.radix_program, 0, 'mode')
+            glDispatchCompute(div_round_up(blocks, 64), 1, 1)
+            self.glwidget().profiler.count_dispatch()
+            glMemoryBarrier(GL_SHADER_STORAGE_BARRIER_BIT)
+            self.prefix_sum(blocks << RADIX_BITS)
+            state.use_program(self.radix_program)
+            set_uniform(self.radix_program, 1, 'mode')
+            glDispatchCompute(div_round_up(blocks, 64), 1, 1)
+            self.glwidget().profiler.count_dispatch()
+            glMemoryBarrier(GL_SHADER_STORAGE_BARRIER_BIT)
+            src, dst = dst, src
+        return src, dst
+
+    def init_tiles(self):
+        # allocate the buffers of the tile render mode for the window size.
+        width = self.glwidget().current_width()
+        height = self.glwidget().current_height()
+        num = self.gs_data.shape[0]
+        if self.tile_shape == (width, height, num):
+            return
+        self.tile_shape = (width, height, num)
+        self.tiles = (div_round_up(width, TILE_SIZE), div_round_up(height, TILE_SIZE))
+        num_tiles = self.tiles[0] * self.tiles[1]
+        _, offset_size = scan_levels(max(num, 1))
+        _, range_size = scan_levels(num_tiles)
+        for buffer, size in [(self.ssbo_pair_offset, offset_size),
+                             (self.ssbo_tile_range, range_size)]:
+            glBindBuffer(GL_SHADER_STORAGE_BUFFER, buffer)
+            glBufferData(GL_SHADER_STORAGE_BUFFER, size * 4, None, GL_DYNAMIC_DRAW)
+        glBindBuffer(GL_SHADER_STORAGE_BUFFER, 0)
+        self.tile_zeros = np.zeros(num_tiles, dtype=np.uint32)
+        glBindTexture(GL_TEXTURE_2D, self.tile_texture)
+        glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA8, width, height, 0,
+                     GL_RGBA, GL_UNSIGNED_BYTE, None)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_NEAREST)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_NEAREST)
+        glBindTexture(GL_TEXTURE_2D, 0)
+        self.tile_dirty = True
+
+    def reserve_pairs(self, num):
+        # grow the buffers of the (tile, gaussian) pairs
+        if num <= self.pair_capacity:
+            return
+        self.pair_capacity = max(num, self.pair_capacity * 3 // 2)
+        for buffer in [self.ssbo_pair_tile, self.ssbo_pair_gs,
+                       self.ssbo_pair_index, self.ssbo_pair_tmp]:
+            glBindBuffer(GL_SHADER_STORAGE_BUFFER, buffer)
+            glBufferData(GL_SHADER_STORAGE_BUFFER, self.pair_capacity * 4,
+                         None, GL_DYNAMIC_DRAW)
+        _, hist_size = scan_levels(
+            div_round_up(self.pair_capacity, RADIX_BLOCK) << RADIX_BITS)
+        glBindBuffer(GL_SHADER_STORAGE_BUFFER, self.ssbo_pair_hist)
+        glBufferData(GL_SHADER_STORAGE_BUFFER, hist_size * 4, None, GL_DYNAMIC_DRAW)
+        glBindBuffer(GL_SHADER_STORAGE_BUFFER, 0)
+
+    def render_tiles(self):
+        """
+        Render the sorted gaussians into tile_texture by tiles (see gau_tile.glsl).
+        """
+        state = self.glwidget().gl_state
+        self.init_tiles()
+        if not self.tile_dirty:
+            return
+        width, height, _ = self.tile_shape
+        num_tiles = self.tiles[0] * self.tiles[1]
+        glBindBuffer(GL_SHADER_STORAGE_BUFFER, self.ssbo_tile_range)
+        glBufferSubData(GL_SHADER_STORAGE_BUFFER, 0,
+                        self.tile_zeros.nbytes, self.tile_zeros)
+        glBindBuffer(GL_SHADER_STORAGE_BUFFER, 0)
+        self.glwidget().profiler.count_upload(self.tile_zeros.nbytes)
+        glBindBufferBase(GL_SHADER_STORAGE_BUFFER, 7, self.ssbo_pair_offset)
+        glBindBufferBase(GL_SHADER_STORAGE_BUFFER, 9, self.ssbo_tile_range)
+        state.use_program(self.tile_program)
+        set_uniform(self.tile_program, self.gs_num, 'gs_num')
+        set_uniform(self.tile_program, np.array([width, height], dtype=np.float32), 'win_size')
+        set_uniform(self.tile_program, np.array(self.tiles, dtype=np.float32), 'tile_num')
+        set_uniform(self.tile_program, 0, 'mode')
+        glDispatchCompute(div_round_up(self.gs_num, 256), 1, 1)
+        self.glwidget().profiler.count_dispatch()
+        glMemoryBarrier(GL_SHADER_STORAGE_BARRIER_BIT)
+        self.prefix_sum(self.gs_num)
+        glBindBufferBase(GL_SHADER_STORAGE_BUFFER, 7, self.ssbo_tile_range)
+        self.prefix_sum(num_tiles)
+
+        # the number of pairs is the total of the scan,
+        # it is read back to allocate the pairs.
+        _, size = scan_levels(self.gs_num)
+        glBindBuffer(GL_SHADER_STORAGE_BUFFER, self.ssbo_pair_offset)
+        data = glGetBufferSubData(GL_SHADER_STORAGE_BUFFER, (size - 1) * 4, 4)
+        glBindBuffer(GL_SHADER_STORAGE_BUFFER, 0)
+        pair_num = int(np.frombuffer(data, dtype=np.uint32)[0])
+        self.reserve_pairs(max(pair_num, 1))
+
+        glBindBufferBase(GL_SHADER_STORAGE_BUFFER, 7, self.ssbo_pair_offset)
+        glBindBufferBase(GL_SHADER_STORAGE_BUFFER, 8, self.ssbo_pair_tile)
+        glBindBufferBase(GL_SHADER_STORAGE_BUFFER, 10, self.ssbo_pair_gs)
+        glBindBufferBase(GL_SHADER_STORAGE_BUFFER, 11, self.ssbo_pair_index)
+        state.use_program(self.tile_program)
+        set_uniform(self.tile_program, 1, 'mode')
+        glDispatchCompute(div_round_up(self.gs_num, 256), 1, 1)
+        self.glwidget().profiler.count_dispatch()
+        glMemoryBarrier(GL_SHADER_STORAGE_BARRIER_BIT)
+
+        if pair_num > 0:
+            # a stable sort by tile, the pairs of every tile stay in depth order.
+            state.use_program(self.radix_program)
+            set_uniform(self.radix_program, 1, 'key_type')
+            set_uniform(self.radix_program, pair_num, 'gs_num')
+            set_uniform(self.radix_program, RADIX_BLOCK, 'block_size')
+            glBindBufferBase(GL_SHADER_STORAGE_BUFFER, 7, self.ssbo_pair_hist)
+            bits = max((num_tiles - 1).bit_length(), 1)
+            shifts = range(0, div_round_up(bits, RADIX_BITS) * RADIX_BITS, RADIX_BITS)
+            self.ssbo_pair_index, self.ssbo_pair_tmp = self.radix_passes(
+                self.ssbo_pair_index, self.ssbo_pair_tmp, pair_num, shifts)
+            glBindBufferBase(GL_SHADER_STORAGE_BUFFER, 1, self.ssbo_gi)
+            glBindBufferBase(GL_SHADER_STORAGE_BUFFER, 7, self.ssbo_hist)
+            glBindBufferBase(GL_SHADER_STORAGE_BUFFER, 11, self.ssbo_pair_index)
+
+        state.use_program(self.tile_program)
+        set_uniform(self.tile_program, 2, 'mode')
+        set_uniform(self.tile_program, pair_num, 'pair_num')
+        glBindImageTexture(0, self.tile_texture, 0, GL_FALSE, 0,
+                           GL_WRITE_ONLY, GL_RGBA8)
+        glDispatchCompute(self.tiles[0], self.tiles[1], 1)
+        self.glwidget().profiler.count_dispatch()
+        glMemoryBarrier(GL_TEXTURE_FETCH_BARRIER_BIT)
+        state.use_program(0)
+        self.tile_dirty = False
+
+    def draw_tiles(self):
+        state = self.glwidget().gl_state
+        # draw tile_texture over the screen, its color is premultiplied.
+        state.use_program(self.tile_draw_program)
+        glActiveTexture(GL_TEXTURE0)
+        glBindTexture(GL_TEXTURE_2D, self.tile_texture)
+        state.enable(GL_BLEND)
+        state.blend_func(GL_ONE, GL_ONE_MINUS_SRC_ALPHA)
+        state.depth_mask(GL_FALSE)
+        state.bind_vertex_array(self.vao)
+        glDrawArrays(GL_TRIANGLES, 0, 3)
+        self.glwidget().profiler.count_draw()
+        state.bind_vertex_array(0)
+        state.depth_mask(GL_TRUE)
+        state.blend_func(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+        state.disable(GL_BLEND)
+        glBindTexture(GL_TEXTURE_2D, 0)
+        state.use_program(0)
 
     def openg_sort(self):
-        glUseProgram(self.sort_program)
+        state = self.glwidget().gl_state
+        state.use_program(self.sort_program)
         # can we move this loop to gpu?
         # level = level*2
         for level in 2**np.arange(1, int(np.ceil(np.log2(self.num_sort))+1)):
@@ -218,37 +761,91 @@ class GaussianItem(BaseItem):
                 set_uniform(self.sort_program, int(level), 'level')
                 set_uniform(self.sort_program, int(stage), 'stage')
                 glDispatchCompute(div_round_up(self.num_sort//2, 256), 1, 1)
+                self.glwidget().profiler.count_dispatch()
                 glMemoryBarrier(GL_SHADER_STORAGE_BARRIER_BIT)
         # glFinish()
-        glUseProgram(0)
+        state.use_program(0)
 
     def torch_sort(self):
         import torch
         if self.cuda_pw is None:
-            self.cuda_pw = torch.tensor(self.gs_data[:, :3]).cuda()
+            self.cuda_pw = torch.tensor(self.gs_pw[:self.gs_num]).cuda()
         Rz = torch.tensor(self.view_matrix[2, :3].astype(np.float32)).cuda()
         depth = Rz @ self.cuda_pw.T
         index = torch.argsort(depth).type(torch.int32).cpu().numpy()
         glBindBuffer(GL_SHADER_STORAGE_BUFFER, self.ssbo_gi)
-        glBufferData(GL_SHADER_STORAGE_BUFFER,
-                     index.nbytes, index, GL_STATIC_DRAW)
+        glBufferSubData(GL_SHADER_STORAGE_BUFFER, 0, index.nbytes, index)
         glBindBufferBase(GL_SHADER_STORAGE_BUFFER, 1, self.ssbo_gi)
         glBindBuffer(GL_SHADER_STORAGE_BUFFER, 0)
+        self.glwidget().profiler.count_upload(index.nbytes)
         return index
 
-    def preprocessGS(self):
-        glUseProgram(self.prep_program)
-        set_uniform(self.prep_program, self.view_matrix, 'view_matrix')
-        glDispatchCompute(div_round_up(self.gs_data.shape[0], 256), 1, 1)
-        glMemoryBarrier(GL_SHADER_STORAGE_BARRIER_BIT)
-        glUseProgram(0)
+    def preprocessGS(self, culling=False):
+        state = self.glwidget().gl_state
+        # reset the draw command, the visible gaussians are counted when culling.
+        command = np.array([6, 0 if culling else self.gs_num, 0, 0, 0, 0],
+                           dtype=np.uint32)
+        glBindBuffer(GL_SHADER_STORAGE_BUFFER, self.draw_buffer)
+        glBufferSubData(GL_SHADER_STORAGE_BUFFER, 0, command.nbytes, command)
+        glBindBuffer(GL_SHADER_STORAGE_BUFFER, 0)
+        self.glwidget().profiler.count_upload(command.nbytes)
+        state.use_program(self.prep_program)
+        set_uniform(self.prep_program, int(culling), 'cull')
+        # when culling, the whole index is rewritten
+        num = self.num_sort if culling else self.gs_num
+        glDispatchCompute(div_round_up(num, 256), 1, 1)
+        self.glwidget().profiler.count_dispatch()
+        glMemoryBarrier(GL_SHADER_STORAGE_BARRIER_BIT | GL_COMMAND_BARRIER_BIT)
+        state.use_program(0)
+
+    def get_visible_num(self):
+        # the number of the drawn gaussians (waits for the gpu).
+        glBindBuffer(GL_SHADER_STORAGE_BUFFER, self.draw_buffer)
+        data = glGetBufferSubData(GL_SHADER_STORAGE_BUFFER, 4, 4)
+        glBindBuffer(GL_SHADER_STORAGE_BUFFER, 0)
+        return int(np.frombuffer(data, dtype=np.uint32)[0])
 
     def set_data(self, **kwds):
-        if 'gs_data' in kwds:
+        """
+        Set the gaussians.
+        Args:
+            gs_data: a (N, 11 + sh_dim) float array of gaussians (gsdata_type),
+                compressed first if compact is enabled.
+            gs_compact: a (compact array, codebook) pair made by compress_gs,
+                or loaded by load_gs_compact.
+        """
+        if 'gs_data' in kwds or 'gs_compact' in kwds:
             self.need_updateGS = False
-            gs_data = kwds.pop('gs_data')
-            self.gs_data = np.ascontiguousarray(gs_data, dtype=np.float32)
-            self.sh_dim = self.gs_data.shape[-1] - (3 + 4 + 3 + 1)
+            if 'gs_data' in kwds:
+                gs_data = np.ascontiguousarray(kwds.pop('gs_data'), dtype=np.float32)
+                sh_dim = gs_data.shape[-1] - (3 + 4 + 3 + 1)
+                if self.compact:
+                    gs = gs_data.reshape(-1).view(gsdata_type(sh_dim))
+                    kwds['gs_compact'] = compress_gs(gs)
+                else:
+                    self.gs_data = gs_data
+                    self.gs_pw = gs_data[:, :3]
+                    self.sh_dim = sh_dim
+                    self.codebook = None
+            if 'gs_compact' in kwds:
+                cgs, codebook = kwds.pop('gs_compact')
+                cgs = np.ascontiguousarray(cgs)
+                self.gs_data = cgs.view(np.uint32).reshape(cgs.shape[0], -1)
+                self.codebook = np.ascontiguousarray(codebook, dtype=np.float32)
+                self.sh_dim = (self.codebook.shape[0] - 12) // 2 + 3
+                self.gs_pw = self.codebook[0:3] + \
+                    cgs['pw'] / np.float32(65535) * self.codebook[3:6]
+            if self.gs_data.shape[0] > 0:
+                pw = self.gs_pw
+                bmin, bmax = np.nanmin(pw, axis=0), np.nanmax(pw, axis=0)
+                self.gs_center = (bmin + bmax) / 2
+                self.gs_radius = float(np.linalg.norm(bmax - bmin) / 2)
             self.prev_Rz = np.array([np.inf, np.inf, np.inf])
             self.cuda_pw = None
+            with self.sort_cond:
+                self.sort_generation += 1
+                self.sort_request = None
+                self.sort_pw = None
+                self.index_ready = None
             self.need_updateGS = True
+            self.request_redraw()
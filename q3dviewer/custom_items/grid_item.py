@@ -25,6 +25,7 @@ class GridItem(BaseItem):
             self.rgba = text_to_rgba(color)
         except ValueError:
             raise ValueError("Invalid color format. Use hex format like '#RRGGBB' or '#RRGGBBAA'.")
+        self.request_redraw()
 
     def generate_grid_vertices(self):
         vertices = []
@@ -42,6 +43,7 @@ class GridItem(BaseItem):
         glBindVertexArray(self.vao)
         glBindBuffer(GL_ARRAY_BUFFER, vbo)
         glBufferData(GL_ARRAY_BUFFER, self.vertices.nbytes, self.vertices, GL_STATIC_DRAW)
+        self.glwidget().profiler.count_upload(self.vertices.nbytes)
         glVertexAttribPointer(0, 3, GL_FLOAT, GL_FALSE, 0, ctypes.c_void_p(0))
         glEnableVertexAttribArray(0)
         glBindVertexArray(0)
@@ -91,47 +93,55 @@ class GridItem(BaseItem):
     def set_size(self, size):
         self.size = size
         self.need_update_grid = True
+        self.request_redraw()
 
     def _on_spacing(self, spacing):
         if spacing > 0:
             self.spacing = spacing
             self.need_update_grid = True
+            self.request_redraw()
 
     def _on_offset_x(self, value):
         self.offset[0] = value
         print(self.offset)
         self.need_update_grid = True
+        self.request_redraw()
 
     def _on_offset_y(self, value):
         self.offset[1] = value
         self.need_update_grid = True
+        self.request_redraw()
 
     def _on_offset_z(self, value):
         self.offset[2] = value
         self.need_update_grid = True
+        self.request_redraw()
 
     def set_offset(self, offset):
         if isinstance(offset, np.ndarray) and offset.shape == (3,):
             self.offset = offset
             self.need_update_grid = True
+            self.request_redraw()
         else:
             raise ValueError("Offset must be a numpy array with shape (3,)")
 
     def paint(self):
+        state = self.glwidget().gl_state
         if self.need_update_grid:
             self.vertices = self.generate_grid_vertices()
             self.initialize_gl()
             self.need_update_grid = False
         
-        glEnable(GL_BLEND)
-        glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+        state.enable(GL_BLEND)
+        state.blend_func(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
 
-        glLineWidth(1)
+        state.line_width(1)
         glColor4f(*self.rgba)
-        glBindVertexArray(self.vao)
+        state.bind_vertex_array(self.vao)
         glDrawArrays(GL_LINES, 0, len(self.vertices) // 3)
-        glBindVertexArray(0)
-        glLineWidth(1)
-        glDisable(GL_BLEND)
+        self.glwidget().profiler.count_draw()
+        state.bind_vertex_array(0)
+        state.line_width(1)
+        state.disable(GL_BLEND)
 
 
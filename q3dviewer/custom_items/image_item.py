@@ -8,6 +8,7 @@ from OpenGL.GL import *
 
 import numpy as np
 from OpenGL.GL import shaders
+from q3dviewer.utils.gl_helper import compile_program
 from q3dviewer.Qt.QtWidgets import QSpinBox, QCheckBox
 
 
@@ -98,7 +99,7 @@ class ImageItem(BaseItem):
         glEnableVertexAttribArray(1)
 
         # Compile shaders and create shader program
-        self.program = shaders.compileProgram(
+        self.program = compile_program(
             shaders.compileShader(vertex_shader_source, GL_VERTEX_SHADER),
             shaders.compileShader(fragment_shader_source, GL_FRAGMENT_SHADER),
         )
@@ -120,8 +121,10 @@ class ImageItem(BaseItem):
                 dtype=data.dtype) * self.alpha
             data = np.concatenate((data, alpha_channel), axis=-1)
         self.image = data
+        self.request_redraw()
 
     def paint(self):
+        state = self.glwidget().gl_state
         if self.image is not None:
             img_data = self.image
             img_data = np.flipud(img_data)  # Flip the image vertically
@@ -133,21 +136,21 @@ class ImageItem(BaseItem):
             glGenerateMipmap(GL_TEXTURE_2D)
             glBindTexture(GL_TEXTURE_2D, 0)
             self.image = None
+            self.glwidget().profiler.count_upload(len(img_data))
 
-        glEnable(GL_DEPTH_TEST)
-        glEnable(GL_BLEND)
-        glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+        state.enable(GL_DEPTH_TEST)
+        state.enable(GL_BLEND)
+        state.blend_func(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
 
-        glUseProgram(self.program)
-        glBindVertexArray(self.vao)
+        state.use_program(self.program)
+        state.bind_vertex_array(self.vao)
         glBindTexture(GL_TEXTURE_2D, self.texture)
         glDrawElements(GL_TRIANGLES, 6, GL_UNSIGNED_INT, None)
+        self.glwidget().profiler.count_draw()
         glBindTexture(GL_TEXTURE_2D, 0)
-        glBindVertexArray(0)
-        glUseProgram(0)
-
-        glDisable(GL_DEPTH_TEST)
-        glDisable(GL_BLEND)
+        state.bind_vertex_array(0)
+        state.use_program(0)
+        state.disable(GL_BLEND)
 
     def add_setting(self, layout):
         spinbox_alpha = QSpinBox()
@@ -165,3 +168,4 @@ class ImageItem(BaseItem):
 
     def set_alpha(self, alpha):
         self.alpha = alpha
+        self.request_redraw()
@@ -54,6 +54,7 @@ class LineItem(BaseItem):
         try:
             self.rgb = text_to_rgba(color)
             self.color = color
+            self.request_redraw()
         except ValueError:
             print("Invalid color format. Use mathplotlib color format.")
 
@@ -62,6 +63,7 @@ class LineItem(BaseItem):
 
     def set_width(self, width):
         self.width = width
+        self.request_redraw()
 
     def set_data(self, data, append=False):
         self.mutex.acquire()
@@ -76,6 +78,7 @@ class LineItem(BaseItem):
                 self.wait_add_data = np.concatenate([self.wait_add_data, data])
             self.add_buff_loc = self.valid_buff_top
         self.mutex.release()
+        self.request_redraw()
 
     def update_render_buffer(self):
         if (self.wait_add_data is None):
@@ -93,12 +96,14 @@ class LineItem(BaseItem):
             glBufferData(GL_ARRAY_BUFFER, self.buff.nbytes,
                          self.buff, GL_DYNAMIC_DRAW)
             glBindBuffer(GL_ARRAY_BUFFER, 0)
+            self.glwidget().profiler.count_upload(self.buff.nbytes)
         else:
             self.buff[self.add_buff_loc:new_buff_top] = self.wait_add_data
             glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
             glBufferSubData(GL_ARRAY_BUFFER, self.add_buff_loc * 12,
                             self.wait_add_data.shape[0] * 12,
                             self.wait_add_data)
+            self.glwidget().profiler.count_upload(self.wait_add_data.shape[0] * 12)
         self.valid_buff_top = new_buff_top
         self.wait_add_data = None
         self.mutex.release()
@@ -107,17 +112,19 @@ class LineItem(BaseItem):
         self.vbo = glGenBuffers(1)
 
     def paint(self):
+        state = self.glwidget().gl_state
         self.update_render_buffer()
-        glEnable(GL_BLEND)
-        glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+        state.enable(GL_BLEND)
+        state.blend_func(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
         glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
         glEnableClientState(GL_VERTEX_ARRAY)
         glVertexPointer(3, GL_FLOAT, 0, None)
-        glLineWidth(self.width)
+        state.line_width(self.width)
         glColor4f(*self.rgb)
 
         glDrawArrays(self.line_type, 0, self.valid_buff_top)
+        self.glwidget().profiler.count_draw()
         glDisableClientState(GL_VERTEX_ARRAY)
 
         glBindBuffer(GL_ARRAY_BUFFER, 0)
-        glDisable(GL_BLEND)
+        state.disable(GL_BLEND)
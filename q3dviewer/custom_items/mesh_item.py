@@ -14,9 +14,150 @@ from q3dviewer.Qt.QtWidgets import QLabel, QCheckBox, QDoubleSpinBox, QSlider, Q
 
 import os
 from q3dviewer.utils import set_uniform, text_to_rgba
+from q3dviewer.utils.gl_helper import compile_program, resize_buffer
 import time
 
 
+def hash_points(points):
+    """A 64 bits hash of the bits of Nx3 float32 points"""
+    bits = points.view(np.uint32).astype(np.uint64)
+    h = bits[:, 0] * np.uint64(0x9e3779b97f4a7c15)
+    h ^= bits[:, 1] * np.uint64(0xc2b2ae3d27d4eb4f)
+    h ^= bits[:, 2] * np.uint64(0x165667b19e3779f9)
+    return h
+
+
+def dedup_vertices(points):
+    """
+    Merge the identical points of a triangle soup.
+    Args:
+        points: Nx3 array, the corners of the triangles.
+    Returns:
+        The unique vertices (Mx3 float32) and the index of every point
+        into them (N uint32).
+    """
+    # + 0 turns -0.0 into 0.0, so the same positions have the same bits
+    points = np.ascontiguousarray(points, dtype=np.float32).reshape(-1, 3) + np.float32(0)
+    if points.shape[0] == 0:
+        return points, np.zeros(0, dtype=np.uint32)
+    # sort a 64 bits hash of the bits, much faster than sorting the 12 bytes rows
+    h = hash_points(points)
+    order = np.argsort(h)
+    sorted_h = h[order]
+    new = np.empty(order.shape[0], dtype=bool)
+    new[0] = True
+    np.not_equal(sorted_h[1:], sorted_h[:-1], out=new[1:])
+    inverse = np.empty(order.shape[0], dtype=np.uint32)
+    inverse[order] = np.cumsum(new) - 1
+    vertices = points[order[new]]
+    if not np.array_equal(vertices[inverse], points):
+        # a hash collision, sort the rows themselves
+        keys = points.view(np.dtype((np.void, 12))).ravel()
+        _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+        return points[first], inverse.reshape(-1).astype(np.uint32)
+    return vertices, inverse
+
+
+class DirtyRanges:
+    """
+    The modified rows of a buffer, coalesced into [start, stop) ranges
+    for glBufferSubData.
+    Args:
+        merge_gap: ranges closer than merge_gap rows are uploaded as one.
+        max_ranges: at most max_ranges ranges, the smallest gaps are merged.
+    """
+    def __init__(self, merge_gap=16, max_ranges=256):
+        self.merge_gap = merge_gap
+        self.max_ranges = max_ranges
+        self.starts = []
+        self.stops = []
+
+    def __bool__(self):
+        return len(self.starts) > 0
+
+    def add(self, start, stop):
+        if stop > start:
+            self.starts.append(np.array([start], dtype=np.int64))
+            self.stops.append(np.array([stop], dtype=np.int64))
+
+    def add_rows(self, rows):
+        rows = np.asarray(rows, dtype=np.int64).reshape(-1)
+        if rows.shape[0] > 0:
+            self.starts.append(rows)
+            self.stops.append(rows + 1)
+
+    def clear(self):
+        self.starts = []
+        self.stops = []
+
+    def take(self):
+        """Returns the coalesced ranges [(start, stop), ...] and clears them"""
+        if not self.starts:
+            return []
+        starts = np.concatenate(self.starts)
+        stops = np.concatenate(self.stops)
+        self.clear()
+        order = np.argsort(starts, kind='stable')
+        starts = starts[order]
+        stops = np.maximum.accumulate(stops[order])
+        # a new range begins after a gap of more than merge_gap rows
+        begin = np.empty(starts.shape[0], dtype=bool)
+        begin[0] = True
+        begin[1:] = starts[1:] > stops[:-1] + self.merge_gap
+        first = np.flatnonzero(begin)
+        last = np.append(first[1:] - 1, starts.shape[0] - 1)
+        starts, stops = starts[first], stops[last]
+        if starts.shape[0] > self.max_ranges:
+            # keep the largest gaps only
+            gaps = starts[1:] - stops[:-1]
+            cut = np.sort(np.argsort(gaps)[gaps.shape[0] - self.max_ranges + 1:])
+            starts = np.append(starts[0], starts[cut + 1])
+            stops = np.append(stops[cut], stops[-1])
+        return list(zip(starts.tolist(), stops.tolist()))
+
+
+class KeyIndex:
+    """
+    A map from keys to int64 values for arrays of keys. The keys are kept
+    in sorted runs searched with np.searchsorted; a run is merged with the
+    previous one when it is at least half its size, so there are O(log n)
+    runs and every key is copied O(log n) times as the index grows.
+    """
+    def __init__(self):
+        self.keys = []    # sorted runs of keys, the largest first
+        self.values = []
+
+    def __len__(self):
+        return sum(k.shape[0] for k in self.keys)
+
+    def clear(self):
+        self.keys = []
+        self.values = []
+
+    def find(self, keys):
+        """The values of keys, -1 for the missing keys"""
+        values = np.full(keys.shape[0], -1, dtype=np.int64)
+        for run_keys, run_values in zip(self.keys, self.values):
+            pos = np.minimum(np.searchsorted(run_keys, keys), run_keys.shape[0] - 1)
+            found = run_keys[pos] == keys
+            values[found] = run_values[pos[found]]
+        return values
+
+    def add(self, keys, values):
+        """Add keys which are not in the index yet"""
+        if keys.shape[0] == 0:
+            return
+        order = np.argsort(keys, kind='stable')
+        self.keys.append(keys[order])
+        self.values.append(np.asarray(values, dtype=np.int64)[order])
+        while len(self.keys) > 1 and self.keys[-2].shape[0] <= 2 * self.keys[-1].shape[0]:
+            # a stable sort of two sorted runs is a merge
+            keys = np.concatenate(self.keys[-2:])
+            values = np.concatenate(self.values[-2:])
+            order = np.argsort(keys, kind='stable')
+            self.keys[-2:] = [keys[order]]
+            self.values[-2:] = [values[order]]
+
 
 class MeshItem(BaseItem):
     """
@@ -24,31 +165,72 @@ class MeshItem(BaseItem):
     Attributes:
         color (str or tuple): Accepts any valid matplotlib color (e.g., 'red', '#FF4500', (1.0, 0.5, 0.0)).
         wireframe (bool): If True, renders the mesh in wireframe mode.
+        indexed (bool): If True, the mesh is stored as deduplicated vertices
+            (12 bytes each, optional normals) and uint32 triangles (12 bytes
+            each), drawn with glDrawElements, instead of 52 bytes per face.
+            Keyed faces (set_incremental_data) are remapped to two triangles.
+            set_data deduplicates the vertices, which makes a load several
+            times slower (see test/benchmark_mesh_indexed.py).
+        host_mirror (bool): If False, the faces are not kept in host memory,
+            they are only queued until uploaded to the GPU. Suits append-only
+            streams of large meshes. Not supported with indexed.
     """
-    def __init__(self, color='lightblue', wireframe=False):
+    def __init__(self, color='lightblue', wireframe=False, indexed=False,
+                 host_mirror=True):
         super(MeshItem, self).__init__()
         self.wireframe = wireframe
         self.color = color
         self.flat_rgb = text_to_rgba(color, flat=True)
+        self.indexed = indexed
+        if indexed and not host_mirror:
+            raise ValueError("host_mirror=False is not supported with indexed=True")
+        self.host_mirror = host_mirror
         
         # Incremental buffer management
         self.FACE_CAPACITY = 1000000    # Initial capacity for faces
+        # the capacity grows geometrically, so appending is amortized O(1).
+        # set growth_factor <= 1 to grow by fixed FACE_CAPACITY steps.
+        self.growth_factor = 2.0
         
         # Faces buffer: N x 13 numpy array
         # Each row: [v0.x, v0.y, v0.z, v1.x, v1.y, v1.z, v2.x, v2.y, v2.z, v3.x, v3.y, v3.z, good]
-        self.faces = np.zeros((self.FACE_CAPACITY, 13), dtype=np.float32)
+        use_faces = not indexed and host_mirror
+        self.faces = np.zeros((self.FACE_CAPACITY if use_faces else 0, 13), dtype=np.float32)
+        # the faces to upload without host mirror: [(first row or rows, faces), ...]
+        self.pending_faces = []
         
         # valid_f_top: pointer to end of valid faces
         self.valid_f_top = 0
         
         # key2index: mapping from face_key to face buffer index
+        # (to the first of its two triangles in indexed mode)
         self.key2index = {}  # {face_key: face_index}
+
+        # face_index: mapping from the int64 keys of set_incremental_faces
+        # to face buffer index
+        self.face_index = KeyIndex()
+
+        # Indexed mode: vertices (N x 3), optional normals (N x 3) and
+        # triangles (M x 3 vertex indices)
+        self.vertices = np.zeros((0, 3), dtype=np.float32)
+        self.normals = None
+        self.triangles = np.zeros((0, 3), dtype=np.uint32)
+        self.valid_v_top = 0
+        self.valid_t_top = 0
+        # vertex_index: mapping from the hash of vertex position (hash_points)
+        # to vertex index
+        self.vertex_index = KeyIndex()
         
         # OpenGL objects
         self.vao = None
         self.vbo = None
+        self.nbo = None  # normals (indexed mode)
+        self.ebo = None  # triangles (indexed mode)
         self.program = None
         self._gpu_face_capacity = 0    # Track GPU buffer capacity
+        self._gpu_vertex_capacity = 0
+        self._gpu_normal_capacity = 0
+        self._gpu_triangle_capacity = 0
         
         # Fixed rendering parameters (not adjustable via UI)
         self.enable_lighting = True
@@ -64,6 +246,11 @@ class MeshItem(BaseItem):
         # Settings flag
         self.need_update_setting = True
         self.need_update_buffer = True
+        # the modified rows to upload, if need_update_buffer is set
+        # without any, the whole valid buffers are uploaded
+        self.dirty_faces = DirtyRanges()
+        self.dirty_vertices = DirtyRanges()  # vertices and normals
+        self.dirty_triangles = DirtyRanges()
         self.path = os.path.dirname(__file__)
     
         
@@ -145,40 +332,49 @@ class MeshItem(BaseItem):
             self.color = color
             self.flat_rgb = text_to_rgba(color, flat=True)
             self.need_update_setting = True
+            self.request_redraw()
         except ValueError:
             pass
 
     def update_wireframe(self, value):
         self.wireframe = value
+        self.request_redraw()
         
     def update_enable_lighting(self, value):
         self.enable_lighting = value
         self.need_update_setting = True
+        self.request_redraw()
         
     def update_line_width(self, value):
         self.line_width = value
         self.need_update_setting = True
+        self.request_redraw()
         
     def update_ambient_strength(self, value):
         self.ambient_strength = value
         self.need_update_setting = True
+        self.request_redraw()
         
     def update_diffuse_strength(self, value):
         self.diffuse_strength = value
         self.need_update_setting = True
+        self.request_redraw()
         
     def update_specular_strength(self, value):
         self.specular_strength = value
         self.need_update_setting = True
+        self.request_redraw()
         
     def update_shininess(self, value):
         self.shininess = value
         self.need_update_setting = True
+        self.request_redraw()
 
     def update_alpha(self, value):
         """Update mesh alpha (opacity)"""
         self.alpha = float(value)
         self.need_update_setting = True
+        self.request_redraw()
 
     def set_data(self, data):
         """
@@ -210,6 +406,11 @@ class MeshItem(BaseItem):
         if not good_format:
             raise ValueError("Invalid data shape")
 
+        if self.indexed:
+            vertices, index = dedup_vertices(data)
+            self.set_indexed_data(vertices, index.reshape(-1, 3))
+            return
+
         # Convert to Nx13 numpy array
         N = data.shape[0] // 3
         faces = np.zeros((N, 13), dtype=np.float32)
@@ -219,9 +420,41 @@ class MeshItem(BaseItem):
         faces[:, 6:9]  = tmp[:, 6:9]   # copy v2
         faces[:, 9:12] = tmp[:, 6:9]   # copy v3 from v2 (degenerate quad)
         faces[:, 12] = 1.0             # set good=1.0
-        self.faces = faces
+        if self.host_mirror:
+            self.faces = faces
+            self.dirty_faces.add(0, N)
+        else:
+            self.pending_faces.append((0, faces))
         self.valid_f_top = N
         self.need_update_buffer = True
+        self.request_redraw()
+
+    def set_indexed_data(self, vertices, triangles, normals=None):
+        """
+        Set a mesh of shared vertices.
+
+        Args:
+            vertices: Nx3 array of vertex positions.
+            triangles: Mx3 array of vertex indices.
+            normals: Nx3 array of vertex normals (smooth shading), optional.
+                Without normals, every triangle is shaded by its face normal.
+        """
+        vertices = np.asarray(vertices, dtype=np.float32).reshape(-1, 3)
+        triangles = np.asarray(triangles).reshape(-1, 3)
+        if not self.indexed:
+            self.set_data(vertices[triangles].reshape(-1, 3))
+            return
+        self.clear_mesh()
+        self.vertices = vertices.copy()
+        self.triangles = triangles.astype(np.uint32)
+        if normals is not None:
+            self.normals = np.asarray(normals, dtype=np.float32).reshape(-1, 3).copy()
+        self.valid_v_top = vertices.shape[0]
+        self.valid_t_top = triangles.shape[0]
+        self.dirty_vertices.add(0, self.valid_v_top)
+        self.dirty_triangles.add(0, self.valid_t_top)
+        self.need_update_buffer = True
+        self.request_redraw()
 
 
     def set_incremental_data(self, fs):
@@ -241,10 +474,12 @@ class MeshItem(BaseItem):
         if not fs:
             return
 
+        if self.indexed:
+            self._set_incremental_indexed(fs)
+            return
+
         # Ensure enough capacity in faces buffer
-        # wasted cases are better than frequent expansions
-        while self.valid_f_top + len(fs) > len(self.faces):
-            self._expand_face_buffer()
+        self._reserve_faces(len(fs))
 
         # Optimization: Separate updates from new insertions to avoid
         # dictionary lookup performance degradation during growth
@@ -266,41 +501,223 @@ class MeshItem(BaseItem):
         if update_data:
             indices = np.array(update_idxs, dtype=np.int32)
             data = np.array(update_data, dtype=np.float32)
-            self.faces[indices] = data
+            self._put_faces(indices, data)
+            self.need_update_buffer = True
+            self.request_redraw()
         
         # Batch insert new faces
         if new_data:
             n_new = len(new_data)
             data = np.array(new_data, dtype=np.float32)
-            self.faces[self.valid_f_top: self.valid_f_top + n_new] = data
+            self._put_faces(self.valid_f_top, data)
             # Update key2index mapping for new faces
             for i, face_key in enumerate(new_keys):
                 self.key2index[face_key] = self.valid_f_top + i
             self.valid_f_top += n_new
             self.need_update_buffer = True
+            self.request_redraw()
     
-    def _expand_face_buffer(self):
-        """Expand the faces buffer when capacity is reached"""
-        new_capacity = len(self.faces) + self.FACE_CAPACITY
-        new_buffer = np.zeros((new_capacity, 13), dtype=np.float32)
-        new_buffer[:len(self.faces)] = self.faces
+    def set_incremental_faces(self, keys, faces):
+        """
+        Incrementally update mesh with arrays of keyed faces, the bulk
+        version of set_incremental_data for large updates (e.g. the changed
+        voxels of a mesher).
+        Args:
+            keys: N int64 face keys (e.g. packed voxel keys). If a key is
+                repeated, its last face is used.
+            faces: Nx13 array, the same rows as set_incremental_data.
+        Note:
+            The keys are indexed apart from the keys of set_incremental_data,
+            so a face should always be updated through the same method.
+        """
+        keys = np.asarray(keys, dtype=np.int64).reshape(-1)
+        faces = np.asarray(faces, dtype=np.float32).reshape(-1, 13)
+        if keys.shape[0] != faces.shape[0]:
+            raise ValueError("keys and faces have different lengths")
+        if keys.shape[0] == 0:
+            return
+
+        # sorted unique keys, the last face of a repeated key is kept
+        keys, last = np.unique(keys[::-1], return_index=True)
+        faces = faces[faces.shape[0] - 1 - last]
+
+        # resolve the keys: the face index, or -1 for the new keys
+        rows = self.face_index.find(keys)
+        new = rows < 0
+        n_new = int(np.count_nonzero(new))
+
+        if self.indexed:
+            tris = self._face_triangles(faces)
+            rows[new] = self.valid_t_top + 2 * np.arange(n_new)
+            self._reserve_indexed(0, 2 * n_new)
+            self.triangles[rows] = tris[:, 0]
+            self.triangles[rows + 1] = tris[:, 1]
+            self.dirty_triangles.add_rows(rows)
+            self.dirty_triangles.add_rows(rows + 1)
+            self.valid_t_top += 2 * n_new
+        else:
+            self._reserve_faces(n_new)
+            rows[new] = self.valid_f_top + np.arange(n_new)
+            if n_new == keys.shape[0]:
+                # only new faces, written as one block
+                self._put_faces(self.valid_f_top, faces)
+            else:
+                self._put_faces(rows, faces)
+            self.valid_f_top += n_new
+
+        self.face_index.add(keys[new], rows[new])
+        self.need_update_buffer = True
+        self.request_redraw()
+
+    def _face_triangles(self, data):
+        """
+        The two triangles (Nx2x3 vertex indices) of Nx13 keyed faces.
+        The vertices are appended to the vertex buffer if new.
+        """
+        n = data.shape[0]
+        ids = self._vertex_ids(data[:, :12].reshape(-1, 3)).reshape(n, 4)
+        # Triangle 1: (v0, v1, v2), Triangle 2: (v0, v1, v3), as mesh_geom.glsl.
+        # Bad faces and the second triangle of a triangle are degenerate.
+        tris = np.empty((n, 2, 3), dtype=np.uint32)
+        tris[:, 0] = ids[:, [0, 1, 2]]
+        tris[:, 1] = ids[:, [0, 1, 3]]
+        tris[ids[:, 3] == ids[:, 2], 1] = ids[ids[:, 3] == ids[:, 2], :1]
+        tris[data[:, 12] != 1.0] = ids[data[:, 12] != 1.0, :1, np.newaxis]
+        return tris
+
+    def _set_incremental_indexed(self, fs):
+        """
+        Remap keyed faces to two triangles of shared vertices.
+        The vertices no longer used by updated faces are kept.
+        """
+        data = np.array(list(fs.values()), dtype=np.float32).reshape(-1, 13)
+        n = data.shape[0]
+        tris = self._face_triangles(data)
+
+        rows = np.empty(n, dtype=np.int64)
+        n_new = 0
+        for i, face_key in enumerate(fs.keys()):
+            row = self.key2index.get(face_key)
+            if row is None:
+                row = self.valid_t_top + 2 * n_new
+                self.key2index[face_key] = row
+                n_new += 1
+            rows[i] = row
+        self._reserve_indexed(0, 2 * n_new)
+        self.triangles[rows] = tris[:, 0]
+        self.triangles[rows + 1] = tris[:, 1]
+        self.dirty_triangles.add_rows(rows)
+        self.dirty_triangles.add_rows(rows + 1)
+        self.valid_t_top += 2 * n_new
+        self.need_update_buffer = True
+        self.request_redraw()
+
+    def _vertex_ids(self, points):
+        """The vertex indices of points, the new positions are appended"""
+        uniq, inverse = dedup_vertices(points)
+        h = hash_points(uniq)
+        index = self.vertex_index.find(h)
+        found = index >= 0
+        ids = index.astype(np.uint32)
+        # the same hash as another position: append the vertex, not indexed
+        clash = np.zeros_like(found)
+        clash[found] = np.any(self.vertices[ids[found]].view(np.uint32) !=
+                              uniq[found].view(np.uint32), axis=1)
+        new = ~found | clash
+        n_new = int(np.count_nonzero(new))
+        if n_new:
+            self._reserve_indexed(n_new, 0)
+            top = self.valid_v_top
+            ids[new] = top + np.arange(n_new)
+            self.vertices[top:top + n_new] = uniq[new]
+            self.dirty_vertices.add(top, top + n_new)
+            self.valid_v_top += n_new
+            self.vertex_index.add(h[~found], ids[~found])
+        return ids[inverse]
+
+    def _reserve_indexed(self, n_vertices, n_triangles):
+        """Expand the vertex and triangle buffers for the new elements"""
+        need = self.valid_v_top + n_vertices
+        if need > len(self.vertices):
+            capacity = self.next_capacity(len(self.vertices), need)
+            new_buffer = np.empty((capacity, 3), dtype=np.float32)
+            new_buffer[:self.valid_v_top] = self.vertices[:self.valid_v_top]
+            self.vertices = new_buffer
+            if self.normals is not None:
+                # the vertices of keyed faces have no normal
+                new_buffer = np.zeros((capacity, 3), dtype=np.float32)
+                new_buffer[:self.valid_v_top] = self.normals[:self.valid_v_top]
+                self.normals = new_buffer
+        need = self.valid_t_top + n_triangles
+        if need > len(self.triangles):
+            capacity = self.next_capacity(len(self.triangles), need)
+            new_buffer = np.empty((capacity, 3), dtype=np.uint32)
+            new_buffer[:self.valid_t_top] = self.triangles[:self.valid_t_top]
+            self.triangles = new_buffer
+
+    def next_capacity(self, capacity, need):
+        """The capacity of a growing buffer (in rows) to hold need rows"""
+        if need <= capacity:
+            return capacity
+        if self.growth_factor > 1:
+            return max(need, int(capacity * self.growth_factor))
+        return max(need, capacity + self.FACE_CAPACITY)
+
+    def _reserve_faces(self, n_faces):
+        """Expand the faces buffer for n_faces new faces"""
+        need = self.valid_f_top + n_faces
+        if not self.host_mirror or need <= len(self.faces):
+            return
+        new_buffer = np.empty((self.next_capacity(len(self.faces), need), 13), dtype=np.float32)
+        new_buffer[:self.valid_f_top] = self.faces[:self.valid_f_top]
         self.faces = new_buffer
+
+    def _put_faces(self, rows, faces):
+        """
+        Write faces to the faces buffer, or queue them without host mirror.
+        Args:
+            rows: the first row of consecutive faces, or an array of rows.
+            faces: Nx13 float32 array.
+        """
+        if self.host_mirror:
+            if np.isscalar(rows):
+                self.faces[rows:rows + faces.shape[0]] = faces
+                self.dirty_faces.add(rows, rows + faces.shape[0])
+            else:
+                self.faces[rows] = faces
+                self.dirty_faces.add_rows(rows)
+        else:
+            self.pending_faces.append((rows, faces))
     
     def clear_mesh(self):
         """Clear all mesh data and reset buffers"""
         self.valid_f_top = 0
         self.key2index.clear()
+        self.face_index.clear()
+        self.valid_v_top = 0
+        self.valid_t_top = 0
+        self.dirty_faces.clear()
+        self.pending_faces = []
+        self.dirty_vertices.clear()
+        self.dirty_triangles.clear()
+        self.vertex_index.clear()
+        self.normals = None
         if hasattr(self, 'indices_array'):
             self.indices_array = np.array([], dtype=np.uint32)
+        self.request_redraw()
 
     def initialize_gl(self):
         """OpenGL initialization"""
         # Use instanced mesh shaders with geometry shader for GPU-side triangle generation
         vert_shader = open(self.path + '/../shaders/mesh_vert.glsl', 'r').read()
         geom_shader = open(self.path + '/../shaders/mesh_geom.glsl', 'r').read()
+        if self.indexed:
+            # Indexed triangles, the geometry shader computes the face normals
+            vert_shader = open(self.path + '/../shaders/mesh_indexed_vert.glsl', 'r').read()
+            geom_shader = open(self.path + '/../shaders/mesh_indexed_geom.glsl', 'r').read()
         frag_shader = open(self.path + '/../shaders/mesh_frag.glsl', 'r').read()
         try:
-            program = shaders.compileProgram(
+            program = compile_program(
                 shaders.compileShader(vert_shader, GL_VERTEX_SHADER),
                 shaders.compileShader(geom_shader, GL_GEOMETRY_SHADER),
                 shaders.compileShader(frag_shader, GL_FRAGMENT_SHADER),
@@ -314,25 +731,28 @@ class MeshItem(BaseItem):
         Update GPU buffer with face data (no separate vertex buffer).
         Each face contains embedded vertex positions (13 floats).
         Geometry shader generates triangles on GPU from face vertices.
-        Dynamically resizes GPU buffer when Python buffer expands.
+        The GPU buffer grows geometrically with the faces, the uploaded
+        faces are copied on the GPU side.
         """
+        state = self.glwidget().gl_state
+        if self.indexed:
+            self._update_indexed_buffer()
+            return
         if self.valid_f_top == 0:
             return
         
         # Initialize buffers on first call
         if self.vao is None:
             self.vao = glGenVertexArrays(1)
-            self.vbo = glGenBuffers(1)
             self._gpu_face_capacity = 0
         
-        # Check if we need to reallocate VBO for faces
-        if self._gpu_face_capacity < len(self.faces):
-            glBindVertexArray(self.vao)
+        # Check if we need a larger VBO for faces
+        if self._gpu_face_capacity < self.valid_f_top:
+            capacity = self.next_capacity(self._gpu_face_capacity, self.valid_f_top)
+            self.vbo = resize_buffer(self.vbo, capacity * 52,
+                                     min(self._gpu_face_capacity, self.valid_f_top) * 52)
+            state.bind_vertex_array(self.vao)
             glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
-            glBufferData(GL_ARRAY_BUFFER,
-                        self.faces.nbytes,
-                        None,
-                        GL_DYNAMIC_DRAW)
             
             # Setup face attributes (per-instance)
             # Face data: [v0.x, v0.y, v0.z, v1.x, v1.y, v1.z, v2.x, v2.y, v2.z, v3.x, v3.y, v3.z, good]
@@ -363,21 +783,130 @@ class MeshItem(BaseItem):
             glVertexAttribPointer(5, 1, GL_FLOAT, GL_FALSE, 52, ctypes.c_void_p(48))
             glVertexAttribDivisor(5, 1)
             
-            glBindVertexArray(0)
+            state.bind_vertex_array(0)
             glBindBuffer(GL_ARRAY_BUFFER, 0)
-            self._gpu_face_capacity = len(self.faces)
+            self._gpu_face_capacity = capacity
         
-        # Upload faces to VBO
+        # Upload the modified faces to VBO
         if self.need_update_buffer:
             glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
-            glBufferSubData(GL_ARRAY_BUFFER,
-                           0,
-                           self.valid_f_top * 13 * 4,  # 13 floats * 4 bytes per face
-                           self.faces[:self.valid_f_top])
+            if self.host_mirror:
+                ranges = self.dirty_faces.take() or [(0, self.valid_f_top)]
+                self._upload_rows(GL_ARRAY_BUFFER, self.faces, ranges, self.valid_f_top)
+            else:
+                self._upload_pending_faces()
             glBindBuffer(GL_ARRAY_BUFFER, 0)
             self.need_update_buffer = False
-            glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+    def _upload_pending_faces(self):
+        """Upload the queued faces (host_mirror=False) to the bound VBO"""
+        profiler = self.glwidget().profiler
+        for rows, faces in self.pending_faces:
+            profiler.count_upload(faces.nbytes)
+            if np.isscalar(rows):
+                glBufferSubData(GL_ARRAY_BUFFER, rows * 52, faces.nbytes, faces)
+                continue
+            # upload the runs of consecutive rows
+            order = np.argsort(rows, kind='stable')
+            rows, faces = rows[order], faces[order]
+            breaks = np.flatnonzero(np.diff(rows) != 1) + 1
+            for start, stop in zip(np.r_[0, breaks].tolist(),
+                                   np.r_[breaks, rows.shape[0]].tolist()):
+                glBufferSubData(GL_ARRAY_BUFFER, int(rows[start]) * 52,
+                                (stop - start) * 52, faces[start:stop])
+        self.pending_faces = []
         
+    def _update_indexed_buffer(self):
+        """
+        Upload the vertices, normals and triangles of the indexed mesh.
+        The GPU buffers grow geometrically, the uploaded rows are copied on
+        the GPU side.
+        """
+        state = self.glwidget().gl_state
+        if self.vao is None:
+            self.vao = glGenVertexArrays(1)
+            self._gpu_vertex_capacity = 0
+            self._gpu_normal_capacity = 0
+            self._gpu_triangle_capacity = 0
+
+        if not self.need_update_buffer:
+            return
+
+        if self.dirty_vertices or self.dirty_triangles:
+            vertex_ranges = self.dirty_vertices.take()
+            triangle_ranges = self.dirty_triangles.take()
+        else:
+            vertex_ranges = [(0, self.valid_v_top)]
+            triangle_ranges = [(0, self.valid_t_top)]
+        resized = False
+        if self._gpu_vertex_capacity < self.valid_v_top:
+            capacity = self.next_capacity(self._gpu_vertex_capacity, self.valid_v_top)
+            self.vbo = resize_buffer(self.vbo, capacity * 12,
+                                     min(self._gpu_vertex_capacity, self.valid_v_top) * 12)
+            self._gpu_vertex_capacity = capacity
+            resized = True
+        if self.normals is not None and self._gpu_normal_capacity < self.valid_v_top:
+            capacity = self.next_capacity(self._gpu_normal_capacity, self.valid_v_top)
+            self.nbo = resize_buffer(self.nbo, capacity * 12,
+                                     min(self._gpu_normal_capacity, self.valid_v_top) * 12)
+            self._gpu_normal_capacity = capacity
+            resized = True
+        if self._gpu_triangle_capacity < self.valid_t_top:
+            capacity = self.next_capacity(self._gpu_triangle_capacity, self.valid_t_top)
+            self.ebo = resize_buffer(self.ebo, capacity * 12,
+                                     min(self._gpu_triangle_capacity, self.valid_t_top) * 12)
+            self._gpu_triangle_capacity = capacity
+            resized = True
+
+        # the element buffer is bound to the VAO
+        state.bind_vertex_array(self.vao)
+        if resized:
+            # position (location 0), normal (location 1) - vec3
+            glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+            glEnableVertexAttribArray(0)
+            glVertexAttribPointer(0, 3, GL_FLOAT, GL_FALSE, 12, ctypes.c_void_p(0))
+            if self.nbo is not None:
+                glBindBuffer(GL_ARRAY_BUFFER, self.nbo)
+                glVertexAttribPointer(1, 3, GL_FLOAT, GL_FALSE, 12, ctypes.c_void_p(0))
+            glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, self.ebo)
+
+        glBindBuffer(GL_ARRAY_BUFFER, self.vbo)
+        self._upload_rows(GL_ARRAY_BUFFER, self.vertices, vertex_ranges, self.valid_v_top)
+        if self.normals is not None:
+            # without normals, the shader uses the face normals (has_normal)
+            glEnableVertexAttribArray(1)
+            glBindBuffer(GL_ARRAY_BUFFER, self.nbo)
+            self._upload_rows(GL_ARRAY_BUFFER, self.normals, vertex_ranges, self.valid_v_top)
+        else:
+            glDisableVertexAttribArray(1)
+        self._upload_rows(GL_ELEMENT_ARRAY_BUFFER, self.triangles,
+                          triangle_ranges, self.valid_t_top)
+        state.bind_vertex_array(0)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+        self.need_update_buffer = False
+
+    def _upload_rows(self, target, buffer, ranges, valid_top):
+        """
+        Upload rows of a buffer to the buffer object bound to target.
+        Args:
+            ranges: [(start, stop), ...] rows, clipped to valid_top.
+        """
+        row_nbytes = buffer.strides[0]
+        profiler = self.glwidget().profiler
+        for start, stop in ranges:
+            stop = min(stop, valid_top)
+            if stop > start:
+                glBufferSubData(target, start * row_nbytes, (stop - start) * row_nbytes,
+                                buffer[start:stop])
+                profiler.count_upload((stop - start) * row_nbytes)
+
+    def gpu_nbytes(self):
+        """The size of the GPU buffers of the mesh in bytes"""
+        if self.indexed:
+            return (self._gpu_vertex_capacity + self._gpu_normal_capacity +
+                    self._gpu_triangle_capacity) * 12
+        return self._gpu_face_capacity * 52
+
     def update_setting(self):
         """Set fixed rendering parameters (called once during initialization)"""
         if not self.need_update_setting:
@@ -400,47 +929,50 @@ class MeshItem(BaseItem):
         Render the mesh using instanced rendering with geometry shader.
         Each face instance is rendered as a point, geometry shader generates 2 triangles.
         GPU filters faces based on good flag.
+        In indexed mode, the triangles are drawn with glDrawElements.
         """
-        if self.valid_f_top == 0:
+        state = self.glwidget().gl_state
+        if (self.valid_t_top if self.indexed else self.valid_f_top) == 0:
             return
         
-        glUseProgram(self.program)
+        state.use_program(self.program)
     
         self.update_render_buffer()
         self.update_setting()
         
-        view_matrix = self.glwidget().view_matrix
-        set_uniform(self.program, view_matrix, 'view')
-        project_matrix = self.glwidget().projection_matrix
-        set_uniform(self.program, project_matrix, 'projection')
+        # the matrices are in the camera block of the glwidget
         view_pos = self.glwidget().center
         set_uniform(self.program, np.array(view_pos), 'view_pos')
             
         # Enable blending and depth testing
-        glEnable(GL_BLEND)
-        glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
-        glEnable(GL_DEPTH_TEST)
-        glDisable(GL_CULL_FACE)  # two-sided rendering
+        state.enable(GL_BLEND)
+        state.blend_func(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+        state.enable(GL_DEPTH_TEST)
+        state.disable(GL_CULL_FACE)  # two-sided rendering
         
         # Set line width
-        glLineWidth(self.line_width)
+        state.line_width(self.line_width)
         
         # Bind VAO (vertex positions are now in VBO attributes)
-        glBindVertexArray(self.vao)
+        state.bind_vertex_array(self.vao)
                 
         if self.wireframe:
-            glPolygonMode(GL_FRONT_AND_BACK, GL_LINE)
+            state.polygon_mode(GL_LINE)
         else:
-            glPolygonMode(GL_FRONT_AND_BACK, GL_FILL)
+            state.polygon_mode(GL_FILL)
         
-        # Draw using instanced rendering
-        # Input: POINTS (one per face instance)
-        # Geometry shader generates 2 triangles (6 vertices) per point
-        glDrawArraysInstanced(GL_POINTS, 0, 1, self.valid_f_top)
+        if self.indexed:
+            set_uniform(self.program, int(self.normals is not None), 'has_normal')
+            glDrawElements(GL_TRIANGLES, self.valid_t_top * 3, GL_UNSIGNED_INT, None)
+        else:
+            # Draw using instanced rendering
+            # Input: POINTS (one per face instance)
+            # Geometry shader generates 2 triangles (6 vertices) per point
+            glDrawArraysInstanced(GL_POINTS, 0, 1, self.valid_f_top)
+        self.glwidget().profiler.count_draw()
             
-        glPolygonMode(GL_FRONT_AND_BACK, GL_FILL)
-        glBindVertexArray(0)
-        glDisable(GL_DEPTH_TEST)
-        glDisable(GL_BLEND)
-        glUseProgram(0)
+        state.polygon_mode(GL_FILL)
+        state.bind_vertex_array(0)
+        state.disable(GL_BLEND)
+        state.use_program(0)
         
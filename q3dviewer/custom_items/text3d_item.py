@@ -66,9 +66,11 @@ class Text3DItem(BaseItem):
         if not append:
             self.data_list = []
         self.data_list.extend(data)
+        self.request_redraw()
 
     def clear_data(self):
         self.data_list = []
+        self.request_redraw()
 
 
     def initialize_gl(self):
@@ -89,6 +91,7 @@ class Text3DItem(BaseItem):
 
 
     def paint(self):
+        state = self.glwidget().gl_state
         for item in self.data_list:
             # Handle both dictionary and string formats
             if isinstance(item, dict):
@@ -116,7 +119,7 @@ class Text3DItem(BaseItem):
             
             if point_size > 0.0:
                 # draw a point at the position
-                glPointSize(point_size)
+                state.point_size(point_size)
                 glBegin(GL_POINTS)
                 glVertex3f(*pos)
                 glEnd()
@@ -145,7 +148,7 @@ class Text3DItem(BaseItem):
                 color = item1.get('color', (1.0, 1.0, 1.0, 1.0))
                 if line_width > 0.0:
                     glColor4f(*color)
-                    glLineWidth(line_width)
+                    state.line_width(line_width)
                     glBegin(GL_LINES)
                     glVertex3f(*pos1)
                     glVertex3f(*pos2)
@@ -14,7 +14,7 @@ class Text2DItem(BaseItem):
 
     Attributes:
         pos: (x, y), the 2D position of the text in pixels
-        text: str, the text to display
+        text: str, the text to display, may have several lines
         font: QFont, the font of the text
         color: str, the color of the text in matplotlib format
         size: int, the font size of the text
@@ -57,12 +57,14 @@ class Text2DItem(BaseItem):
                 elif arg == 'size':
                     self.font.setPointSize(value)
                 setattr(self, arg, value)
+        self.request_redraw()
 
     def set_color(self, color):
         try:
             self.rgb = text_to_rgba(color)
         except ValueError:
             print("Invalid color format. Use mathplotlib color format.")
+        self.request_redraw()
 
     def paint(self):
         if len(self.text) < 1:
@@ -74,5 +76,11 @@ class Text2DItem(BaseItem):
         painter.setFont(self.font)
         painter.setRenderHints(QtGui.QPainter.RenderHint.Antialiasing |
                                QtGui.QPainter.RenderHint.TextAntialiasing)
-        painter.drawText(text_pos, self.text)
+        # drawText at a point does not break the lines.
+        line_spacing = QtGui.QFontMetricsF(self.font).lineSpacing()
+        for line in self.text.split('\n'):
+            painter.drawText(text_pos, line)
+            text_pos += QtCore.QPointF(0, line_spacing)
         painter.end()
+        # QPainter changes the gl state behind the cache.
+        self.glwidget().gl_state.invalidate()
@@ -3,6 +3,7 @@ Copyright 2024 Panasonic Advanced Technology Development Co.,Ltd. (Liu Yang)
 Distributed under MIT license. See LICENSE for more information.
 """
 
+import numpy as np
 from q3dviewer.Qt import QtCore
 from q3dviewer.Qt.QtWidgets import QWidget, QComboBox, QVBoxLayout, QLabel, QLineEdit, QCheckBox, QGroupBox
 from q3dviewer.Qt.QtGui import QKeyEvent
@@ -51,6 +52,7 @@ class GLWidget(BaseGLWidget):
     def __init__(self):
         self.followed_name = 'none'
         self.named_items = {}
+        self.item_names = {}
         self.color_str = 'black'
         self.followable_item_name = None
         self.setting_window = SettingWindow()
@@ -94,7 +96,8 @@ class GLWidget(BaseGLWidget):
                 self.old_center = self.center
                 return
             delta = new_center - self.old_center
-            self.set_center(self.center + delta)
+            if np.any(delta != 0):
+                self.set_center(self.center + delta)
             self.old_center = new_center
         super().update()
 
@@ -124,6 +127,12 @@ class GLWidget(BaseGLWidget):
         checkbox_show_center.stateChanged.connect(self.change_show_center)
         layout.addWidget(checkbox_show_center)
 
+        checkbox_profile = QCheckBox("Show Profiler")
+        checkbox_profile.setChecked(self.profiler.enabled)
+        checkbox_profile.stateChanged.connect(
+            lambda state: self.set_profiling(bool(state)))
+        layout.addWidget(checkbox_profile)
+
     def initial_followable(self):
         self.followable_item_name = ['none']
         for name, item in self.named_items.items():
@@ -140,10 +149,16 @@ class GLWidget(BaseGLWidget):
 
     def add_item_with_name(self, name, item):
         self.named_items.update({name: item})
+        self.item_names[item._id] = name
         if not item._disable_setting:
             self.setting_window.add_setting(name, item)
         super().add_item(item)
 
+    def item_name(self, item):
+        if item._id in self.item_names:
+            return self.item_names[item._id]
+        return super().item_name(item)
+
     def open_setting_window(self):
         if self.setting_window.isVisible():
             self.setting_window.raise_()
@@ -153,6 +168,7 @@ class GLWidget(BaseGLWidget):
 
     def change_show_center(self, state):
         self.enable_show_center = state
+        self.request_redraw()
 
     def get_camera_pose(self):
         """Get current camera pose parameters"""
@@ -0,0 +1,388 @@
+"""
+Copyright 2024 Panasonic Advanced Technology Development Co.,Ltd. (Liu Yang)
+Distributed under MIT license. See LICENSE for more information.
+"""
+
+"""
+Render the items without a window (e.g. on a server or a CI node, with
+Mesa llvmpipe). PyOpenGL must use an offscreen platform, set it before
+importing q3dviewer:
+    import os
+    os.environ['PYOPENGL_PLATFORM'] = 'egl'  # or 'osmesa'
+"""
+
+import ctypes
+import numpy as np
+from OpenGL import platform
+from OpenGL.GL import *
+from q3dviewer.Qt import Q3D_PROFILE
+from q3dviewer.base_glwidget import BaseGLWidget
+from q3dviewer.utils.gl_helper import GLState, CameraBlock
+from q3dviewer.utils.profiler import FrameProfiler
+
+# the GL versions tried for the context (compatibility profile), the
+# gaussians need 4.3 for the compute shaders.
+GL_VERSIONS = [(4, 5), (4, 3), (3, 3)]
+
+
+class EGLContext:
+    """
+    A surfaceless EGL context, the scene is drawn in a framebuffer object.
+    The display is shared by the contexts of the process, it is terminated
+    with the last one.
+    """
+    display_refs = {}  # the number of contexts of each display
+
+    def __init__(self):
+        from OpenGL import EGL
+        self.EGL = EGL
+        self.display = self.get_display()
+        self.display_key = ctypes.cast(self.display, ctypes.c_void_p).value
+        EGLContext.display_refs[self.display_key] = \
+            EGLContext.display_refs.get(self.display_key, 0) + 1
+        config = EGL.EGLConfig()
+        num = EGL.EGLint()
+        # no surface is needed (the default is a window)
+        attrs = (EGL.EGLint * 5)(EGL.EGL_SURFACE_TYPE, 0,
+                                 EGL.EGL_RENDERABLE_TYPE, EGL.EGL_OPENGL_BIT, EGL.EGL_NONE)
+        EGL.eglChooseConfig(self.display, attrs, ctypes.pointer(config), 1, ctypes.pointer(num))
+        if num.value == 0:
+            self.release_display()
+            raise RuntimeError("[Offscreen] No EGL config for OpenGL.")
+        EGL.eglBindAPI(EGL.EGL_OPENGL_API)
+        self.context = EGL.EGL_NO_CONTEXT
+        for major, minor in GL_VERSIONS:
+            attrs = (EGL.EGLint * 7)(
+                EGL.EGL_CONTEXT_MAJOR_VERSION, major,
+                EGL.EGL_CONTEXT_MINOR_VERSION, minor,
+                EGL.EGL_CONTEXT_OPENGL_PROFILE_MASK,
+                EGL.EGL_CONTEXT_OPENGL_COMPATIBILITY_PROFILE_BIT, EGL.EGL_NONE)
+            try:
+                self.context = EGL.eglCreateContext(self.display, config,
+                                                    EGL.EGL_NO_CONTEXT, attrs)
+            except EGL.EGLError:
+                continue
+            if self.context != EGL.EGL_NO_CONTEXT:
+                break
+        if self.context == EGL.EGL_NO_CONTEXT:
+            self.release_display()
+            raise RuntimeError("[Offscreen] Failed to create an EGL context.")
+
+    def get_display(self):
+        # without a window system, the display of the default platform can't
+        # be initialized: try the surfaceless platform of Mesa, then the
+        # first device (e.g. a headless GPU).
+        EGL = self.EGL
+        from OpenGL.EGL.EXT.platform_base import eglGetPlatformDisplayEXT
+        extensions = EGL.eglQueryString(EGL.EGL_NO_DISPLAY, EGL.EGL_EXTENSIONS) or b''
+        displays = []
+        if b'EGL_MESA_platform_surfaceless' in extensions:
+            EGL_PLATFORM_SURFACELESS_MESA = 0x31DD
+            displays.append(lambda: eglGetPlatformDisplayEXT(
+                EGL_PLATFORM_SURFACELESS_MESA, EGL.EGL_DEFAULT_DISPLAY, None))
+        if b'EGL_EXT_platform_device' in extensions:
+            displays.append(self.get_device_display)
+        displays.append(lambda: EGL.eglGetDisplay(EGL.EGL_DEFAULT_DISPLAY))
+        major, minor = EGL.EGLint(), EGL.EGLint()
+        for get_display in displays:
+            try:
+                display = get_display()
+                if display and EGL.eglInitialize(display, ctypes.pointer(major),
+                                                 ctypes.pointer(minor)):
+                    return display
+            except EGL.EGLError:
+                continue
+        raise RuntimeError("[Offscreen] Failed to initialize an EGL display.")
+
+    def get_device_display(self):
+        EGL = self.EGL
+        from OpenGL.EGL.EXT.platform_base import eglGetPlatformDisplayEXT
+        from OpenGL.EGL.EXT.device_enumeration import eglQueryDevicesEXT
+        from OpenGL.EGL.EXT.platform_device import EGL_PLATFORM_DEVICE_EXT
+        devices = (EGL.EGLDeviceEXT * 1)()
+        num = EGL.EGLint()
+        eglQueryDevicesEXT(1, devices, ctypes.pointer(num))
+        if num.value == 0:
+            return None
+        return eglGetPlatformDisplayEXT(EGL_PLATFORM_DEVICE_EXT, devices[0], None)
+
+    def make_current(self):
+        EGL = self.EGL
+        EGL.eglMakeCurrent(self.display, EGL.EGL_NO_SURFACE,
+                           EGL.EGL_NO_SURFACE, self.context)
+
+    def destroy(self):
+        EGL = self.EGL
+        EGL.eglMakeCurrent(self.display, EGL.EGL_NO_SURFACE,
+                           EGL.EGL_NO_SURFACE, EGL.EGL_NO_CONTEXT)
+        EGL.eglDestroyContext(self.display, self.context)
+        self.release_display()
+
+    def release_display(self):
+        # the other contexts of the display would fail with EGL_BAD_DISPLAY
+        EGLContext.display_refs[self.display_key] -= 1
+        if EGLContext.display_refs[self.display_key] == 0:
+            del EGLContext.display_refs[self.display_key]
+            self.EGL.eglTerminate(self.display)
+
+
+class OSMesaContext:
+    """
+    An OSMesa context, the scene is drawn in a framebuffer object, the
+    buffer of OSMesa is only a small default framebuffer.
+    Experimental: prefer EGL, which Mesa provides with llvmpipe too.
+    """
+
+    def __init__(self):
+        from OpenGL import osmesa, arrays
+        self.osmesa = osmesa
+        self.context = None
+        for major, minor in GL_VERSIONS:
+            attrs = arrays.GLintArray.asArray([
+                osmesa.OSMESA_FORMAT, osmesa.OSMESA_RGBA,
+                osmesa.OSMESA_DEPTH_BITS, 24,
+                osmesa.OSMESA_PROFILE, osmesa.OSMESA_COMPAT_PROFILE,
+                osmesa.OSMESA_CONTEXT_MAJOR_VERSION, major,
+                osmesa.OSMESA_CONTEXT_MINOR_VERSION, minor, 0])
+            self.context = osmesa.OSMesaCreateContextAttribs(attrs, None)
+            if self.context:
+                break
+        if not self.context:
+            raise RuntimeError("[Offscreen] Failed to create an OSMesa context.")
+        self.buffer = arrays.GLubyteArray.zeros((1, 1, 4))
+
+    def make_current(self):
+        if not self.osmesa.OSMesaMakeCurrent(self.context, self.buffer,
+                                             GL_UNSIGNED_BYTE, 1, 1):
+            raise RuntimeError("[Offscreen] Failed to make the OSMesa context current.")
+
+    def destroy(self):
+        self.osmesa.OSMesaDestroyContext(self.context)
+
+
+class OffscreenRenderer:
+    """
+    Render the items in a framebuffer object of an offscreen context (EGL, or
+    the experimental OSMesa, chosen by PYOPENGL_PLATFORM), without Qt widgets. The camera
+    and the painting of the frame are the ones of BaseGLWidget.
+
+    Text2DItem (QPainter) and Text3DItem (GLUT) need a window, they are not
+    supported. The cpu sort of GaussianItem is asynchronous, use a gpu sort
+    backend ('radix' or 'bitonic') for the exact order of every pose.
+
+    Example:
+        renderer = OffscreenRenderer(640, 480)
+        renderer.add_items({'cloud': cloud_item})
+        images = renderer.render_poses(poses)  # (N, 480, 640, 3) uint8
+    """
+    # the camera and the painting of BaseGLWidget, they need no widget.
+    paintGL = BaseGLWidget.paintGL
+    paint_item = BaseGLWidget.paint_item
+    update_model_view = BaseGLWidget.update_model_view
+    update_model_projection = BaseGLWidget.update_model_projection
+    get_view_matrix = BaseGLWidget.get_view_matrix
+    get_projection_matrix = BaseGLWidget.get_projection_matrix
+    get_K = BaseGLWidget.get_K
+    set_view_matrix = BaseGLWidget.set_view_matrix
+    set_center = BaseGLWidget.set_center
+    set_dist = BaseGLWidget.set_dist
+    set_euler = BaseGLWidget.set_euler
+    set_cam_position = BaseGLWidget.set_cam_position
+    set_color = BaseGLWidget.set_color
+    rotate = BaseGLWidget.rotate
+    translate = BaseGLWidget.translate
+    request_redraw = BaseGLWidget.request_redraw
+    depth_to_meters = BaseGLWidget.depth_to_meters
+
+    def __init__(self, width=640, height=480, fov=60):
+        """
+        Args:
+            width, height: the size of the images in pixels.
+            fov: the vertical field of view in degrees.
+        """
+        platform_name = type(platform.PLATFORM).__name__
+        if platform_name == 'EGLPlatform':
+            self.context = EGLContext()
+        elif platform_name == 'OSMesaPlatform':
+            self.context = OSMesaContext()
+        else:
+            raise RuntimeError(
+                "[Offscreen] PyOpenGL uses %s, set PYOPENGL_PLATFORM to 'egl' "
+                "or 'osmesa' before importing q3dviewer." % platform_name)
+        self.width = width
+        self.height = height
+        self._fov = fov
+        self.items = []
+        self.named_items = {}
+        self.item_names = {}
+        self.color = np.array([0, 0, 0, 0])
+        self.dist = 40
+        self.euler = np.array([np.pi/3, 0, np.pi/4])
+        self.center = np.array([0, 0, 0.])
+        self.show_center = False
+        self.enable_show_center = False
+        self.need_recalc_view = True
+        self.redraw_requested = True
+        self.continuous = False
+        self.gl_state = GLState()
+        self.camera_block = CameraBlock()
+        self.profiler = FrameProfiler(enabled=Q3D_PROFILE is not None, overlay=False)
+        self.fbo = None
+        self.renderbuffers = None
+        self.make_current()
+        glEnable(GL_DEPTH_TEST)
+        glDepthFunc(GL_LESS)
+        self.resize(width, height)
+
+    def make_current(self):
+        self.context.make_current()
+        if self.fbo is not None:
+            glBindFramebuffer(GL_FRAMEBUFFER, self.fbo)
+
+    def current_width(self):
+        return self.width
+
+    def current_height(self):
+        return self.height
+
+    def resize(self, width, height):
+        """
+        Set the size of the images, the framebuffer is allocated again.
+        """
+        self.make_current()
+        self.width, self.height = width, height
+        if self.fbo is None:
+            self.fbo = glGenFramebuffers(1)
+            self.renderbuffers = glGenRenderbuffers(2)
+        glBindFramebuffer(GL_FRAMEBUFFER, self.fbo)
+        for renderbuffer, fmt, attachment in zip(
+                self.renderbuffers, [GL_RGBA8, GL_DEPTH_COMPONENT24],
+                [GL_COLOR_ATTACHMENT0, GL_DEPTH_ATTACHMENT]):
+            glBindRenderbuffer(GL_RENDERBUFFER, renderbuffer)
+            glRenderbufferStorage(GL_RENDERBUFFER, fmt, width, height)
+            glFramebufferRenderbuffer(GL_FRAMEBUFFER, attachment,
+                                      GL_RENDERBUFFER, renderbuffer)
+        glBindRenderbuffer(GL_RENDERBUFFER, 0)
+        if glCheckFramebufferStatus(GL_FRAMEBUFFER) != GL_FRAMEBUFFER_COMPLETE:
+            raise RuntimeError("[Offscreen] The framebuffer is not complete.")
+        glViewport(0, 0, width, height)
+        self.projection_matrix = self.get_projection_matrix()
+        self.update_model_projection()
+        self.request_redraw()
+
+    def add_item(self, item):
+        """
+        Add the item to the renderer, it is initialized at once.
+        """
+        if item.__class__.__name__ in ['Text2DItem', 'Text3DItem']:
+            print("[Offscreen] %s needs a window, it is not rendered." %
+                  item.__class__.__name__)
+            return
+        self.make_current()
+        self.items.append(item)
+        item.set_glwidget(self)
+        item.initialize()
+        self.request_redraw()
+
+    def add_items(self, named_items: dict):
+        for name, item in named_items.items():
+            self.named_items[name] = item
+            self.item_names[item._id] = name
+            self.add_item(item)
+
+    def remove_item(self, item):
+        self.items.remove(item)
+        item.set_glwidget(None)
+        self.request_redraw()
+
+    def __getitem__(self, name: str):
+        return self.named_items.get(name)
+
+    def item_name(self, item):
+        if item._id in self.item_names:
+            return self.item_names[item._id]
+        return BaseGLWidget.item_name(self, item)
+
+    def set_pose(self, pose):
+        """
+        Set the camera.
+        Args:
+            pose: a camera pose Twc (4x4, the OpenGL camera looks along its -z
+                axis), or a dict of center, euler and distance (as the camera
+                pose of GLWidget). Near and far planes follow the distance.
+        """
+        if isinstance(pose, dict):
+            self.set_cam_position(center=np.array(pose['center'], dtype=np.float64),
+                                  euler=np.array(pose['euler'], dtype=np.float64),
+                                  distance=pose['distance'])
+        else:
+            self.set_view_matrix(np.linalg.inv(np.asarray(pose, dtype=np.float64)))
+        self.projection_matrix = self.get_projection_matrix()
+        self.update_model_projection()
+
+    def render(self, pose=None, depth=False, max_frames=100):
+        """
+        Render an image, from pose if given.
+        Some items need several frames to show all their data (e.g. the
+        gaussians are uploaded by chunks), the frame is painted again while
+        an item requests it, at most max_frames times.
+        Returns:
+            the (height, width, 3) uint8 image, and the (height, width) depths
+            in meters (inf for the background) if depth.
+        """
+        self.make_current()
+        if pose is not None:
+            self.set_pose(pose)
+        for i in range(max_frames):
+            self.paintGL()
+            if not self.redraw_requested:
+                break
+        return self.read_frame(depth)
+
+    def render_poses(self, poses, depth=False, max_frames=100):
+        """
+        Render an image for each pose (see set_pose).
+        Returns:
+            the (N, height, width, 3) uint8 images, and the (N, height, width)
+            depths if depth.
+        """
+        frames = [self.render(pose, depth, max_frames) for pose in poses]
+        if depth:
+            images, depths = zip(*frames)
+            return np.stack(images), np.stack(depths)
+        return np.stack(frames)
+
+    def read_frame(self, depth=False):
+        glPixelStorei(GL_PACK_ALIGNMENT, 1)
+        pixels = glReadPixels(0, 0, self.width, self.height, GL_RGB, GL_UNSIGNED_BYTE)
+        image = np.frombuffer(pixels, dtype=np.uint8).reshape(self.height, self.width, 3)
+        image = np.ascontiguousarray(image[::-1])
+        if not depth:
+            return image
+        z = glReadPixels(0, 0, self.width, self.height, GL_DEPTH_COMPONENT, GL_FLOAT)
+        z = np.frombuffer(z, dtype=np.float32).reshape(self.height, self.width)[::-1]
+        depths = self.depth_to_meters(z)
+        depths[z >= 1.0] = np.inf
+        return image, depths
+
+    def close(self):
+        """
+        Release the framebuffer and the context.
+        """
+        if self.context is None:
+            return
+        self.make_current()
+        for item in self.items:
+            item.set_glwidget(None)
+        self.items = []
+        glBindFramebuffer(GL_FRAMEBUFFER, 0)
+        glDeleteRenderbuffers(2, self.renderbuffers)
+        glDeleteFramebuffers(1, [self.fbo])
+        self.context.destroy()
+        self.context = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -8,14 +8,18 @@ Distributed under MIT license. See LICENSE for more information.
 layout (location = 0) in vec3 position;
 layout (location = 1) in uint value;
 
-uniform mat4 view_matrix;
-uniform mat4 projection_matrix;
+// the camera, set once per frame for all the programs (CameraBlock)
+layout(std140) uniform Camera {
+    mat4 view_matrix;
+    mat4 projection_matrix;
+    vec2 focal;     // in pixels
+    vec2 win_size;  // in pixels
+};
 uniform float alpha = 1;
 uniform int color_mode = 0;
 uniform int flat_rgb = 0;
 uniform float vmin = 0;
 uniform float vmax = 255;
-uniform float focal = 1000;
 uniform int point_type = 0; // 0 pixel, 1 flat square, 2 sphere
 uniform int point_size = 1;  // World size for each point (pixel or cm)
 out vec4 color;
@@ -49,7 +53,7 @@ void main()
     if (point_type == 0)
         gl_PointSize = float(point_size);
     else
-        gl_PointSize = (float(point_size) * 0.01) / gl_Position.w * focal;
+        gl_PointSize = (float(point_size) * 0.01) / gl_Position.w * focal.x;
     vec3 c = vec3(1.0, 1.0, 1.0);
     if (color_mode == 1)
     {
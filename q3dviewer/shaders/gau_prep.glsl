@@ -47,6 +47,22 @@ layout (std430, binding=0) buffer GaussianData {
 	float gs_data[];
 };
 
+// the same buffer, when the gaussians are compact (see compress_gs in cloud_io.py):
+// pos unorm16 x3, scale half x3, rot snorm8 x4, alpha unorm8, sh unorm8 x sh_dim
+layout (std430, binding=0) buffer GaussianCompact {
+	uint gs_compact[];
+};
+
+// the ranges of the compact gaussians:
+// pos min (3), pos range (3), dc min (3), dc range (3), rest min, rest range
+layout (std430, binding=4) buffer GaussianCodebook {
+	float codebook[];
+};
+
+layout (std430, binding=1) buffer GaussianOrder {
+	uint gs_index[];
+};
+
 layout (std430, binding=2) buffer GaussianDepth {
 	float depth[];
 };
@@ -55,11 +71,30 @@ layout (std430, binding=3) buffer GaussianPrep {
 	float gs_prep[];
 };
 
-uniform mat4 view_matrix;
-uniform mat4 projection_matrix;
-uniform vec2 focal;
+// the indirect draw command (DrawElementsIndirectCommand),
+// followed by the number of culled gaussians.
+layout (std430, binding=5) buffer DrawCommand {
+	uint draw_count;
+	uint visible_num;  // the instance count
+	uint first_index;
+	int  base_vertex;
+	uint base_instance;
+	uint culled_num;
+};
+
+// the camera, set once per frame for all the programs (CameraBlock)
+layout(std140) uniform Camera {
+    mat4 view_matrix;
+    mat4 projection_matrix;
+    vec2 focal;     // in pixels
+    vec2 win_size;  // in pixels
+};
 uniform int  sh_dim;
 uniform int  gs_num;
+uniform int  compact;  // the gaussians are compact
+uniform int  cull;  // compact the visible gaussians at the front of the index
+uniform int  sort_num;  // the size of the index
+uniform float alpha_threshold;  // the gaussians more transparent are culled
 
 mat3 computeCov3D(vec3 scale, vec4 q)
 {
@@ -129,9 +164,51 @@ void set_prep_vec1(int offset, float d)
 	gs_prep[offset] = d.x;
 }
 
-vec3 computeColor(int sh_offset, vec3 ray_dir)
+#define COMPACT_WORDS_SH 4  // the sh start at the 5th word (byte 17 is the first dc)
+
+vec3 get_codebook_vec3(int offset, vec3 q)
+{
+	return vec3(codebook[offset], codebook[offset + 1], codebook[offset + 2]) +
+		q * vec3(codebook[offset + 3], codebook[offset + 4], codebook[offset + 5]);
+}
+
+// the i-th sh coefficient (rgb) of a gaussian
+vec3 get_sh(int base_gs, int i)
+{
+	if (compact == 0)
+		return get_vec3(base_gs + OFFSET_DATA_SH + i * 3);
+	// byte 0 of the sh bytes is alpha, then dc (rgb), then rest
+	vec3 q;
+	for (int c = 0; c < 3; c++)
+	{
+		int byte_id = 1 + i * 3 + c;
+		uint word = gs_compact[base_gs + COMPACT_WORDS_SH + byte_id / 4];
+		q[c] = float((word >> (8 * (byte_id % 4))) & 0xffu) / 255.0;
+	}
+	if (i == 0)
+		return get_codebook_vec3(6, q);
+	int rest = sh_dim - 3;
+	int k = i * 3 - 3;
+	vec3 vmin = vec3(codebook[12 + k], codebook[13 + k], codebook[14 + k]);
+	vec3 vrange = vec3(codebook[12 + rest + k], codebook[13 + rest + k], codebook[14 + rest + k]);
+	return vmin + q * vrange;
+}
+
+// a culled gaussian is not drawn. when culling, it is moved to the back
+// of the index and sorted after the visible ones.
+void cull_gaussian(int gs_id, int base_prep)
 {
-	vec3 c = SH_C0_0 * get_vec3(sh_offset);
+	set_prep_vec3(base_prep + OFFSET_PREP_U, vec3(-100));
+	if (cull != 0)
+	{
+		depth[gs_id] = uintBitsToFloat(0x7f800000u);  // +inf
+		gs_index[uint(gs_num) - 1u - atomicAdd(culled_num, 1u)] = uint(gs_id);
+	}
+}
+
+vec3 computeColor(int base_gs, vec3 ray_dir)
+{
+	vec3 c = SH_C0_0 * get_sh(base_gs, 0);
 	
 	if (sh_dim > 3)  // 1 * 3
 	{
@@ -139,31 +216,31 @@ vec3 computeColor(int sh_offset, vec3 ray_dir)
 		float y = ray_dir.y;
 		float z = ray_dir.z;
 		c = c +
-			SH_C1_0 * y * get_vec3(sh_offset + 1 * 3) +
-			SH_C1_1 * z * get_vec3(sh_offset + 2 * 3) +
-			SH_C1_2 * x * get_vec3(sh_offset + 3 * 3);
+			SH_C1_0 * y * get_sh(base_gs, 1) +
+			SH_C1_1 * z * get_sh(base_gs, 2) +
+			SH_C1_2 * x * get_sh(base_gs, 3);
 
 		if (sh_dim > 12)  // (1 + 3) * 3
 		{
 			float xx = x * x, yy = y * y, zz = z * z;
 			float xy = x * y, yz = y * z, xz = x * z;
 			c = c +
-				SH_C2_0 * xy * get_vec3(sh_offset + 4 * 3) +
-				SH_C2_1 * yz * get_vec3(sh_offset + 5 * 3) +
-				SH_C2_2 * (2.0f * zz - xx - yy) * get_vec3(sh_offset + 6 * 3) +
-				SH_C2_3 * xz * get_vec3(sh_offset + 7 * 3) +
-				SH_C2_4 * (xx - yy) * get_vec3(sh_offset + 8 * 3);
+				SH_C2_0 * xy * get_sh(base_gs, 4) +
+				SH_C2_1 * yz * get_sh(base_gs, 5) +
+				SH_C2_2 * (2.0f * zz - xx - yy) * get_sh(base_gs, 6) +
+				SH_C2_3 * xz * get_sh(base_gs, 7) +
+				SH_C2_4 * (xx - yy) * get_sh(base_gs, 8);
 
 			if (sh_dim > 27)  // (1 + 3 + 5) * 3
 			{
 				c = c +
-					SH_C3_0 * y * (3.0f * xx - yy) * get_vec3(sh_offset + 9 * 3) +
-					SH_C3_1 * xy * z * get_vec3(sh_offset + 10 * 3) +
-					SH_C3_2 * y * (4.0f * zz - xx - yy) * get_vec3(sh_offset + 11 * 3) +
-					SH_C3_3 * z * (2.0f * zz - 3.0f * xx - 3.0f * yy) * get_vec3(sh_offset + 12 * 3) +
-					SH_C3_4 * x * (4.0f * zz - xx - yy) * get_vec3(sh_offset + 13 * 3) +
-					SH_C3_5 * z * (xx - yy) * get_vec3(sh_offset + 14 * 3) +
-					SH_C3_6 * x * (xx - 3.0f * yy) * get_vec3(sh_offset + 15 * 3);
+					SH_C3_0 * y * (3.0f * xx - yy) * get_sh(base_gs, 9) +
+					SH_C3_1 * xy * z * get_sh(base_gs, 10) +
+					SH_C3_2 * y * (4.0f * zz - xx - yy) * get_sh(base_gs, 11) +
+					SH_C3_3 * z * (2.0f * zz - 3.0f * xx - 3.0f * yy) * get_sh(base_gs, 12) +
+					SH_C3_4 * x * (4.0f * zz - xx - yy) * get_sh(base_gs, 13) +
+					SH_C3_5 * z * (xx - yy) * get_sh(base_gs, 14) +
+					SH_C3_6 * x * (xx - 3.0f * yy) * get_sh(base_gs, 15);
 			}
 		}
 	}
@@ -176,38 +253,68 @@ void main()
 {
 	int gs_id = int(gl_GlobalInvocationID.x);
 
-	if (gs_id > gs_num)
+	if (gs_id >= gs_num)
+	{
+		// the rest of the index keeps its own ids, their depths are inf.
+		if (cull != 0 && gs_id < sort_num)
+			gs_index[gs_id] = uint(gs_id);
 		return;
+	}
 
 	int dim_gs = 3 + 4 + 3 + 1 + sh_dim;
+	if (compact != 0)  // words
+		dim_gs = COMPACT_WORDS_SH + (1 + sh_dim + 3) / 4;
 	int base_gs = gs_id * dim_gs;
 	int base_prep = DIM_PREP * gs_id;
-	vec4 pw = vec4(get_vec3(base_gs + OFFSET_DATA_POS), 1.f);
+	vec4 pw;
+	vec4 rot;
+	vec3 scale;
+	float alpha;
+	if (compact == 0)
+	{
+		pw = vec4(get_vec3(base_gs + OFFSET_DATA_POS), 1.f);
+		rot = get_vec4(base_gs + OFFSET_DATA_ROT);
+		scale = get_vec3(base_gs + OFFSET_DATA_SCALE);
+		alpha = gs_data[base_gs + OFFSET_DATA_ALPHA];
+	}
+	else
+	{
+		vec2 xy = unpackUnorm2x16(gs_compact[base_gs]);
+		float z = unpackUnorm2x16(gs_compact[base_gs + 1]).x;
+		pw = vec4(get_codebook_vec3(0, vec3(xy, z)), 1.f);
+		scale = vec3(unpackHalf2x16(gs_compact[base_gs + 1]).y,
+		             unpackHalf2x16(gs_compact[base_gs + 2]));
+		rot = normalize(unpackSnorm4x8(gs_compact[base_gs + 3]));
+		alpha = unpackUnorm4x8(gs_compact[base_gs + 4]).x;
+	}
     vec4 pc = view_matrix * pw;
     vec4 u = projection_matrix * pc;
 
 	// set depth for sorter.
 	depth[gs_id] = pc.z;
 
+	if (alpha < alpha_threshold)
+	{
+		cull_gaussian(gs_id, base_prep);
+		return;
+	}
+
 	u = u / u.w;
 
 	if (any(greaterThan(abs(u.xy), vec2(1.3))))
 	{
-		set_prep_vec3(base_prep + OFFSET_PREP_U, vec3(-100));
+		cull_gaussian(gs_id, base_prep);
 		return;
 	}
 
 	// check the depth
 	if (abs(u.z) > 1.f)
 	{
-		set_prep_vec3(base_prep + OFFSET_PREP_U, vec3(-100));
+		cull_gaussian(gs_id, base_prep);
 		return;
 	}
 
 
-	vec4 rot = get_vec4(base_gs + OFFSET_DATA_ROT);
-	vec3 scale = get_vec3(base_gs + OFFSET_DATA_SCALE);
-
     mat3 cov3d = computeCov3D(scale, rot);
     vec3 cov2d = computeCov2D(pc, 
                               focal.x, 
@@ -220,7 +327,7 @@ void main()
 
 	if (det == 0.0f)
 	{
-		set_prep_vec3(DIM_PREP * gs_id + OFFSET_PREP_U, vec3(-100., -100., -100.));
+		cull_gaussian(gs_id, base_prep);
 		return;
 	}
 
@@ -228,15 +335,21 @@ void main()
 	vec3 cinv2d = vec3(cov2d.z * det_inv, -cov2d.y * det_inv, cov2d.x * det_inv);
     
 	vec2 area = 3.f * sqrt(vec2(cov2d.x, cov2d.z));  // drawing area, 3 sigma of x and y
+
+	// the drawing area is out of the screen
+	vec2 area_ndc = area * vec2(projection_matrix[0][0], projection_matrix[1][1]) / focal;
+	if (any(greaterThan(abs(u.xy) - area_ndc, vec2(1.f))))
+	{
+		cull_gaussian(gs_id, base_prep);
+		return;
+	}
     
 	// Covert SH to color
 	vec3 cam_pos = inverse(view_matrix)[3].xyz;
-	int sh_offset = base_gs + OFFSET_DATA_SH;
 	vec3 ray_dir = pw.xyz - cam_pos;
 
     ray_dir = normalize(ray_dir);
-	vec3 color = computeColor(sh_offset, ray_dir);
-	float alpha = gs_data[base_gs + OFFSET_DATA_ALPHA];
+	vec3 color = computeColor(base_gs, ray_dir);
 
 	vec3 covinv = vec3(cov2d.z * det_inv, -cov2d.y * det_inv, cov2d.x * det_inv);
 
@@ -246,4 +359,7 @@ void main()
 	set_prep_vec2(base_prep + OFFSET_PREP_AREA, area);  //set area
 	set_prep_vec1(base_prep + OFFSET_PREP_ALPHA, alpha);  //set area
 
+	if (cull != 0)
+		gs_index[atomicAdd(visible_num, 1u)] = uint(gs_id);
+
 }
@@ -0,0 +1,208 @@
+#version 430 core
+/*
+Copyright 2024 Panasonic Advanced Technology Development Co.,Ltd. (Liu Yang)
+Distributed under MIT license. See LICENSE for more information.
+*/
+
+/*
+opengl compute shader.
+render the preprocessed gaussians (gau_prep.glsl) by screen tiles,
+like the rasterizer of 3D gaussian splatting.
+  mode 0: count the tiles covered by every gaussian of the depth sorted
+          index into pair_offset, and the gaussians of every tile into
+          tile_range.
+  (prefix_sum.glsl: exclusive scan of pair_offset and tile_range)
+  mode 1: write the (tile, gaussian) pairs of every gaussian from its
+          pair_offset, so the pairs are in depth order.
+  (radix_sort.glsl: stable sort of the pairs by tile, the pairs of a tile
+   stay in depth order)
+  mode 2: one workgroup per tile, blend the gaussians of the tile front to
+          back, and stop when all the pixels of the tile are opaque.
+*/
+
+#define OFFSET_PREP_U 0
+#define OFFSET_PREP_COVINV 3
+#define OFFSET_PREP_COLOR 6
+#define OFFSET_PREP_AREA 9
+#define OFFSET_PREP_ALPHA 11
+#define DIM_PREP 12
+
+#define TILE_SIZE 16
+#define BATCH 256  // TILE_SIZE * TILE_SIZE
+
+
+layout(local_size_x = TILE_SIZE, local_size_y = TILE_SIZE, local_size_z = 1) in;
+
+
+uniform int  mode;
+uniform int  gs_num;
+uniform int  pair_num;
+uniform vec2 win_size;
+uniform vec2 tile_num;  // the number of tiles in x and y
+
+
+layout(std430, binding = 1) buffer GaussianOrder {
+    uint gs_index[];
+};
+
+layout(std430, binding = 3) buffer GaussianPrep {
+    float gs_prep[];
+};
+
+layout(std430, binding = 5) buffer DrawCommand {
+    uint draw_count;
+    uint visible_num;
+};
+
+layout(std430, binding = 7) buffer PairOffset {
+    uint pair_offset[];
+};
+
+layout(std430, binding = 8) buffer PairTile {
+    uint pair_tile[];
+};
+
+layout(std430, binding = 9) buffer TileRange {
+    uint tile_range[];
+};
+
+layout(std430, binding = 10) buffer PairGaussian {
+    uint pair_gs[];
+};
+
+layout(std430, binding = 11) buffer PairIndex {
+    uint pair_index[];
+};
+
+layout(rgba8, binding = 0) writeonly uniform image2D out_image;
+
+
+shared vec2 batch_xy[BATCH];
+shared vec2 batch_area[BATCH];
+shared vec3 batch_covinv[BATCH];
+shared vec4 batch_color[BATCH];
+shared uint done_num;
+
+
+vec3 get_prep_vec3(uint offset)
+{
+    return vec3(gs_prep[offset], gs_prep[offset + 1], gs_prep[offset + 2]);
+}
+
+// the tiles covered by the drawing area of a gaussian, [rect.xy, rect.zw)
+ivec4 get_rect(uint gs_id)
+{
+    ivec2 tiles = ivec2(tile_num);
+    uint base_prep = gs_id * DIM_PREP;
+    vec3 u = get_prep_vec3(base_prep + OFFSET_PREP_U);
+    if (u == vec3(-100))
+        return ivec4(0);
+    vec2 area = vec2(gs_prep[base_prep + OFFSET_PREP_AREA],
+                     gs_prep[base_prep + OFFSET_PREP_AREA + 1]);
+    vec2 center = (u.xy * 0.5 + 0.5) * win_size;
+    ivec2 rmin = clamp(ivec2(floor((center - area) / TILE_SIZE)), ivec2(0), tiles);
+    ivec2 rmax = clamp(ivec2(floor((center + area) / TILE_SIZE)) + 1, ivec2(0), tiles);
+    return ivec4(rmin, rmax);
+}
+
+void main()
+{
+    ivec2 tiles = ivec2(tile_num);
+    if (mode == 2)
+    {
+        uint tile = gl_WorkGroupID.y * tiles.x + gl_WorkGroupID.x;
+        uint t = gl_LocalInvocationIndex;
+        ivec2 pix = ivec2(gl_GlobalInvocationID.xy);
+        bool inside = all(lessThan(pix, ivec2(win_size)));
+        vec2 pixf = vec2(pix) + 0.5;
+        int begin = int(tile_range[tile]);
+        int end = int(tile) + 1 < tiles.x * tiles.y ? int(tile_range[tile + 1]) : pair_num;
+
+        vec3 color = vec3(0.f);
+        float T = 1.f;  // transmittance
+        bool done = !inside;
+        int rounds = (end - begin + BATCH - 1) / BATCH;
+        for (int r = 0; r < rounds; r++)
+        {
+            if (t == 0)
+                done_num = 0;
+            barrier();
+            if (done)
+                atomicAdd(done_num, 1u);
+            barrier();
+            if (done_num == BATCH)
+                break;
+
+            // load a batch of gaussians, the nearest first.
+            int k = end - 1 - r * BATCH - int(t);
+            if (k >= begin)
+            {
+                uint base_prep = pair_gs[pair_index[k]] * DIM_PREP;
+                vec3 u = get_prep_vec3(base_prep + OFFSET_PREP_U);
+                batch_xy[t] = (u.xy * 0.5 + 0.5) * win_size;
+                batch_area[t] = vec2(gs_prep[base_prep + OFFSET_PREP_AREA],
+                                     gs_prep[base_prep + OFFSET_PREP_AREA + 1]);
+                batch_covinv[t] = get_prep_vec3(base_prep + OFFSET_PREP_COVINV);
+                batch_color[t] = vec4(get_prep_vec3(base_prep + OFFSET_PREP_COLOR),
+                                      gs_prep[base_prep + OFFSET_PREP_ALPHA]);
+            }
+            barrier();
+
+            int n = min(BATCH, end - begin - r * BATCH);
+            for (int j = 0; j < n && !done; j++)
+            {
+                // the same gaussian (and drawing area) as gau_frag.glsl
+                vec2 d = pixf - batch_xy[j];
+                if (any(greaterThan(abs(d), batch_area[j])))
+                    continue;
+                vec3 c = batch_covinv[j];
+                float maha_dist = c.x * d.x * d.x + c.z * d.y * d.y + 2 * c.y * d.x * d.y;
+                if (maha_dist < 0.f)
+                    continue;
+                float alpha = min(0.99f, batch_color[j].a * exp(-0.5 * maha_dist));
+                if (alpha < 1.f / 255.f)
+                    continue;
+                color += clamp(batch_color[j].rgb, 0.f, 1.f) * alpha * T;
+                T *= 1.f - alpha;
+                if (T < 0.0001f)
+                    done = true;
+            }
+        }
+        if (inside)
+            imageStore(out_image, pix, vec4(color, 1.f - T));
+        return;
+    }
+
+    uint i = gl_WorkGroupID.x * BATCH + gl_LocalInvocationIndex;
+    if (i >= gs_num)
+        return;
+    uint num = min(uint(gs_num), visible_num);
+    if (mode == 0)
+    {
+        if (i >= num)
+        {
+            pair_offset[i] = 0;
+            return;
+        }
+        ivec4 rect = get_rect(gs_index[i]);
+        ivec2 size = max(rect.zw - rect.xy, ivec2(0));
+        pair_offset[i] = uint(size.x * size.y);
+        for (int y = rect.y; y < rect.w; y++)
+            for (int x = rect.x; x < rect.z; x++)
+                atomicAdd(tile_range[y * tiles.x + x], 1u);
+    }
+    else if (i < num)
+    {
+        uint gs_id = gs_index[i];
+        ivec4 rect = get_rect(gs_id);
+        uint offset = pair_offset[i];
+        for (int y = rect.y; y < rect.w; y++)
+            for (int x = rect.x; x < rect.z; x++)
+            {
+                pair_tile[offset] = uint(y * tiles.x + x);
+                pair_gs[offset] = gs_id;
+                pair_index[offset] = offset;
+                offset++;
+            }
+    }
+}
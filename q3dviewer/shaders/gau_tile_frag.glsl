@@ -0,0 +1,16 @@
+#version 430 core
+/*
+Copyright 2024 Panasonic Advanced Technology Development Co.,Ltd. (Liu Yang)
+Distributed under MIT license. See LICENSE for more information.
+*/
+
+// the color of the image rendered by gau_tile.glsl is premultiplied by its alpha.
+
+uniform sampler2D tile_image;
+
+out vec4 final_color;
+
+void main()
+{
+	final_color = texelFetch(tile_image, ivec2(gl_FragCoord.xy), 0);
+}
@@ -0,0 +1,13 @@
+#version 430 core
+/*
+Copyright 2024 Panasonic Advanced Technology Development Co.,Ltd. (Liu Yang)
+Distributed under MIT license. See LICENSE for more information.
+*/
+
+// a triangle covering the screen, to draw the image rendered by gau_tile.glsl
+
+void main()
+{
+	vec2 p = vec2((gl_VertexID << 1) & 2, gl_VertexID & 2);
+	gl_Position = vec4(p * 2.0 - 1.0, 0.0, 1.0);
+}
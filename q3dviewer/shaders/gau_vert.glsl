@@ -27,7 +27,13 @@ layout (std430, binding=3) buffer GaussianPrep {
 	float gs_prep[];
 };
 
-uniform vec2 win_size;
+// the camera, set once per frame for all the programs (CameraBlock)
+layout(std140) uniform Camera {
+    mat4 view_matrix;
+    mat4 projection_matrix;
+    vec2 focal;     // in pixels
+    vec2 win_size;  // in pixels
+};
 
 out vec3 color;
 out float alpha;
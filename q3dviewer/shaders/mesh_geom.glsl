@@ -15,8 +15,13 @@ in VS_OUT {
 } gs_in[];
 
 // Uniforms
-uniform mat4 view;
-uniform mat4 projection;
+// the camera, set once per frame for all the programs (CameraBlock)
+layout(std140) uniform Camera {
+    mat4 view_matrix;
+    mat4 projection_matrix;
+    vec2 focal;     // in pixels
+    vec2 win_size;  // in pixels
+};
 
 uniform int flat_rgb;
 
@@ -37,7 +42,7 @@ void emitVertex(vec3 pos, vec3 normal, vec3 color) {
     FragPos = pos;
     Normal = normal;
     objectColor = color;
-    gl_Position = projection * view * vec4(pos, 1.0);
+    gl_Position = projection_matrix * view_matrix * vec4(pos, 1.0);
     EmitVertex();
 }
 
@@ -0,0 +1,59 @@
+#version 430 core
+
+/*
+Copyright 2024 Panasonic Advanced Technology Development Co.,Ltd. (Liu Yang)
+Distributed under MIT license. See LICENSE for more information.
+*/
+
+layout(triangles) in;
+layout(triangle_strip, max_vertices = 3) out;
+
+// Input from vertex shader
+in VS_OUT {
+    vec3 position;
+    vec3 normal;
+} gs_in[];
+
+// Uniforms
+// the camera, set once per frame for all the programs (CameraBlock)
+layout(std140) uniform Camera {
+    mat4 view_matrix;
+    mat4 projection_matrix;
+    vec2 focal;     // in pixels
+    vec2 win_size;  // in pixels
+};
+
+uniform int flat_rgb;
+uniform int has_normal;  // use the vertex normals (smooth shading)
+
+
+// Output to fragment shader
+out vec3 FragPos;
+out vec3 Normal;
+out vec3 objectColor;
+
+void main()
+{
+    vec3 face_normal = cross(gs_in[1].position - gs_in[0].position,
+                             gs_in[2].position - gs_in[0].position);
+    // Skip degenerate triangles (removed or bad faces are written as (i, i, i))
+    if (dot(face_normal, face_normal) == 0.0) {
+        return;
+    }
+    face_normal = normalize(face_normal);
+
+    vec3 color = vec3(
+        float((uint(flat_rgb) & uint(0x00FF0000)) >> 16)/255.,
+        float((uint(flat_rgb) & uint(0x0000FF00)) >> 8)/255.,
+        float( uint(flat_rgb) & uint(0x000000FF))/255.
+    );
+    for (int i = 0; i < 3; i++) {
+        vec3 normal = gs_in[i].normal;
+        FragPos = gs_in[i].position;
+        Normal = (has_normal != 0 && dot(normal, normal) > 0.0) ? normal : face_normal;
+        objectColor = color;
+        gl_Position = projection_matrix * view_matrix * vec4(gs_in[i].position, 1.0);
+        EmitVertex();
+    }
+    EndPrimitive();
+}
@@ -0,0 +1,23 @@
+#version 430 core
+
+/*
+Copyright 2024 Panasonic Advanced Technology Development Co.,Ltd. (Liu Yang)
+Distributed under MIT license. See LICENSE for more information.
+*/
+
+// Vertex attributes of the indexed mesh (shared by the triangles)
+layout(location = 0) in vec3 position;
+layout(location = 1) in vec3 normal;  // (0, 0, 0) if the mesh has no normals
+
+out VS_OUT {
+    vec3 position;
+    vec3 normal;
+} vs_out;
+
+void main()
+{
+    vs_out.position = position;
+    vs_out.normal = normal;
+    // the geometry shader projects the triangles
+    gl_Position = vec4(position, 1.0);
+}
@@ -12,10 +12,6 @@ layout(location = 3) in vec3 v2;
 layout(location = 4) in vec3 v3;
 layout(location = 5) in float good;
 
-// Uniforms
-uniform mat4 view;
-uniform mat4 projection;
-
 // Outputs to fragment shader (via geometry shader)
 out VS_OUT {
     vec3 v0, v1, v2, v3;
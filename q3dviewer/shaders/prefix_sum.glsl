@@ -0,0 +1,96 @@
+#version 430 core
+/*
+Copyright 2024 Panasonic Advanced Technology Development Co.,Ltd. (Liu Yang)
+Distributed under MIT license. See LICENSE for more information.
+*/
+
+/*
+opengl compute shader.
+exclusive prefix sum of data[data_offset, data_offset + num) in place.
+  mode 0: scan every block of 512 values (Blelloch), and write the total
+          of the block to data[sums_offset + block].
+  mode 1: add the scanned block totals data[sums_offset + block] to the block.
+a long array is scanned level by level: the totals of one level are the
+data of the next level, all levels live in the same buffer.
+*/
+
+#define BLOCK 512
+
+
+layout(local_size_x = 256, local_size_y = 1, local_size_z = 1) in;
+
+
+uniform int  mode;
+uniform int  num;
+uniform int  data_offset;
+uniform int  sums_offset;
+
+
+layout(std430, binding = 7) buffer scan_buffer {
+    uint data[];
+};
+
+
+shared uint temp[BLOCK];
+
+
+void main() {
+    uint t = gl_LocalInvocationID.x;
+    uint block = gl_WorkGroupID.x;
+    uint a = block * BLOCK + t;
+    uint b = a + BLOCK / 2;
+
+    if (mode == 1)
+    {
+        uint sum = data[sums_offset + block];
+        if (a < num)
+            data[data_offset + a] += sum;
+        if (b < num)
+            data[data_offset + b] += sum;
+        return;
+    }
+
+    temp[t] = a < num ? data[data_offset + a] : 0;
+    temp[t + BLOCK / 2] = b < num ? data[data_offset + b] : 0;
+
+    // up-sweep
+    uint step = 1;
+    for (uint d = BLOCK / 2; d > 0; d >>= 1)
+    {
+        barrier();
+        if (t < d)
+        {
+            uint i = step * (2 * t + 1) - 1;
+            uint j = step * (2 * t + 2) - 1;
+            temp[j] += temp[i];
+        }
+        step *= 2;
+    }
+
+    if (t == 0)
+    {
+        data[sums_offset + block] = temp[BLOCK - 1];
+        temp[BLOCK - 1] = 0;
+    }
+
+    // down-sweep
+    for (uint d = 1; d < BLOCK; d *= 2)
+    {
+        step >>= 1;
+        barrier();
+        if (t < d)
+        {
+            uint i = step * (2 * t + 1) - 1;
+            uint j = step * (2 * t + 2) - 1;
+            uint v = temp[i];
+            temp[i] = temp[j];
+            temp[j] += v;
+        }
+    }
+    barrier();
+
+    if (a < num)
+        data[data_offset + a] = temp[t];
+    if (b < num)
+        data[data_offset + b] = temp[t + BLOCK / 2];
+}
@@ -0,0 +1,128 @@
+#version 430 core
+/*
+Copyright 2024 Panasonic Advanced Technology Development Co.,Ltd. (Liu Yang)
+Distributed under MIT license. See LICENSE for more information.
+*/
+
+/*
+opengl compute shader.
+sort guassian by depth using a LSD radix sort on quantized depth keys.
+each invocation owns a contiguous block of the index array and walks it
+serially, so the scatter is stable without any shared memory.
+a pass (4 bits of the key) is:
+  mode 0: count the digits of every block into hist (digit major).
+  (prefix_sum.glsl: exclusive scan of hist)
+  mode 1: scatter the indices of every block to the scanned offsets.
+as the sort is stable, sorting only the high bits of the keys keeps the
+order of the previous frame inside every bucket, which is used to refine
+the order cheaply when the camera only moved a little.
+mode 2 initializes the sort: index[i] = i and depth[i] = inf for i < gs_num.
+only index[0, min(gs_num, visible_num)) is sorted, when gau_prep.glsl culls
+the gaussians, the visible ones are at the front of the index.
+with key_type 1, index[0, gs_num) is sorted by the integer keys[index[i]]
+instead (the tiles of the (tile, gaussian) pairs, see gau_tile.glsl).
+*/
+
+#define RADIX_BITS 4
+#define RADIX 16
+#define KEY_MAX 65535.0  // 16 bits keys
+
+
+layout(local_size_x = 64, local_size_y = 1, local_size_z = 1) in;
+
+
+uniform int  mode;
+uniform int  key_type;  // 0: depth of the gaussians, 1: keys
+uniform int  gs_num;
+uniform int  block_size;  // indices per invocation
+uniform int  shift;  // the bits of the key sorted in this pass
+uniform float log_near;  // log of the nearest depth
+uniform float log_range;  // log of the farthest depth - log_near
+
+
+layout(std430, binding = 1) buffer index_buffer {
+    uint index[];
+};
+
+layout(std430, binding = 2) buffer key_buffer {
+    float depth[];
+};
+
+layout(std430, binding = 6) buffer index_out_buffer {
+    uint index_out[];
+};
+
+layout(std430, binding = 7) buffer hist_buffer {
+    uint hist[];
+};
+
+// the indirect draw command, see gau_prep.glsl
+layout(std430, binding = 5) buffer draw_buffer {
+    uint draw_count;
+    uint visible_num;
+};
+
+layout(std430, binding = 8) buffer int_key_buffer {
+    uint keys[];
+};
+
+
+// the far gaussians get the small keys, as they are drawn first.
+// the log of the depth keeps the same relative precision at every distance.
+uint depth_key(float z)
+{
+    float t = (log(max(-z, 1e-30)) - log_near) / log_range;
+    return uint((1.0 - clamp(t, 0.0, 1.0)) * KEY_MAX);
+}
+
+uint digit(uint i)
+{
+    uint key = key_type == 0 ? depth_key(depth[index[i]]) : keys[index[i]];
+    return (key >> shift) & (RADIX - 1);
+}
+
+void main() {
+    uint id = gl_GlobalInvocationID.x;
+
+    if (mode == 2)
+    {
+        if (id < gs_num)
+        {
+            index[id] = id;
+            depth[id] = uintBitsToFloat(0x7f800000u);  // +inf
+        }
+        return;
+    }
+
+    // the layout of hist does not depend on the visible number,
+    // the blocks after the visible ones are empty.
+    uint num_blocks = (gs_num + block_size - 1) / block_size;
+    if (id >= num_blocks)
+        return;
+    uint num = key_type == 0 ? min(uint(gs_num), visible_num) : uint(gs_num);
+    uint begin = id * block_size;
+    uint end = min(begin + block_size, num);
+
+    if (mode == 0)
+    {
+        uint count[RADIX];
+        for (int d = 0; d < RADIX; d++)
+            count[d] = 0;
+        for (uint i = begin; i < end; i++)
+            count[digit(i)]++;
+        for (int d = 0; d < RADIX; d++)
+            hist[d * num_blocks + id] = count[d];
+    }
+    else
+    {
+        uint offset[RADIX];
+        for (int d = 0; d < RADIX; d++)
+            offset[d] = hist[d * num_blocks + id];
+        for (uint i = begin; i < end; i++)
+        {
+            uint d = digit(i);
+            index_out[offset[d]] = index[i];
+            offset[d]++;
+        }
+    }
+}
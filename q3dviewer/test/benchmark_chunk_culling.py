@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+
+"""
+Copyright 2024 Panasonic Advanced Technology Development Co.,Ltd. (Liu Yang)
+Distributed under MIT license. See LICENSE for more information.
+"""
+
+"""
+this script benchmarks the chunk frustum culling of CloudItem.
+it streams a city-scale map scan by scan (so the chunks are spatially coherent),
+then zooms into smaller and smaller areas, and reports the frame time and
+the drawn/culled chunk counts with and without culling.
+
+usage:
+    python3 benchmark_chunk_culling.py --points 50 --dists 2000 500 100 20
+"""
+
+import time
+import argparse
+import numpy as np
+import q3dviewer as q3d
+from OpenGL.GL import glFinish
+
+
+def make_scans(num_points, scan_size=100000):
+    # a vehicle driving on a 2km x 2km grid of streets
+    for i in range(0, num_points, scan_size):
+        t = i / num_points
+        pos = np.array([np.cos(8 * np.pi * t), np.sin(6 * np.pi * t), 0]) * 1000
+        scan = np.random.randn(scan_size, 4).astype(np.float32) * [30, 30, 5, 0]
+        scan[:, :3] += pos
+        scan[:, 3] = np.random.randint(0, 255, scan_size).astype(np.uint32).view(np.float32)
+        yield scan
+
+
+def run(app, num_points, dists, frames, culling):
+    viewer = q3d.Viewer(name='benchmark', win_size=[1280, 720])
+    cloud_item = q3d.CloudItem(size=1, alpha=1, color_mode='I')
+    if not culling:
+        # a single chunk is always visible
+        cloud_item.CHUNK_SIZE = cloud_item.max_cloud_size
+    viewer.add_items({'cloud': cloud_item})
+    viewer.show()
+    app.processEvents()
+    for scan in make_scans(num_points):
+        cloud_item.set_data(scan, append=True)
+    glwidget = viewer.glwidget
+    glwidget.repaint()
+    glwidget.set_center(np.array([1000, 0, 0]))
+    results = []
+    for dist in dists:
+        glwidget.set_dist(dist)
+        times = []
+        for i in range(frames):
+            glwidget.set_euler(np.array([0.8, 0, 2 * np.pi * i / frames]))
+            t0 = time.perf_counter()
+            glwidget.repaint()
+            glwidget.makeCurrent()
+            glFinish()
+            times.append(time.perf_counter() - t0)
+        results.append((dist, np.median(times), cloud_item.drawn_chunks,
+                        cloud_item.culled_chunks, cloud_item.drawn_points))
+    viewer.close()
+    app.processEvents()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--points", type=int, default=50,
+                        help="map size in million points")
+    parser.add_argument("--dists", type=float, nargs='+',
+                        default=[2000, 500, 100, 20],
+                        help="camera distances to the view center")
+    parser.add_argument("--frames", type=int, default=50)
+    args = parser.parse_args()
+
+    app = q3d.QApplication(['Chunk Culling Benchmark'])
+    print("%-10s %8s %12s %8s %8s %14s" %
+          ('culling', 'dist', 'median(ms)', 'drawn', 'culled', 'drawn points'))
+    for culling in [False, True]:
+        for dist, median, drawn, culled, points in run(
+                app, args.points * 1000000, args.dists, args.frames, culling):
+            print("%-10s %8.0f %12.1f %8d %8d %14d" %
+                  ('on' if culling else 'off', dist, median * 1e3,
+                   drawn, culled, points))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+
+"""
+Copyright 2024 Panasonic Advanced Technology Development Co.,Ltd. (Liu Yang)
+Distributed under MIT license. See LICENSE for more information.
+"""
+
+"""
+this script benchmarks appending points to a CloudItem.
+it reports the append throughput and the worst frame stall when the cloud
+grows to 10M/50M/100M points, for the fixed-step growth, the geometric growth
+and the persistently mapped buffer.
+
+usage:
+    python3 benchmark_cloud_append.py --sizes 10 50 100 --chunk 1000000
+"""
+
+import time
+import argparse
+import numpy as np
+import q3dviewer as q3d
+from OpenGL.GL import glFinish
+
+
+MODES = {
+    'fixed': dict(growth_factor=1.0, persistent_map=False),
+    'geometric': dict(growth_factor=2.0, persistent_map=False),
+    'persistent': dict(growth_factor=2.0, persistent_map=True),
+}
+
+
+def run(app, num_points, chunk_size, growth_factor, persistent_map):
+    viewer = q3d.Viewer(name='benchmark', win_size=[640, 480])
+    cloud_item = q3d.CloudItem(size=1, alpha=1, color_mode='I',
+                               persistent_map=persistent_map)
+    cloud_item.growth_factor = growth_factor
+    viewer.add_items({'cloud': cloud_item})
+    viewer.show()
+    app.processEvents()
+
+    chunk = np.random.rand(chunk_size, 3).astype(np.float32) * 100
+    stalls = []
+    appended = 0
+    start = time.perf_counter()
+    while appended < num_points:
+        cloud_item.set_data(chunk, append=True)
+        t0 = time.perf_counter()
+        viewer.glwidget.repaint()
+        viewer.glwidget.makeCurrent()
+        glFinish()
+        stalls.append(time.perf_counter() - t0)
+        appended += chunk_size
+    total = time.perf_counter() - start
+    max_size = cloud_item.max_cloud_size
+    viewer.close()
+    app.processEvents()
+    return appended / total, max(stalls), np.median(stalls), max_size
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs='+', default=[10, 50, 100],
+                        help="cloud sizes in million points")
+    parser.add_argument("--chunk", type=int, default=1000000,
+                        help="points per append")
+    parser.add_argument("--modes", nargs='+', default=list(MODES.keys()),
+                        choices=list(MODES.keys()))
+    args = parser.parse_args()
+
+    app = q3d.QApplication(['Cloud Append Benchmark'])
+    print("%-12s %8s %16s %14s %14s" %
+          ('mode', 'points', 'append (Mpt/s)', 'max stall(ms)', 'median(ms)'))
+    for size in args.sizes:
+        for mode in args.modes:
+            throughput, max_stall, median, max_size = run(
+                app, size * 1000000, args.chunk, **MODES[mode])
+            note = ''
+            if size * 1000000 > max_size:
+                note = '(capped to %d points)' % max_size
+            print("%-12s %7dM %16.2f %14.1f %14.1f %s" %
+                  (mode, size, throughput / 1e6, max_stall * 1e3,
+                   median * 1e3, note))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+
+"""
+Copyright 2024 Panasonic Advanced Technology Development Co.,Ltd. (Liu Yang)
+Distributed under MIT license. See LICENSE for more information.
+"""
+
+"""
+this script measures the compact gaussians (compress_gs): the memory per
+gaussian, the compression time, and the error of the decoded attributes.
+the color error is the error of the sh color seen from random directions,
+in 8 bits color levels.
+if no file is given, random gaussians (sh_dim = 48) are generated.
+
+usage:
+    python3 benchmark_gaussian_compact.py --path scene.ply
+    python3 benchmark_gaussian_compact.py --num 1
+"""
+
+import time
+import argparse
+import numpy as np
+from q3dviewer.utils.cloud_io import gsdata_type, load_gs, compress_gs, decompress_gs
+
+
+SH_C0 = 0.28209479177387814
+SH_C1 = 0.4886025119029199
+
+
+def make_gaussians(num, sh_dim=48):
+    gs = np.zeros(num, dtype=gsdata_type(sh_dim))
+    gs['pw'] = np.random.randn(num, 3) * 20
+    rot = np.random.randn(num, 4)
+    gs['rot'] = rot / np.linalg.norm(rot, axis=1)[:, np.newaxis]
+    gs['scale'] = np.exp(np.random.randn(num, 3) - 4)
+    gs['alpha'] = np.random.rand(num)
+    gs['sh'][:, :3] = np.random.randn(num, 3)
+    gs['sh'][:, 3:] = np.random.randn(num, sh_dim - 3) * 0.1
+    return gs
+
+
+def sh_color(gs, dirs):
+    # the color of sh degree 0 and 1, as computed by gau_prep.glsl
+    sh = gs['sh']
+    c = SH_C0 * sh[:, 0:3]
+    if sh.shape[1] > 3:
+        x, y, z = dirs[:, 0:1], dirs[:, 1:2], dirs[:, 2:3]
+        c = c - SH_C1 * y * sh[:, 3:6] + SH_C1 * z * sh[:, 6:9] - SH_C1 * x * sh[:, 9:12]
+    return np.clip(c + 0.5, 0, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--path", help="a gaussian file (.ply/.npy)")
+    parser.add_argument("--num", type=float, default=1,
+                        help="million random gaussians, if no path is given")
+    args = parser.parse_args()
+
+    gs = load_gs(args.path) if args.path else make_gaussians(int(args.num * 1000000))
+    t0 = time.perf_counter()
+    cgs, codebook = compress_gs(gs)
+    t_compress = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    dgs = decompress_gs(cgs, codebook)
+    t_decompress = time.perf_counter() - t0
+
+    print("gaussians: %d, sh_dim: %d" % (gs.shape[0], gs['sh'].shape[1]))
+    print("bytes per gaussian: %d -> %d (%.2fx)" %
+          (gs.dtype.itemsize, cgs.dtype.itemsize, gs.dtype.itemsize / cgs.dtype.itemsize))
+    print("compress: %.2f s, decompress: %.2f s" % (t_compress, t_decompress))
+
+    scale = np.linalg.norm(gs['scale'], axis=1)
+    pos_err = np.linalg.norm(dgs['pw'] - gs['pw'], axis=1)
+    print("position error / scale: median %.4f, p99 %.4f" %
+          (np.median(pos_err / scale), np.percentile(pos_err / scale, 99)))
+    print("scale relative error: max %.5f" %
+          np.max(np.abs(dgs['scale'] - gs['scale']) / gs['scale']))
+    # q and -q are the same rotation
+    rot_err = 1 - np.abs(np.sum(dgs['rot'] * gs['rot'], axis=1))
+    print("rotation error (1 - |q.q'|): max %.6f" % rot_err.max())
+    print("alpha error: max %.4f" % np.max(np.abs(dgs['alpha'] - gs['alpha'])))
+    dirs = np.random.randn(gs.shape[0], 3)
+    dirs /= np.linalg.norm(dirs, axis=1)[:, np.newaxis]
+    color_err = np.abs(sh_color(dgs, dirs) - sh_color(gs, dirs)) * 255
+    print("color error (levels): mean %.3f, p99 %.3f, max %.3f" %
+          (color_err.mean(), np.percentile(color_err, 99), color_err.max()))
+
+
+if __name__ == "__main__":
+    main()
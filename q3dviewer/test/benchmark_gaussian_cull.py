@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+
+"""
+Copyright 2024 Panasonic Advanced Technology Development Co.,Ltd. (Liu Yang)
+Distributed under MIT license. See LICENSE for more information.
+"""
+
+"""
+this script benchmarks the culling of GaussianItem.
+the camera turns around inside a large scene, so most of the gaussians are
+behind it or off-screen. for every gpu backend it reports the frame time
+with and without culling, and the visible part of the gaussians.
+
+usage:
+    python3 benchmark_gaussian_cull.py --size 3 --frames 30
+"""
+
+import time
+import argparse
+import numpy as np
+import q3dviewer as q3d
+from OpenGL.GL import glFinish
+
+
+def make_gaussians(num):
+    gs = np.zeros((num, 14), dtype=np.float32)  # sh_dim = 3
+    gs[:, :3] = np.random.rand(num, 3) * [200, 200, 10] - [100, 100, 5]
+    gs[:, 3] = 1
+    gs[:, 7:10] = 0.05
+    gs[:, 10] = np.random.rand(num)
+    gs[:, 11:14] = np.random.randn(num, 3)
+    return gs
+
+
+def run(app, gs, backend, cull, frames):
+    viewer = q3d.Viewer(name='benchmark', win_size=[1280, 720])
+    gau_item = q3d.GaussianItem(sort_backend=backend, cull=cull)
+    viewer.add_items({'gaussian': gau_item})
+    gau_item.set_data(gs_data=gs)
+    viewer.show()
+    app.processEvents()
+    glwidget = viewer.glwidget
+    glwidget.set_cam_position(center=np.zeros(3), distance=1,
+                              euler=np.array([np.pi / 2, 0, 0]))
+    glwidget.repaint()  # upload the gaussians
+    times = []
+    visible = []
+    for i in range(frames):
+        glwidget.rotate(rz=2 * np.pi / frames)
+        glwidget.makeCurrent()
+        glFinish()
+        t0 = time.perf_counter()
+        glwidget.repaint()
+        glwidget.makeCurrent()
+        glFinish()
+        times.append(time.perf_counter() - t0)
+        visible.append(gau_item.get_visible_num())
+    viewer.close()
+    app.processEvents()
+    return np.median(times), np.mean(visible) / gs.shape[0]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=float, default=3, help="million gaussians")
+    parser.add_argument("--backends", nargs='+', default=['radix', 'bitonic'])
+    parser.add_argument("--frames", type=int, default=30)
+    args = parser.parse_args()
+
+    app = q3d.QApplication(['Gaussian Cull Benchmark'])
+    gs = make_gaussians(int(args.size * 1000000))
+    print("%-10s %6s %12s %10s" % ('backend', 'cull', 'frame(ms)', 'visible'))
+    for backend in args.backends:
+        for cull in [False, True]:
+            t_frame, visible = run(app, gs, backend, cull, args.frames)
+            print("%-10s %6s %12.1f %9.1f%%" %
+                  (backend, cull, t_frame * 1e3, visible * 100))
+
+
+if __name__ == "__main__":
+    main()
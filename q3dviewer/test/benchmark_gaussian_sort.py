@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+
+"""
+Copyright 2024 Panasonic Advanced Technology Development Co.,Ltd. (Liu Yang)
+Distributed under MIT license. See LICENSE for more information.
+"""
+
+"""
+this script benchmarks the depth sort of GaussianItem.
+for every backend and every scene size, it reports the time of a full sort
+and of a refine step of the radix backend (the high bits only sort used
+for small camera motions).
+
+usage:
+    python3 benchmark_gaussian_sort.py --sizes 1 3 6 --backends radix bitonic cpu
+"""
+
+import time
+import argparse
+import numpy as np
+import q3dviewer as q3d
+from OpenGL.GL import glFinish
+
+
+def make_gaussians(num):
+    gs = np.zeros((num, 14), dtype=np.float32)  # sh_dim = 3
+    gs[:, :3] = np.random.randn(num, 3) * 10
+    gs[:, 3] = 1
+    gs[:, 7:10] = 0.05
+    gs[:, 10] = 0.5
+    gs[:, 11:14] = np.random.randn(num, 3)
+    return gs
+
+
+def timed(func, glwidget, repeat):
+    times = []
+    for i in range(repeat):
+        glwidget.makeCurrent()
+        glFinish()
+        t0 = time.perf_counter()
+        func()
+        glFinish()
+        times.append(time.perf_counter() - t0)
+    return np.median(times)
+
+
+def run(app, gs, backend, repeat):
+    viewer = q3d.Viewer(name='benchmark', win_size=[1280, 720])
+    gau_item = q3d.GaussianItem(sort_backend=backend)
+    viewer.add_items({'gaussian': gau_item})
+    gau_item.set_data(gs_data=gs)
+    viewer.show()
+    app.processEvents()
+    glwidget = viewer.glwidget
+    glwidget.set_dist(40)
+    glwidget.repaint()  # upload the gaussians and preprocess them
+    if backend == 'cpu':
+        # the cpu sort runs on a thread, time the sort itself.
+        Rz = glwidget.view_matrix[2, :3].astype(np.float32)
+        t_sort = timed(lambda: gau_item.sort_cpu_index(
+            Rz, gau_item.get_sort_pw()), glwidget, repeat)
+    else:
+        t_sort = timed(gau_item.sort, glwidget, repeat)
+    t_refine = np.nan
+    if backend == 'radix':
+        t_refine = timed(lambda: gau_item.radix_sort(gau_item.refine_bits),
+                         glwidget, repeat)
+    viewer.close()
+    app.processEvents()
+    return t_sort, t_refine
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=float, nargs='+', default=[1, 3, 6],
+                        help="million gaussians")
+    parser.add_argument("--backends", nargs='+', default=['radix', 'bitonic', 'cpu'],
+                        help="radix, bitonic, cpu or torch")
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    app = q3d.QApplication(['Gaussian Sort Benchmark'])
+    print("%-10s %12s %12s %12s" % ('backend', 'gaussians', 'sort(ms)', 'refine(ms)'))
+    for size in args.sizes:
+        gs = make_gaussians(int(size * 1000000))
+        for backend in args.backends:
+            t_sort, t_refine = run(app, gs, backend, args.repeat)
+            print("%-10s %11.1fM %12.1f %12.1f" %
+                  (backend, size, t_sort * 1e3, t_refine * 1e3))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+
+"""
+Copyright 2024 Panasonic Advanced Technology Development Co.,Ltd. (Liu Yang)
+Distributed under MIT license. See LICENSE for more information.
+"""
+
+"""
+this script compares the frame time of the two render modes of GaussianItem:
+ - quad: a quad per gaussian, alpha blended back to front.
+ - tile: the gaussians are binned into screen tiles and blended front to
+   back by a compute shader, which stops once a tile is opaque.
+the camera turns around a dense scene, at several window sizes.
+
+usage:
+    python3 benchmark_gaussian_tile.py --size 1 --resolutions 640x480 1280x720 1920x1080
+"""
+
+import time
+import argparse
+import numpy as np
+import q3dviewer as q3d
+from OpenGL.GL import glFinish
+
+
+def make_gaussians(num):
+    gs = np.zeros((num, 14), dtype=np.float32)  # sh_dim = 3
+    gs[:, :3] = np.random.randn(num, 3) * 10
+    gs[:, 3] = 1
+    gs[:, 7:10] = np.random.rand(num, 3) * 0.3 + 0.05
+    gs[:, 10] = np.random.rand(num) * 0.5 + 0.5
+    gs[:, 11:14] = np.random.randn(num, 3)
+    return gs
+
+
+def run(app, gs, width, height, tiled, frames):
+    viewer = q3d.Viewer(name='benchmark', win_size=[width, height])
+    gau_item = q3d.GaussianItem()
+    gau_item.tiled = tiled
+    viewer.add_items({'gaussian': gau_item})
+    gau_item.set_data(gs_data=gs)
+    viewer.show()
+    app.processEvents()
+    glwidget = viewer.glwidget
+    glwidget.set_dist(30)
+    glwidget.repaint()  # upload the gaussians
+    times = []
+    for i in range(frames):
+        glwidget.rotate(rz=2 * np.pi / frames)
+        glwidget.makeCurrent()
+        glFinish()
+        t0 = time.perf_counter()
+        glwidget.repaint()
+        glwidget.makeCurrent()
+        glFinish()
+        times.append(time.perf_counter() - t0)
+    viewer.close()
+    app.processEvents()
+    return np.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=float, default=1, help="million gaussians")
+    parser.add_argument("--resolutions", nargs='+',
+                        default=['640x480', '1280x720', '1920x1080'])
+    parser.add_argument("--frames", type=int, default=30)
+    args = parser.parse_args()
+
+    app = q3d.QApplication(['Gaussian Tile Benchmark'])
+    gs = make_gaussians(int(args.size * 1000000))
+    print("%-12s %12s %12s %10s" % ('resolution', 'quad(ms)', 'tile(ms)', 'speedup'))
+    for resolution in args.resolutions:
+        width, height = [int(v) for v in resolution.split('x')]
+        t_quad = run(app, gs, width, height, False, args.frames)
+        t_tile = run(app, gs, width, height, True, args.frames)
+        print("%-12s %12.1f %12.1f %9.2fx" %
+              (resolution, t_quad * 1e3, t_tile * 1e3, t_quad / t_tile))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+
+"""
+Copyright 2024 Panasonic Advanced Technology Development Co.,Ltd. (Liu Yang)
+Distributed under MIT license. See LICENSE for more information.
+"""
+
+"""
+this script measures the per item cost of painting a scene of many small
+items, as the keyframes of film_maker (one FrameItem per keyframe):
+ - push/pop: every item is painted inside glPushAttrib(GL_ALL_ATTRIB_BITS)
+   and glPopAttrib, as before the gl state cache.
+ - cache: the default state is restored through the gl state cache, the
+   calls which don't change the state are skipped.
+it reports the frame time, and the state calls issued and skipped per frame.
+
+usage:
+    python3 benchmark_gl_state.py --items 10 100 500
+"""
+
+import time
+import argparse
+import numpy as np
+import q3dviewer as q3d
+from OpenGL.GL import *
+
+
+class PushPopGLWidget(q3d.GLWidget):
+    def paint_item(self, item):
+        glMatrixMode(GL_MODELVIEW)
+        glPushMatrix()
+        glPushAttrib(GL_ALL_ATTRIB_BITS)
+        try:
+            item.paint()
+        finally:
+            glPopAttrib()
+            glMatrixMode(GL_MODELVIEW)
+            glPopMatrix()
+        # the state is restored behind the cache
+        self.gl_state.invalidate()
+
+
+def run(app, num, gl_widget_class, frames):
+    viewer = q3d.Viewer(name='benchmark', win_size=[1280, 720],
+                        gl_widget_class=gl_widget_class)
+    items = {'grid': q3d.GridItem(size=100, spacing=5)}
+    for i in range(num):
+        T = np.eye(4)
+        T[:3, 3] = [np.cos(i * 0.1) * 20, np.sin(i * 0.1) * 20, i * 0.05]
+        items['frame%d' % i] = q3d.FrameItem(T=T, size=(1, 0.8), width=2)
+    viewer.add_items(items)
+    viewer.show()
+    app.processEvents()
+    glwidget = viewer.glwidget
+    glwidget.repaint()
+    times = []
+    calls = []
+    for i in range(frames):
+        glwidget.rotate(rz=2 * np.pi / frames)
+        glwidget.makeCurrent()
+        glFinish()
+        t0 = time.perf_counter()
+        glwidget.repaint()
+        glwidget.makeCurrent()
+        glFinish()
+        times.append(time.perf_counter() - t0)
+        state = glwidget.gl_state
+        calls.append((state.issued, state.skipped))
+    viewer.close()
+    app.processEvents()
+    issued, skipped = np.mean(calls, axis=0)
+    return np.median(times), issued, skipped
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, nargs='+', default=[10, 100, 500])
+    parser.add_argument("--frames", type=int, default=30)
+    args = parser.parse_args()
+
+    app = q3d.QApplication(['GL State Benchmark'])
+    print("%-8s %-10s %12s %10s %10s" % ('items', 'mode', 'frame(ms)', 'issued', 'skipped'))
+    for num in args.items:
+        for mode, gl_widget_class in [('push/pop', PushPopGLWidget), ('cache', q3d.GLWidget)]:
+            t_frame, issued, skipped = run(app, num, gl_widget_class, args.frames)
+            print("%-8d %-10s %12.2f %10d %10d" % (num, mode, t_frame * 1e3, issued, skipped))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+
+"""
+Copyright 2024 Panasonic Advanced Technology Development Co.,Ltd. (Liu Yang)
+Distributed under MIT license. See LICENSE for more information.
+"""
+
+"""
+this script compares the time and the peak memory of loading a 3DGS ply:
+ - meshio: the previous loader, which reads the ply with meshio.
+ - native: load_gs_ply, which maps the vertex block and converts it
+   chunk by chunk into one gsdata_type array.
+each loader runs in its own process (linux only). a test file is generated
+if the given path does not exist.
+
+usage:
+    python3 benchmark_gs_ply_load.py --path /tmp/bench_gs.ply --gaussians 1
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+import numpy as np
+
+
+def make_gs_ply(path, num, sh_dim=48):
+    names = ['x', 'y', 'z', 'nx', 'ny', 'nz', 'f_dc_0', 'f_dc_1', 'f_dc_2'] + \
+        ['f_rest_%d' % i for i in range(sh_dim - 3)] + \
+        ['opacity', 'scale_0', 'scale_1', 'scale_2',
+         'rot_0', 'rot_1', 'rot_2', 'rot_3']
+    vertices = np.random.randn(num, len(names)).astype(np.float32)
+    vertices[:, 3:6] = 0
+    header = ['ply', 'format binary_little_endian 1.0',
+              'element vertex %d' % num] + \
+        ['property float %s' % n for n in names] + ['end_header']
+    with open(path, 'wb') as f:
+        f.write(('\n'.join(header) + '\n').encode())
+        vertices.tofile(f)
+
+
+def vm_size(key):
+    # memory size in MB from /proc/self/status
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith(key):
+                return int(line.split()[1]) / 1024
+    return 0
+
+
+def child(loader, path):
+    import meshio
+    from q3dviewer.utils.cloud_io import load_gs_ply, load_gs_ply_meshio
+    # reset the peak RSS (linux only), so the imports are not counted
+    with open('/proc/self/clear_refs', 'w') as f:
+        f.write('5')
+    base = vm_size('VmRSS')
+    t0 = time.perf_counter()
+    if loader == 'meshio':
+        gs = load_gs_ply_meshio(path)
+    else:
+        gs = load_gs_ply(path)
+    elapsed = time.perf_counter() - t0
+    peak = vm_size('VmHWM')
+    checksum = float(gs['alpha'].astype(np.float64).sum())
+    print(json.dumps({'time': elapsed, 'peak': peak - base,
+                      'size': gs.nbytes / 2**20, 'checksum': checksum}))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--path", default="/tmp/q3d_benchmark_gs.ply")
+    parser.add_argument("--gaussians", type=float, default=1,
+                        help="million gaussians of the generated file")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args.path)
+        return
+
+    if not os.path.exists(args.path):
+        print("generate %s ..." % args.path)
+        make_gs_ply(args.path, int(args.gaussians * 1000000))
+    print("file size: %.1f MB" % (os.path.getsize(args.path) / 2**20))
+    print("%-10s %10s %22s %12s" % ('loader', 'time(s)', 'peak RSS growth(MB)', 'result(MB)'))
+    checksums = []
+    for loader in ['meshio', 'native']:
+        out = subprocess.run([sys.executable, __file__, '--path', args.path,
+                              '--child', loader],
+                             capture_output=True, text=True, check=True)
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        checksums.append(result['checksum'])
+        print("%-10s %10.2f %22.0f %12.0f" % (loader, result['time'],
+                                              result['peak'], result['size']))
+    assert np.isclose(checksums[0], checksums[1], rtol=1e-4)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+
+"""
+Copyright 2024 Panasonic Advanced Technology Development Co.,Ltd. (Liu Yang)
+Distributed under MIT license. See LICENSE for more information.
+"""
+
+"""
+this script measures the cost of an idle viewer, showing a large static
+cloud while nobody touches it:
+ - continuous: the scene is painted at every update of the timer.
+ - on-demand: the scene is painted only when something is changed.
+it reports the painted frames and the cpu time of the process (the main
+thread and the gl driver) during the idle time.
+
+usage:
+    python3 benchmark_idle.py --size 10 --seconds 10
+"""
+
+import time
+import argparse
+import numpy as np
+import q3dviewer as q3d
+
+
+class CountingGLWidget(q3d.GLWidget):
+    def __init__(self):
+        self.frames = 0
+        super().__init__()
+
+    def paintGL(self):
+        self.frames += 1
+        super().paintGL()
+
+
+def make_cloud(num):
+    cloud = (np.random.rand(num, 4) * [100, 100, 10, 0]).astype(np.float32)
+    cloud[:, 3] = np.random.randint(0, 255, num).astype(np.uint32).view(np.float32)
+    return cloud
+
+
+def run(app, cloud, continuous, seconds):
+    viewer = q3d.Viewer(name='benchmark', win_size=[1280, 720],
+                        gl_widget_class=CountingGLWidget, continuous=continuous)
+    cloud_item = q3d.CloudItem(size=1, alpha=1)
+    viewer.add_items({'cloud': cloud_item})
+    cloud_item.set_data(cloud)
+    viewer.show()
+    # let the cloud be uploaded, then measure the idle time only.
+    t_end = time.perf_counter() + 1
+    while time.perf_counter() < t_end:
+        app.processEvents()
+    glwidget = viewer.glwidget
+    glwidget.frames = 0
+    cpu0 = time.process_time()
+    t0 = time.perf_counter()
+    while time.perf_counter() - t0 < seconds:
+        app.processEvents(q3d.QtCore.QEventLoop.AllEvents, 50)
+        time.sleep(0.005)
+    cpu = time.process_time() - cpu0
+    wall = time.perf_counter() - t0
+    frames = glwidget.frames
+    viewer.close()
+    app.processEvents()
+    return frames / wall, cpu / wall
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=float, default=10, help="million points")
+    parser.add_argument("--seconds", type=float, default=10, help="idle time of each run")
+    args = parser.parse_args()
+
+    app = q3d.QApplication(['Idle Benchmark'])
+    cloud = make_cloud(int(args.size * 1000000))
+    print("%-12s %10s %10s" % ('mode', 'fps', 'cpu(%)'))
+    for continuous in [True, False]:
+        fps, cpu = run(app, cloud, continuous, args.seconds)
+        print("%-12s %10.1f %10.1f" %
+              ('continuous' if continuous else 'on-demand', fps, cpu * 100))
+
+
+if __name__ == "__main__":
+    main()
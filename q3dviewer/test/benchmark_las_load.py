@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+
+"""
+Copyright 2024 Panasonic Advanced Technology Development Co.,Ltd. (Liu Yang)
+Distributed under MIT license. See LICENSE for more information.
+"""
+
+"""
+this script compares the peak memory of loading a las file:
+ - read: the previous loader, which reads the whole file with laspy.
+ - chunked: load_las, which converts the file chunk by chunk into one cloud array.
+ - stream: iter_las, which yields the chunks (as pushed to CloudItem.set_data),
+   the peak memory above the python baseline is bounded by the chunk size.
+each loader runs in its own process (linux only). a test file is generated
+if the given path does not exist.
+
+usage:
+    python3 benchmark_las_load.py --path /tmp/bench.las --points 50
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+import numpy as np
+
+
+def load_las_read(file):
+    # the loader before the chunked loader
+    import laspy
+    with laspy.open(file) as f:
+        las = f.read()
+        xyz = np.vstack((las.x, las.y, las.z)).transpose()
+        dimensions = list(las.point_format.dimension_names)
+        rgb = np.zeros([las.x.shape[0]], dtype=np.uint32)
+        intensity = np.zeros([las.x.shape[0]], dtype=np.uint32)
+        if 'intensity' in dimensions:
+            intensity = las.intensity.astype(np.uint32)
+        if 'red' in dimensions and 'green' in dimensions and 'blue' in dimensions:
+            red = las.red.astype(np.uint32)
+            green = las.green.astype(np.uint32)
+            blue = las.blue.astype(np.uint32)
+            if np.max([red, green, blue]) > 255:
+                red = (red / 255).astype(np.uint32)
+                green = (green / 255).astype(np.uint32)
+                blue = (blue / 255).astype(np.uint32)
+            rgb = (red << 16) | (green << 8) | blue
+        if np.max(intensity) > 255:
+            intensity = (intensity / 255).astype(np.uint32)
+            intensity = np.clip(intensity, 0, 255)
+        color = (intensity << 24) | rgb
+        dtype = [('xyz', '<f4', (3,)), ('irgb', '<u4')]
+        cloud = np.rec.fromarrays([xyz, color], dtype=dtype)
+    return cloud
+
+
+def make_las(path, num_points):
+    import laspy
+    header = laspy.LasHeader(point_format=3, version="1.2")
+    header.scales = [0.001, 0.001, 0.001]
+    las = laspy.LasData(header)
+    las.x = np.random.rand(num_points) * 1000
+    las.y = np.random.rand(num_points) * 1000
+    las.z = np.random.rand(num_points) * 10
+    las.intensity = np.random.randint(0, 65535, num_points)
+    las.red = np.random.randint(0, 65535, num_points)
+    las.green = np.random.randint(0, 65535, num_points)
+    las.blue = np.random.randint(0, 65535, num_points)
+    las.write(path)
+
+
+def vm_size(key):
+    # memory size in MB from /proc/self/status
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith(key):
+                return int(line.split()[1]) / 1024
+    return 0
+
+
+def child(loader, path):
+    import laspy
+    from q3dviewer.utils.cloud_io import load_las, iter_las
+    # reset the peak RSS (linux only), so the imports are not counted
+    with open('/proc/self/clear_refs', 'w') as f:
+        f.write('5')
+    base = vm_size('VmRSS')
+    t0 = time.perf_counter()
+    if loader == 'read':
+        num = load_las_read(path).shape[0]
+    elif loader == 'chunked':
+        num = load_las(path).shape[0]
+    else:
+        num = 0
+        for cloud in iter_las(path):
+            num += cloud.shape[0]
+    elapsed = time.perf_counter() - t0
+    peak = vm_size('VmHWM')
+    print(json.dumps({'time': elapsed, 'peak': peak - base, 'points': num}))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--path", default="/tmp/q3d_benchmark.las")
+    parser.add_argument("--points", type=int, default=50,
+                        help="million points of the generated file")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args.path)
+        return
+
+    if not os.path.exists(args.path):
+        print("generate %s ..." % args.path)
+        make_las(args.path, args.points * 1000000)
+    print("file size: %.1f MB" % (os.path.getsize(args.path) / 2**20))
+    print("%-10s %10s %22s" % ('loader', 'time(s)', 'peak RSS growth(MB)'))
+    for loader in ['read', 'chunked', 'stream']:
+        out = subprocess.run([sys.executable, __file__, '--path', args.path,
+                              '--child', loader],
+                             capture_output=True, text=True, check=True)
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        print("%-10s %10.2f %22.0f" % (loader, result['time'], result['peak']))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+
+"""
+Copyright 2024 Panasonic Advanced Technology Development Co.,Ltd. (Liu Yang)
+Distributed under MIT license. See LICENSE for more information.
+"""
+
+"""
+this script benchmarks the level-of-detail mode of CloudItem.
+it renders a synthetic terrain while the camera orbits around it,
+and reports the frame time with and without LOD for several point budgets.
+
+usage:
+    python3 benchmark_lod.py --points 50 --budgets 1 5 10
+"""
+
+import time
+import argparse
+import numpy as np
+import q3dviewer as q3d
+from OpenGL.GL import glFinish
+
+
+def make_terrain(num_points):
+    xy = np.random.rand(num_points, 2).astype(np.float32) * 1000 - 500
+    z = 20 * np.sin(xy[:, 0] / 50) * np.cos(xy[:, 1] / 70)
+    cloud = np.zeros((num_points, 4), dtype=np.float32)
+    cloud[:, :2] = xy
+    cloud[:, 2] = z
+    cloud[:, 3] = ((z + 20) * 6).astype(np.uint32).view(np.float32)
+    return cloud
+
+
+def run(app, cloud, lod, point_budget, frames):
+    viewer = q3d.Viewer(name='benchmark', win_size=[1280, 720])
+    cloud_item = q3d.CloudItem(size=1, alpha=1, color_mode='I',
+                               lod=lod, point_budget=point_budget)
+    t0 = time.perf_counter()
+    cloud_item.set_data(cloud)
+    build_time = time.perf_counter() - t0
+    viewer.add_items({'cloud': cloud_item})
+    viewer.show()
+    app.processEvents()
+
+    glwidget = viewer.glwidget
+    glwidget.set_dist(600)
+    times = []
+    drawn = []
+    for i in range(frames):
+        glwidget.set_euler(np.array([1.0, 0, 2 * np.pi * i / frames]))
+        t0 = time.perf_counter()
+        glwidget.repaint()
+        glwidget.makeCurrent()
+        glFinish()
+        times.append(time.perf_counter() - t0)
+        drawn.append(cloud_item.drawn_points)
+    viewer.close()
+    app.processEvents()
+    # the first frame uploads the cloud
+    return build_time, np.median(times[1:]), np.max(times[1:]), np.mean(drawn)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--points", type=int, default=50,
+                        help="cloud size in million points")
+    parser.add_argument("--budgets", type=int, nargs='+', default=[1, 5, 10],
+                        help="point budgets in million points")
+    parser.add_argument("--frames", type=int, default=100)
+    args = parser.parse_args()
+
+    app = q3d.QApplication(['LOD Benchmark'])
+    cloud = make_terrain(args.points * 1000000)
+    print("%-16s %10s %14s %14s %14s" %
+          ('mode', 'build(s)', 'median(ms)', 'max(ms)', 'drawn points'))
+    configs = [('full', False, 0)] + \
+        [('lod %dM' % b, True, b * 1000000) for b in args.budgets]
+    for name, lod, budget in configs:
+        build_time, median, worst, drawn = run(
+            app, cloud, lod, budget, args.frames)
+        print("%-16s %10.2f %14.1f %14.1f %14d" %
+              (name, build_time, median * 1e3, worst * 1e3, drawn))
+
+
+if __name__ == "__main__":
+    main()
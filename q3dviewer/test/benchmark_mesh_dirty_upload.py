@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+
+"""
+Copyright 2024 Panasonic Advanced Technology Development Co.,Ltd. (Liu Yang)
+Distributed under MIT license. See LICENSE for more information.
+"""
+
+"""
+this script measures the frame time of MeshItem after a keyed update of a
+few faces of a large mesh:
+ - full: the whole valid buffer is uploaded (the dirty ranges are dropped,
+   as before the dirty range tracking).
+ - dirty: only the coalesced ranges of the modified faces are uploaded.
+the changed faces are either clustered (as the voxels of a live mesher) or
+scattered over the mesh.
+
+usage:
+    python3 benchmark_mesh_dirty_upload.py --faces 2 --changed 1000
+"""
+
+import time
+import argparse
+import numpy as np
+import q3dviewer as q3d
+from OpenGL.GL import glFinish
+
+
+def make_faces(num, rng):
+    faces = rng.random((num, 13)).astype(np.float32) * 100
+    faces[:, 12] = 1.0
+    return faces
+
+
+def run(app, faces, batches, indexed, dirty):
+    viewer = q3d.Viewer(name='benchmark', win_size=[1280, 720])
+    mesh_item = q3d.MeshItem(indexed=indexed)
+    viewer.add_items({'mesh': mesh_item})
+    viewer.show()
+    app.processEvents()
+    glwidget = viewer.glwidget
+    glwidget.set_dist(200)
+    mesh_item.set_incremental_faces(np.arange(faces.shape[0]), faces)
+    glwidget.repaint()  # the first upload
+    times = []
+    for keys, batch in batches:
+        mesh_item.set_incremental_faces(keys, batch)
+        if not dirty:
+            for ranges in [mesh_item.dirty_faces, mesh_item.dirty_vertices,
+                           mesh_item.dirty_triangles]:
+                ranges.clear()
+        glwidget.makeCurrent()
+        glFinish()
+        t0 = time.perf_counter()
+        glwidget.repaint()
+        glwidget.makeCurrent()
+        glFinish()
+        times.append(time.perf_counter() - t0)
+    viewer.close()
+    app.processEvents()
+    return np.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--faces", type=float, default=2, help="million faces of the mesh")
+    parser.add_argument("--changed", type=int, default=1000, help="faces per update")
+    parser.add_argument("--updates", type=int, default=20)
+    args = parser.parse_args()
+
+    app = q3d.QApplication(['Mesh Upload Benchmark'])
+    rng = np.random.default_rng(0)
+    num = int(args.faces * 1000000)
+    faces = make_faces(num, rng)
+    print("%-10s %-10s %12s %12s %10s" % ('layout', 'changes', 'full(ms)', 'dirty(ms)', 'speedup'))
+    for pattern in ['clustered', 'scattered']:
+        batches = []
+        for i in range(args.updates):
+            if pattern == 'clustered':
+                start = rng.integers(0, num - args.changed)
+                keys = np.arange(start, start + args.changed)
+            else:
+                keys = rng.choice(num, args.changed, replace=False)
+            batches.append((keys, faces[keys] + 1))
+        for indexed in [False, True]:
+            t_full = run(app, faces, batches, indexed, False)
+            t_dirty = run(app, faces, batches, indexed, True)
+            print("%-10s %-10s %12.1f %12.1f %9.2fx" %
+                  ('indexed' if indexed else 'faces', pattern,
+                   t_full * 1e3, t_dirty * 1e3, t_full / t_dirty))
+
+
+if __name__ == "__main__":
+    main()
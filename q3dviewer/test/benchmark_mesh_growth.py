@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+
+"""
+Copyright 2024 Panasonic Advanced Technology Development Co.,Ltd. (Liu Yang)
+Distributed under MIT license. See LICENSE for more information.
+"""
+
+"""
+this script streams new faces into a MeshItem, with a frame after every
+batch, and compares the buffer growth strategies:
+ - fixed: the buffers grow by FACE_CAPACITY steps (growth_factor = 1).
+ - doubling: the buffers grow geometrically (growth_factor = 2).
+ - no mirror: doubling, and the faces are not kept in host memory
+   (host_mirror=False).
+the GPU buffers are resized with a GPU side copy of the uploaded faces.
+the total time, the number of GPU resizes and the host memory of the
+faces are reported.
+
+usage:
+    python3 benchmark_mesh_growth.py --faces 30 --batch 500000
+"""
+
+import time
+import argparse
+import numpy as np
+import q3dviewer as q3d
+from OpenGL.GL import glFinish
+
+
+def run(app, batch, total, growth_factor, host_mirror):
+    viewer = q3d.Viewer(name='benchmark', win_size=[640, 480])
+    mesh_item = q3d.MeshItem(host_mirror=host_mirror)
+    mesh_item.growth_factor = growth_factor
+    viewer.add_items({'mesh': mesh_item})
+    viewer.show()
+    app.processEvents()
+    glwidget = viewer.glwidget
+    glwidget.set_dist(200)
+    faces = np.random.rand(batch, 13).astype(np.float32) * 100
+    faces[:, 12] = 1.0
+    capacities = set()
+    t0 = time.perf_counter()
+    for start in range(0, total, batch):
+        mesh_item.set_incremental_faces(np.arange(start, start + batch), faces)
+        glwidget.repaint()
+        capacities.add(mesh_item.gpu_nbytes())
+    glwidget.makeCurrent()
+    glFinish()
+    elapsed = time.perf_counter() - t0
+    host = mesh_item.faces.nbytes
+    viewer.close()
+    app.processEvents()
+    return elapsed, len(capacities), host
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--faces", type=float, default=30, help="million faces streamed")
+    parser.add_argument("--batch", type=int, default=500000, help="faces per batch")
+    args = parser.parse_args()
+
+    app = q3d.QApplication(['Mesh Growth Benchmark'])
+    total = int(args.faces * 1000000)
+    print("%-10s %10s %10s %14s" % ('growth', 'time(s)', 'resizes', 'host(MB)'))
+    for name, growth_factor, host_mirror in [('fixed', 1.0, True),
+                                             ('doubling', 2.0, True),
+                                             ('no mirror', 2.0, False)]:
+        elapsed, resizes, host = run(app, args.batch, total, growth_factor, host_mirror)
+        print("%-10s %10.2f %10d %14.0f" % (name, elapsed, resizes, host / 2**20))
+
+
+if __name__ == "__main__":
+    main()
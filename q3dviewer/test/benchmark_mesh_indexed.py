@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+
+"""
+Copyright 2024 Panasonic Advanced Technology Development Co.,Ltd. (Liu Yang)
+Distributed under MIT license. See LICENSE for more information.
+"""
+
+"""
+this script compares the two layouts of MeshItem:
+ - faces: 13 floats (52 bytes) per face, with the vertex positions embedded.
+ - indexed: deduplicated vertices and uint32 triangles (indexed=True).
+a triangle soup of a height field (as loaded from a stl file) is set to
+the item, and the time of set_data, of the first frame (the upload) and
+the size of the GPU buffers are reported.
+
+usage:
+    python3 benchmark_mesh_indexed.py --triangles 2 4
+"""
+
+import time
+import argparse
+import numpy as np
+import q3dviewer as q3d
+from OpenGL.GL import glFinish
+
+
+def make_soup(num_triangles):
+    n = int(np.sqrt(num_triangles / 2)) + 1
+    x, y = np.meshgrid(np.linspace(-50, 50, n), np.linspace(-50, 50, n))
+    z = np.sin(x / 5) * np.cos(y / 5) * 5
+    v = np.stack([x, y, z], axis=-1).astype(np.float32)
+    a, b = v[:-1, :-1].reshape(-1, 3), v[1:, :-1].reshape(-1, 3)
+    c, d = v[1:, 1:].reshape(-1, 3), v[:-1, 1:].reshape(-1, 3)
+    return np.stack([a, b, c, a, c, d], axis=1).reshape(-1, 3)
+
+
+def run(app, soup, indexed):
+    viewer = q3d.Viewer(name='benchmark', win_size=[1280, 720])
+    mesh_item = q3d.MeshItem(indexed=indexed)
+    viewer.add_items({'mesh': mesh_item})
+    viewer.show()
+    app.processEvents()
+    glwidget = viewer.glwidget
+    glwidget.set_dist(150)
+    t0 = time.perf_counter()
+    mesh_item.set_data(soup)
+    t_set = time.perf_counter() - t0
+    glwidget.makeCurrent()
+    glFinish()
+    t0 = time.perf_counter()
+    glwidget.repaint()
+    glwidget.makeCurrent()
+    glFinish()
+    t_upload = time.perf_counter() - t0
+    nbytes = mesh_item.gpu_nbytes()
+    viewer.close()
+    app.processEvents()
+    return t_set, t_upload, nbytes
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--triangles", type=float, nargs='+', default=[2, 4],
+                        help="million triangles")
+    args = parser.parse_args()
+
+    app = q3d.QApplication(['Mesh Layout Benchmark'])
+    print("%-10s %12s %12s %14s %12s" %
+          ('layout', 'triangles', 'set_data(s)', 'first frame(s)', 'GPU(MB)'))
+    for size in args.triangles:
+        soup = make_soup(size * 1000000)
+        for indexed in [False, True]:
+            t_set, t_upload, nbytes = run(app, soup, indexed)
+            print("%-10s %11.1fM %12.2f %14.2f %12.1f" %
+                  ('indexed' if indexed else 'faces', soup.shape[0] / 3e6,
+                   t_set, t_upload, nbytes / 2**20))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+
+"""
+Copyright 2024 Panasonic Advanced Technology Development Co.,Ltd. (Liu Yang)
+Distributed under MIT license. See LICENSE for more information.
+"""
+
+"""
+this script compares the two keyed update APIs of MeshItem:
+ - dict: set_incremental_data({face_key: (13 floats)}).
+ - bulk: set_incremental_faces(int64 keys, Nx13 array).
+a mesh of keyed faces is built, then updated by batches where most of the
+faces exist already (as the changed voxels of a live mesher). no window is
+needed, only the CPU side of the updates is measured.
+
+usage:
+    python3 benchmark_mesh_keyed_update.py --faces 1 --changed 100000
+"""
+
+import time
+import argparse
+import numpy as np
+from q3dviewer.custom_items.mesh_item import MeshItem
+
+
+def make_faces(keys, rng):
+    # the corners are on a grid, so the faces share vertices
+    faces = rng.integers(0, 1000, (keys.shape[0], 13)).astype(np.float32)
+    faces[:, 12] = 1.0
+    return faces
+
+
+def run(indexed, keys, faces, batches, bulk):
+    mesh_item = MeshItem(indexed=indexed)
+    if bulk:
+        mesh_item.set_incremental_faces(keys, faces)
+    else:
+        mesh_item.set_incremental_data(
+            {k: tuple(f) for k, f in zip(keys.tolist(), faces.tolist())})
+    times = []
+    for batch_keys, batch_faces in batches:
+        if bulk:
+            t0 = time.perf_counter()
+            mesh_item.set_incremental_faces(batch_keys, batch_faces)
+        else:
+            fs = {k: tuple(f) for k, f in zip(batch_keys.tolist(), batch_faces.tolist())}
+            t0 = time.perf_counter()
+            mesh_item.set_incremental_data(fs)
+        times.append(time.perf_counter() - t0)
+    return np.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--faces", type=float, default=1, help="million faces of the mesh")
+    parser.add_argument("--changed", type=int, default=100000, help="faces per update")
+    parser.add_argument("--new", type=float, default=0.1, help="part of new faces per update")
+    parser.add_argument("--updates", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    keys = rng.choice(1 << 40, int(args.faces * 1000000), replace=False).astype(np.int64)
+    faces = make_faces(keys, rng)
+    batches = []
+    n_new = int(args.changed * args.new)
+    for i in range(args.updates):
+        batch_keys = np.concatenate([rng.choice(keys, args.changed - n_new, replace=False),
+                                     rng.integers(0, 1 << 40, n_new)])
+        batches.append((batch_keys, make_faces(batch_keys, rng)))
+
+    print("%-10s %12s %12s %10s" % ('layout', 'dict(ms)', 'bulk(ms)', 'speedup'))
+    for indexed in [False, True]:
+        t_dict = run(indexed, keys, faces, batches, False)
+        t_bulk = run(indexed, keys, faces, batches, True)
+        print("%-10s %12.1f %12.1f %9.2fx" % ('indexed' if indexed else 'faces',
+                                              t_dict * 1e3, t_bulk * 1e3, t_dict / t_bulk))
+
+
+if __name__ == "__main__":
+    main()
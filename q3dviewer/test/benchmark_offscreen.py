@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+
+"""
+Copyright 2024 Panasonic Advanced Technology Development Co.,Ltd. (Liu Yang)
+Distributed under MIT license. See LICENSE for more information.
+"""
+
+"""
+this script measures the headless rendering of OffscreenRenderer, without
+any window (e.g. on a CI node with Mesa llvmpipe): the camera turns around a
+cloud, and every pose is rendered to a numpy image. it reports the time per
+pose at several image sizes, and can save the last flythrough as a video.
+with --platform osmesa it is also the smoke test of the OSMesa context.
+
+usage:
+    python3 benchmark_offscreen.py --size 1 --poses 100 --resolutions 320x240 1280x720
+    python3 benchmark_offscreen.py --poses 300 --resolutions 640x480 --video flythrough.mp4
+    python3 benchmark_offscreen.py --platform osmesa --size 0.1 --poses 10 --resolutions 320x240
+"""
+
+import os
+import time
+import argparse
+import numpy as np
+
+
+def make_cloud(num):
+    cloud = (np.random.rand(num, 4) * [100, 100, 10, 0] - [50, 50, 0, 0]).astype(np.float32)
+    cloud[:, 3] = np.random.randint(0, 255, num).astype(np.uint32).view(np.float32)
+    return cloud
+
+
+def make_poses(num):
+    # turn around the center, as the camera pose of GLWidget
+    return [{'center': [0, 0, 0], 'euler': [np.pi / 3, 0, a], 'distance': 80}
+            for a in np.linspace(0, 2 * np.pi, num, endpoint=False)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=float, default=1, help="million points")
+    parser.add_argument("--poses", type=int, default=100)
+    parser.add_argument("--resolutions", nargs='+', default=['320x240', '1280x720'])
+    parser.add_argument("--video", type=str, default=None, help="save the last flythrough")
+    parser.add_argument("--platform", choices=['egl', 'osmesa'],
+                        default=os.environ.get('PYOPENGL_PLATFORM', 'egl'))
+    args = parser.parse_args()
+    os.environ['PYOPENGL_PLATFORM'] = args.platform  # before importing q3dviewer
+    import q3dviewer as q3d
+
+    cloud = make_cloud(int(args.size * 1000000))
+    poses = make_poses(args.poses)
+    print("%-12s %10s %12s %10s" % ('resolution', 'poses', 'pose(ms)', 'fps'))
+    for resolution in args.resolutions:
+        width, height = [int(v) for v in resolution.split('x')]
+        with q3d.OffscreenRenderer(width, height) as renderer:
+            cloud_item = q3d.CloudItem(size=1, alpha=1)
+            cloud_item.set_data(cloud)
+            renderer.add_items({'grid': q3d.GridItem(size=100, spacing=5),
+                                'cloud': cloud_item})
+            renderer.render(poses[0])  # upload the cloud
+            t0 = time.perf_counter()
+            images = renderer.render_poses(poses)
+            t = (time.perf_counter() - t0) / len(poses)
+        if not images.any():
+            print("[Offscreen] Warning: nothing is drawn at %s." % resolution)
+        print("%-12s %10d %12.2f %10.1f" % (resolution, len(poses), t * 1e3, 1 / t))
+
+    if args.video is not None:
+        import imageio.v2 as imageio
+        imageio.mimwrite(args.video, list(images), fps=30)
+        print("Saved %s" % args.video)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+
+"""
+Copyright 2024 Panasonic Advanced Technology Development Co.,Ltd. (Liu Yang)
+Distributed under MIT license. See LICENSE for more information.
+"""
+
+"""
+this script benchmarks loading many tile files with cloud_io.iter_clouds.
+it compares the wall time with 1 worker and with cpu_count workers,
+using a thread pool and a process pool.
+the tiles are generated in the given directory if they do not exist.
+
+usage:
+    python3 benchmark_parallel_load.py --dir /tmp/tiles --tiles 200 --points 1 --format las
+"""
+
+import os
+import time
+import argparse
+import numpy as np
+from q3dviewer.utils.cloud_io import iter_clouds, save_las, save_pcd
+
+
+def make_tiles(path, num_tiles, num_points, format):
+    os.makedirs(path, exist_ok=True)
+    files = []
+    dtype = [('xyz', '<f4', (3,)), ('irgb', '<u4')]
+    for i in range(num_tiles):
+        file = os.path.join(path, 'tile_%04d.%s' % (i, format))
+        files.append(file)
+        if os.path.exists(file):
+            continue
+        cloud = np.empty(num_points, dtype)
+        cloud['xyz'] = np.random.rand(num_points, 3) * [100, 100, 10] + [100 * i, 0, 0]
+        cloud['irgb'] = np.random.randint(0, 1 << 32, num_points, dtype=np.uint64)
+        if format == 'las':
+            save_las(cloud, file)
+        else:
+            save_pcd(cloud, file)
+    return files
+
+
+def run(files, max_workers, use_process):
+    t0 = time.perf_counter()
+    num = 0
+    for index, cloud, xyz_sum, n in iter_clouds(
+            files, max_workers=max_workers, ordered=False, use_process=use_process):
+        num += cloud.shape[0]
+    return time.perf_counter() - t0, num
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dir", default="/tmp/q3d_tiles")
+    parser.add_argument("--tiles", type=int, default=200)
+    parser.add_argument("--points", type=float, default=1,
+                        help="million points per tile")
+    parser.add_argument("--format", default="las", choices=['las', 'pcd'])
+    args = parser.parse_args()
+
+    files = make_tiles(args.dir, args.tiles, int(args.points * 1000000), args.format)
+    cpu_count = os.cpu_count() or 1
+    print("%d tiles, %d cpus" % (len(files), cpu_count))
+    print("%-10s %8s %10s %14s" % ('pool', 'workers', 'time(s)', 'Mpt/s'))
+    for use_process in [False, True]:
+        for workers in sorted({1, cpu_count}):
+            elapsed, num = run(files, workers, use_process)
+            print("%-10s %8d %10.2f %14.2f" % ('process' if use_process else 'thread',
+                  workers, elapsed, num / elapsed / 1e6))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+
+"""
+Copyright 2024 Panasonic Advanced Technology Development Co.,Ltd. (Liu Yang)
+Distributed under MIT license. See LICENSE for more information.
+"""
+
+"""
+this script compares the memory-mapped pcd loader with the previous
+pypcd4 based loader. each loader runs in its own process, so the peak RSS
+of each loader can be measured.
+a test file (x, y, z, intensity, rgb; 20 bytes per point) is generated if
+the given path does not exist. 1 GB is about 50M points.
+
+usage:
+    python3 benchmark_pcd_load.py --path /tmp/bench.pcd --points 50
+    python3 benchmark_pcd_load.py --path /tmp/bench.pcd --points 50 --compressed
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import subprocess
+import numpy as np
+
+
+def load_pcd_pypcd4(file):
+    # the loader before the memory-mapped fast path
+    from pypcd4 import PointCloud
+    dtype = [('xyz', '<f4', (3,)), ('irgb', '<u4')]
+    pc = PointCloud.from_path(file).pc_data
+    rgb = np.zeros([pc.shape[0]], dtype=np.uint32)
+    intensity = np.zeros([pc.shape[0]], dtype=np.uint32)
+    if 'intensity' in pc.dtype.names:
+        intensity = pc['intensity'].astype(np.uint32)
+        max_initensity = np.max(intensity)
+        if max_initensity > 255:
+            intensity = (intensity / max_initensity * 255).astype(np.uint32)
+    if 'rgb' in pc.dtype.names:
+        rgb = pc['rgb'].astype(np.uint32)
+    irgb = (intensity << 24) | rgb
+    xyz = np.stack([pc['x'], pc['y'], pc['z']], axis=1)
+    cloud = np.rec.fromarrays([xyz, irgb], dtype=dtype)
+    return cloud
+
+
+def make_pcd(path, num_points, compressed):
+    from pypcd4 import PointCloud, MetaData, Encoding
+    fields = ('x', 'y', 'z', 'intensity', 'rgb')
+    metadata = MetaData.model_validate(
+        {
+            "fields": fields,
+            "size": [4, 4, 4, 4, 4],
+            "type": ['F', 'F', 'F', 'U', 'U'],
+            "count": [1, 1, 1, 1, 1],
+            "width": num_points,
+            "points": num_points,
+        })
+    dtype = [('x', '<f4'), ('y', '<f4'), ('z', '<f4'),
+             ('intensity', '<u4'), ('rgb', '<u4')]
+    data = np.empty(num_points, dtype)
+    for name in ['x', 'y', 'z']:
+        data[name] = np.random.rand(num_points) * 100
+    data['intensity'] = np.random.randint(0, 1000, num_points)
+    data['rgb'] = np.random.randint(0, 1 << 24, num_points)
+    encoding = Encoding.BINARY_COMPRESSED if compressed else Encoding.BINARY
+    PointCloud(metadata, data).save(path, encoding=encoding)
+
+
+def child(loader, path):
+    import pypcd4
+    from q3dviewer.utils.cloud_io import load_pcd
+    if loader == 'pypcd4':
+        load_pcd = load_pcd_pypcd4
+    t0 = time.perf_counter()
+    cloud = load_pcd(path)
+    elapsed = time.perf_counter() - t0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # MB
+    print(json.dumps({'time': elapsed, 'peak': peak,
+                      'points': cloud.shape[0], 'cloud_mb': cloud.nbytes / 2**20}))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--path", default="/tmp/q3d_benchmark.pcd")
+    parser.add_argument("--points", type=int, default=50,
+                        help="million points of the generated file")
+    parser.add_argument("--compressed", action="store_true",
+                        help="generate a binary_compressed file")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args.path)
+        return
+
+    if not os.path.exists(args.path):
+        print("generate %s ..." % args.path)
+        make_pcd(args.path, args.points * 1000000, args.compressed)
+    print("file size: %.1f MB" % (os.path.getsize(args.path) / 2**20))
+    print("%-10s %10s %14s %14s" % ('loader', 'time(s)', 'peak RSS(MB)', 'cloud(MB)'))
+    for loader in ['pypcd4', 'mmap']:
+        out = subprocess.run([sys.executable, __file__, '--path', args.path,
+                              '--child', loader],
+                             capture_output=True, text=True, check=True)
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        print("%-10s %10.2f %14.0f %14.0f" % (loader, result['time'],
+              result['peak'], result['cloud_mb']))
+
+
+if __name__ == "__main__":
+    main()
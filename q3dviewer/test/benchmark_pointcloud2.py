@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+
+"""
+Copyright 2024 Panasonic Advanced Technology Development Co.,Ltd. (Liu Yang)
+Distributed under MIT license. See LICENSE for more information.
+"""
+
+"""
+this script compares convert_pointcloud2_msg with the previous conversion,
+for several PointCloud2 layouts. ROS is not needed, the messages are faked.
+ - legacy: the previous conversion.
+ - new: the cached layout, without an output buffer.
+ - buffer: the cached layout, writing into a reused output buffer.
+
+usage:
+    python3 benchmark_pointcloud2.py --points 260000 --repeat 100
+"""
+
+import time
+import argparse
+import numpy as np
+from types import SimpleNamespace
+from q3dviewer.utils.convert_ros_msg import get_dtype, convert_pointcloud2_msg
+
+
+def convert_pointcloud2_msg_legacy(msg):
+    # the conversion before the cached layout
+    structured_dtype = get_dtype(msg)
+    pc = np.frombuffer(msg.data, dtype=structured_dtype)
+    data_type = [('xyz', '<f4', (3,)), ('irgb', '<u4')]
+    rgb = np.zeros([pc.shape[0]], dtype=np.uint32)
+    intensity = np.zeros([pc.shape[0]], dtype=np.uint32)
+    fields = ['xyz']
+    if 'intensity' in pc.dtype.names:
+        intensity = pc['intensity']
+        intensity = np.clip(intensity, 0, 255)
+        intensity = intensity.astype(np.uint32)
+        fields.append('intensity')
+    if 'rgb' in pc.dtype.names:
+        rgb = pc['rgb'].view(np.uint32)
+        fields.append('rgb')
+    irgb = (intensity << 24) | rgb
+    xyz = np.stack([pc['x'], pc['y'], pc['z']], axis=1)
+    cloud = np.rec.fromarrays([xyz, irgb], dtype=data_type)
+    stamp = msg.header.stamp.to_sec()
+    return cloud, fields, stamp
+
+
+# name: (fields (name, datatype, offset), point_step)
+LAYOUTS = {
+    'xyzrgb': ([('x', 7, 0), ('y', 7, 4), ('z', 7, 8), ('rgb', 7, 12)], 16),
+    'xyzi': ([('x', 7, 0), ('y', 7, 4), ('z', 7, 8), ('intensity', 7, 12)], 16),
+    'pcl_xyzi': ([('x', 7, 0), ('y', 7, 4), ('z', 7, 8), ('intensity', 7, 16)], 32),
+    'ouster': ([('x', 7, 0), ('y', 7, 4), ('z', 7, 8), ('intensity', 7, 16),
+                ('t', 6, 20), ('reflectivity', 4, 24), ('ring', 2, 26),
+                ('ambient', 4, 28), ('range', 6, 32)], 48),
+}
+
+
+def make_msg(fields, point_step, num_points):
+    # a fake PointCloud2 message with random points
+    msg = SimpleNamespace(
+        fields=[SimpleNamespace(name=n, datatype=t, offset=o) for n, t, o in fields],
+        point_step=point_step,
+        header=SimpleNamespace(stamp=SimpleNamespace(to_sec=lambda: 0.0)))
+    data = np.random.randint(0, 256, num_points * point_step, dtype=np.uint8)
+    pc = data.view(np.dtype(get_dtype(msg)))
+    for name in ['x', 'y', 'z']:
+        pc[name] = np.random.randn(num_points) * 50
+    if 'intensity' in pc.dtype.names:
+        pc['intensity'] = np.random.rand(num_points) * 300
+    if 'rgb' in pc.dtype.names:
+        pc['rgb'] = np.random.randint(0, 1 << 24, num_points).astype(np.uint32).view(np.float32)
+    msg.data = data.tobytes()
+    return msg
+
+
+def timeit(func, repeat):
+    times = []
+    for i in range(repeat):
+        t0 = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - t0)
+    return np.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--points", type=int, default=260000,
+                        help="points per message")
+    parser.add_argument("--repeat", type=int, default=100)
+    args = parser.parse_args()
+
+    print("%-10s %12s %12s %12s %10s" %
+          ('layout', 'legacy(ms)', 'new(ms)', 'buffer(ms)', 'speedup'))
+    buffer = np.empty(args.points, dtype=[('xyz', '<f4', (3,)), ('irgb', '<u4')])
+    for name, (fields, point_step) in LAYOUTS.items():
+        msg = make_msg(fields, point_step, args.points)
+        legacy, legacy_fields, _ = convert_pointcloud2_msg_legacy(msg)
+        cloud, new_fields, _ = convert_pointcloud2_msg(msg, out=buffer)
+        assert legacy_fields == new_fields
+        assert np.array_equal(legacy['xyz'], cloud['xyz'])
+        assert np.array_equal(legacy['irgb'], cloud['irgb'])
+        t_legacy = timeit(lambda: convert_pointcloud2_msg_legacy(msg), args.repeat)
+        t_new = timeit(lambda: convert_pointcloud2_msg(msg), args.repeat)
+        t_buffer = timeit(lambda: convert_pointcloud2_msg(msg, out=buffer), args.repeat)
+        print("%-10s %12.2f %12.2f %12.2f %9.1fx" %
+              (name, t_legacy * 1e3, t_new * 1e3, t_buffer * 1e3, t_legacy / t_buffer))
+
+
+if __name__ == "__main__":
+    main()
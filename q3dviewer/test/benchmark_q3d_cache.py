@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+
+"""
+Copyright 2024 Panasonic Advanced Technology Development Co.,Ltd. (Liu Yang)
+Distributed under MIT license. See LICENSE for more information.
+"""
+
+"""
+this script benchmarks the q3d cache of cloud_io.load_cloud.
+it loads a cloud file three times:
+ - parse: without cache.
+ - first: parse the file and write the q3d cache.
+ - reopen: map the q3d cache, then read all points (as the VBO upload does).
+a test file is generated if the given path does not exist.
+
+usage:
+    python3 benchmark_q3d_cache.py --path /tmp/bench.las --points 100
+"""
+
+import os
+import time
+import shutil
+import argparse
+import tempfile
+import numpy as np
+from q3dviewer.utils.cloud_io import load_cloud, save_las, save_pcd
+
+
+def make_cloud_file(path, num_points):
+    dtype = [('xyz', '<f4', (3,)), ('irgb', '<u4')]
+    cloud = np.empty(num_points, dtype)
+    cloud['xyz'] = np.random.rand(num_points, 3) * [1000, 1000, 10]
+    cloud['irgb'] = np.random.randint(0, 1 << 32, num_points, dtype=np.uint64)
+    if path.endswith('.las'):
+        save_las(cloud, path)
+    else:
+        save_pcd(cloud, path)
+
+
+def timed_load(path, cache_dir):
+    t0 = time.perf_counter()
+    cloud = load_cloud(path, cache_dir=cache_dir)
+    # touch every point, so the time of a memory mapped cloud is comparable
+    checksum = int(np.bitwise_xor.reduce(cloud['irgb']))
+    return time.perf_counter() - t0, checksum
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--path", default="/tmp/q3d_benchmark.las",
+                        help="a las/pcd file, generated if it does not exist")
+    parser.add_argument("--points", type=int, default=100,
+                        help="million points of the generated file")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.path):
+        print("generate %s ..." % args.path)
+        make_cloud_file(args.path, args.points * 1000000)
+    print("file size: %.1f MB" % (os.path.getsize(args.path) / 2**20))
+
+    cache_dir = tempfile.mkdtemp(prefix='q3d_cache_')
+    try:
+        t_parse, c0 = timed_load(args.path, None)
+        t_first, c1 = timed_load(args.path, cache_dir)
+        t_reopen, c2 = timed_load(args.path, cache_dir)
+    finally:
+        shutil.rmtree(cache_dir)
+    assert c0 == c1 == c2
+    print("%-10s %10s %10s" % ('load', 'time(s)', 'speedup'))
+    for name, t in [('parse', t_parse), ('first', t_first), ('reopen', t_reopen)]:
+        print("%-10s %10.2f %9.1fx" % (name, t, t_parse / t))
+
+
+if __name__ == "__main__":
+    main()
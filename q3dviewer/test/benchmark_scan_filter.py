@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+
+"""
+Copyright 2024 Panasonic Advanced Technology Development Co.,Ltd. (Liu Yang)
+Distributed under MIT license. See LICENSE for more information.
+"""
+
+"""
+this script benchmarks the scan filters of ros_viewer on a simulated drive.
+the vehicle drives forth and back on the same street, so a map that grows
+with the time doubles while the explored area does not.
+ - random: the previous random.sample downsampling.
+ - stride / voxel: the per-scan filters of cloud_filter.
+ - occupancy: stride filter plus a VoxelOccupancy map.
+
+usage:
+    python3 benchmark_scan_filter.py --scans 200 --scan-points 260000
+"""
+
+import time
+import random
+import argparse
+import numpy as np
+from q3dviewer.utils.cloud_filter import voxel_filter, stride_filter, VoxelOccupancy
+
+
+def make_scan(i, num_scans, num_points):
+    # a ring of points around the vehicle, forth then back along x
+    t = i / num_scans
+    pos = np.array([1000 * (1 - abs(2 * t - 1)), 0, 0])
+    cloud = np.zeros(num_points, dtype=[('xyz', '<f4', (3,)), ('irgb', '<u4')])
+    angle = np.random.rand(num_points) * 2 * np.pi
+    dist = 5 + np.random.rand(num_points) * 50
+    cloud['xyz'][:, 0] = pos[0] + dist * np.cos(angle)
+    cloud['xyz'][:, 1] = dist * np.sin(angle)
+    cloud['xyz'][:, 2] = np.random.rand(num_points) * 5
+    return cloud
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scans", type=int, default=200)
+    parser.add_argument("--scan-points", type=int, default=260000)
+    parser.add_argument("--scan-num", type=int, default=100000,
+                        help="points kept per scan")
+    parser.add_argument("--voxel", type=float, default=0.5)
+    args = parser.parse_args()
+
+    occupancy = VoxelOccupancy(args.voxel)
+    filters = {
+        'random': lambda c: c[random.sample(range(c.shape[0]), args.scan_num)],
+        'stride': lambda c: stride_filter(c, args.scan_num),
+        'voxel': lambda c: stride_filter(voxel_filter(c, args.voxel), args.scan_num),
+        'occupancy': lambda c: occupancy.filter(stride_filter(c, args.scan_num)),
+    }
+    scans = [make_scan(i, args.scans, args.scan_points) for i in range(args.scans)]
+    print("%-10s %14s %16s" % ('filter', 'per scan(ms)', 'map points(M)'))
+    for name, scan_filter in filters.items():
+        times = []
+        map_points = 0
+        for scan in scans:
+            t0 = time.perf_counter()
+            cloud = scan_filter(scan)
+            times.append(time.perf_counter() - t0)
+            map_points += cloud.shape[0]
+        print("%-10s %14.1f %16.2f" % (name, np.median(times) * 1e3, map_points / 1e6))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+
+"""
+Copyright 2024 Panasonic Advanced Technology Development Co.,Ltd. (Liu Yang)
+Distributed under MIT license. See LICENSE for more information.
+"""
+
+"""
+this script measures the cost of the uniforms:
+ - set_uniform: the time of a call with the cached locations of the program
+   (compile_program), and with a glGetUniformLocation lookup (a plain id).
+ - frame: the frame time of a scene of many small clouds (as the submaps of
+   a slam map), their matrices come from the camera block of the glwidget.
+
+usage:
+    python3 benchmark_uniforms.py --clouds 10 100 500
+"""
+
+import time
+import argparse
+import numpy as np
+import q3dviewer as q3d
+from OpenGL.GL import glFinish, glUseProgram
+from q3dviewer.utils import set_uniform
+
+
+def bench_set_uniform(program, calls):
+    glUseProgram(program)
+    t0 = time.perf_counter()
+    for i in range(calls):
+        set_uniform(program, 0.5, 'alpha')
+    t = (time.perf_counter() - t0) / calls
+    glUseProgram(0)
+    return t
+
+
+def run(app, num, frames):
+    viewer = q3d.Viewer(name='benchmark', win_size=[1280, 720])
+    items = {}
+    for i in range(num):
+        cloud = np.random.rand(1000, 3).astype(np.float32) + [i % 20, i // 20, 0]
+        items['cloud%d' % i] = q3d.CloudItem(size=2, alpha=1)
+        items['cloud%d' % i].set_data(cloud)
+    viewer.add_items(items)
+    viewer.show()
+    app.processEvents()
+    glwidget = viewer.glwidget
+    glwidget.repaint()
+    times = []
+    for i in range(frames):
+        glwidget.rotate(rz=2 * np.pi / frames)
+        glwidget.makeCurrent()
+        glFinish()
+        t0 = time.perf_counter()
+        glwidget.repaint()
+        glwidget.makeCurrent()
+        glFinish()
+        times.append(time.perf_counter() - t0)
+    glwidget.makeCurrent()
+    program = items['cloud0'].program
+    t_cached = bench_set_uniform(program, 10000)
+    t_lookup = bench_set_uniform(int(program), 10000)
+    viewer.close()
+    app.processEvents()
+    return np.median(times), t_cached, t_lookup
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clouds", type=int, nargs='+', default=[10, 100, 500])
+    parser.add_argument("--frames", type=int, default=30)
+    args = parser.parse_args()
+
+    app = q3d.QApplication(['Uniform Benchmark'])
+    print("%-8s %12s %18s %18s" % ('clouds', 'frame(ms)', 'cached call(us)', 'lookup call(us)'))
+    for num in args.clouds:
+        t_frame, t_cached, t_lookup = run(app, num, args.frames)
+        print("%-8d %12.2f %18.2f %18.2f" % (num, t_frame * 1e3, t_cached * 1e6, t_lookup * 1e6))
+
+
+if __name__ == "__main__":
+    main()
@@ -19,45 +19,77 @@ class ProgressWindow(QDialog):
         self.setMinimumWidth(400)
         self.label = QLabel(self)
         self.label.setAlignment(Qt.AlignCenter)
+        self.file_text = ""
+
         layout = QVBoxLayout()
         layout.addWidget(self.label)
         self.setLayout(layout)
 
     def update_progress(self, current, total, file_name):
-        text = f"[{current}/{total}] loading file: {file_name}"
-        self.label.setText(text)
+        self.file_text = f"[{current}/{total}] loading file: {file_name}"
+        self.label.setText(self.file_text)
+
+    def update_chunk_progress(self, loaded, total):
+        percent = 100 * loaded // max(total, 1)
+        self.label.setText(f"{self.file_text} ({percent}%)")
 
 
 class FileLoaderThread(QThread):
     progress = Signal(int, int, str)  # current, total, filename
+    chunk_progress = Signal(int, int)  # loaded, total (points of a streamed file, or files)
     finished = Signal()
 
-    def __init__(self, viewer, files):
+    def __init__(self, viewer, files, max_workers=None, ordered=False):
         super().__init__()
         self.viewer = viewer
         self.files = files
+        self.max_workers = max_workers
+        self.ordered = ordered
+        self.cam_moved = False
 
     def run(self):
+        import os
         cloud_item = self.viewer['cloud']
         mesh_item = self.viewer['mesh']
-        total = len(self.files)
-        for i, url in enumerate(self.files):
-            # if the file is a mesh file, use mesh_item to load
-            file_path = url.toLocalFile()
-            import os
-            file_name = os.path.basename(file_path)
-            self.progress.emit(i + 1, total, file_name)
-            
-            if url.toLocalFile().lower().endswith(('.stl')):
-                from q3dviewer.utils.cloud_io import load_stl
-                mesh = load_stl(file_path)
-                mesh_item.set_data(mesh)
-            else:
-                cloud = cloud_item.load(file_path, append=(i > 0))
-                center = np.nanmean(cloud['xyz'].astype(np.float64), axis=0)
-                self.viewer.glwidget.set_cam_position(center=center)
+        paths = [url.toLocalFile() for url in self.files]
+        # if the file is a mesh file, use mesh_item to load
+        mesh_files = [p for p in paths if p.lower().endswith('.stl')]
+        cloud_files = [p for p in paths if not p.lower().endswith('.stl')]
+        total = len(paths)
+        for i, file_path in enumerate(mesh_files):
+            self.progress.emit(i + 1, total, os.path.basename(file_path))
+            from q3dviewer.utils.cloud_io import load_stl
+            mesh = load_stl(file_path)
+            mesh_item.set_data(mesh)
+
+        if len(cloud_files) == 1:
+            # a single file is streamed chunk by chunk
+            file_path = cloud_files[0]
+            self.progress.emit(total, total, os.path.basename(file_path))
+            center = cloud_item.load_stream(
+                file_path, progress=self.on_chunk_loaded)
+        elif len(cloud_files) > 1:
+            # many files are decoded concurrently
+            def on_file_loaded(finished, num_files, file_path, center):
+                self.progress.emit(len(mesh_files) + finished, total,
+                                   os.path.basename(file_path))
+                self.on_chunk_loaded(finished, num_files, center)
+            center = cloud_item.load_files(
+                cloud_files, progress=on_file_loaded,
+                max_workers=self.max_workers, ordered=self.ordered)
+        else:
+            center = None
+        if center is not None:
+            self.viewer.glwidget.set_cam_position(center=center)
         self.finished.emit()
 
+    def on_chunk_loaded(self, loaded, total, center):
+        if not self.cam_moved:
+            # look at the first chunk, so the points are seen as they arrive.
+            self.viewer.glwidget.set_cam_position(center=center)
+            self.cam_moved = True
+        self.chunk_progress.emit(loaded, total)
+
 
 class CustomGLWidget(GLWidget):
     def __init__(self, viewer):
@@ -111,6 +143,7 @@ class CloudViewer(q3d.Viewer):
         super(CloudViewer, self).__init__(
             **kwargs,  gl_widget_class=gl_widget_class)
         self.setAcceptDrops(True)
+        self.load_workers = None  # None for os.cpu_count()
 
     def dragEnterEvent(self, event):
         if event.mimeData().hasUrls():
@@ -125,8 +158,11 @@ class CloudViewer(q3d.Viewer):
         self.progress_window = ProgressWindow(self)
         self.progress_window.show()
         files = event.mimeData().urls()
-        self.progress_thread = FileLoaderThread(self, files)
+        self.progress_thread = FileLoaderThread(
+            self, files, max_workers=self.load_workers)
         self.progress_thread.progress.connect(self.file_loading_progress)
+        self.progress_thread.chunk_progress.connect(
+            self.progress_window.update_chunk_progress)
         self.progress_thread.finished.connect(self.file_loading_finished)
         self.progress_thread.start()
 
@@ -195,17 +231,33 @@ def main():
     import argparse
     parser = argparse.ArgumentParser()
     parser.add_argument("--path", help="the cloud file path")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="the number of workers to load dropped files, default: the cpu count")
+    parser.add_argument("--cache-dir", default=None,
+                        help="cache the loaded files as q3d files in this directory "
+                             "(e.g. ~/.cache/q3dviewer), off by default. the cache has "
+                             "no size limit, a file takes 16 bytes per point")
+    parser.add_argument("--lod", action="store_true",
+                        help="draw the cloud with level of detail")
+    parser.add_argument("--point-budget", type=int, default=10000000,
+                        help="the maximum number of points drawn per frame in LOD mode")
+    parser.add_argument("--indexed", action="store_true",
+                        help="keep the meshes indexed: less gpu memory, but the vertices "
+                             "are deduplicated at every load (several times slower)")
     args = parser.parse_args()
     app = q3d.QApplication(['Cloud Viewer'])
     viewer = CloudViewer(name='Cloud Viewer')
-    cloud_item = q3d.CloudIOItem(size=1, alpha=0.1)
+    viewer.load_workers = args.workers
+    cloud_item = q3d.CloudIOItem(size=1, alpha=0.1, lod=args.lod,
+                                 point_budget=args.point_budget,
+                                 cache_dir=args.cache_dir)
     axis_item = q3d.AxisItem(size=0.5, width=5)
     axis_item.disable_setting()
     grid_item = q3d.GridItem(size=1000, spacing=20)
     marker_item = q3d.Text3DItem()  # Changed from CloudItem to Text3DItem
     text_item = q3d.Text2DItem(pos=(20, 40), text="", color='lime', size=16)
     text_item.disable_setting()
-    mesh_item = q3d.MeshItem()  # Added MeshIOItem for mesh support
+    mesh_item = q3d.MeshItem(indexed=args.indexed)  # Added MeshIOItem for mesh support
 
     viewer.add_items(
         {'marker': marker_item, 
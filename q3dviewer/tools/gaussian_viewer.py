@@ -7,7 +7,7 @@ Distributed under MIT license. See LICENSE for more information.
 
 import numpy as np
 import q3dviewer as q3d
-from q3dviewer.utils.cloud_io import load_gs, rotate_gaussian
+from q3dviewer.utils.cloud_io import load_gs, save_gs, rotate_gaussian
 
 
 class GuassianViewer(q3d.Viewer):
@@ -44,11 +44,29 @@ class GuassianViewer(q3d.Viewer):
 
 
 def main():
+    import argparse
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sort", default='auto',
+                        choices=['auto', 'torch', 'radix', 'bitonic', 'cpu'],
+                        help="the depth sort backend of the gaussians")
+    parser.add_argument("--compact", action="store_true",
+                        help="keep the gaussians compressed on the GPU")
+    parser.add_argument("--convert", nargs=2, metavar=('INPUT', 'OUTPUT'),
+                        help="convert a gaussian file (.ply/.npy/.npz) and exit, "
+                             "a .npz output is compressed")
+    args = parser.parse_args()
+
+    if args.convert:
+        gs = load_gs(args.convert[0])
+        save_gs(args.convert[1], gs)
+        print("Saved %d gaussians to %s" % (gs.shape[0], args.convert[1]))
+        return
+
     app = q3d.QApplication(['Guassian Viewer'])
     viewer = GuassianViewer(name='Guassian Viewer')
 
     grid_item = q3d.GridItem(size=1000, spacing=20)
-    gau_item = q3d.GaussianItem()
+    gau_item = q3d.GaussianItem(sort_backend=args.sort, compact=args.compact)
 
     viewer.add_items({'grid': grid_item, 'gaussian': gau_item})
 
@@ -11,37 +11,80 @@ import rospy
 from nav_msgs.msg import Odometry
 from sensor_msgs.msg import PointCloud2
 import numpy as np
-import random
 from sensor_msgs.msg import Image
 from q3dviewer.utils.convert_ros_msg import convert_pointcloud2_msg, convert_odometry_msg, convert_image_msg
+from q3dviewer.utils.cloud_filter import voxel_filter, stride_filter, distance_filter, VoxelOccupancy
 
 viewer = None
 point_num_per_scan = None
+scan_filters = []  # applied to every scan in order
+map_occupancy = None  # drops the points of the already filled map voxels
+sensor_pos = np.zeros(3)
 color_mode = None
 auto_set_color_mode = True
+# the scans are converted into this buffer, it grows with the largest scan
+scan_buffer = np.empty(0, dtype=[('xyz', '<f4', (3,)), ('irgb', '<u4')])
 
 def odom_cb(data):
     global viewer
+    global sensor_pos
     transform, _ = convert_odometry_msg(data)
+    sensor_pos = transform[:3, 3]
     viewer['odom'].set_transform(transform)
 
 
 def scan_cb(data):
     global viewer
-    global point_num_per_scan
     global auto_set_color_mode
-    cloud, fields, _ = convert_pointcloud2_msg(data)
-    if (cloud.shape[0] > point_num_per_scan):
-        idx = random.sample(range(cloud.shape[0]), point_num_per_scan)
-        cloud = cloud[idx]
+    global scan_buffer
+    num = data.width * data.height
+    if scan_buffer.shape[0] < num:
+        scan_buffer = np.empty(num, dtype=scan_buffer.dtype)
+    cloud, fields, _ = convert_pointcloud2_msg(data, out=scan_buffer)
+    for scan_filter in scan_filters:
+        cloud = scan_filter(cloud)
+    if np.shares_memory(cloud, scan_buffer):
+        # set_data keeps the array until it is uploaded, the next scan reuses the buffer
+        cloud = cloud.copy()
     if 'rgb' in fields and auto_set_color_mode:
         print("Set color mode to RGB")
         viewer['map'].set_color_mode('RGB')
         auto_set_color_mode = False
-    viewer['map'].set_data(data=cloud, append=True)
+    if map_occupancy is not None:
+        viewer['map'].set_data(data=map_occupancy.filter(cloud), append=True)
+    else:
+        viewer['map'].set_data(data=cloud, append=True)
     viewer['scan'].set_data(data=cloud)
 
 
+def make_scan_filters():
+    """
+    Build the scan filters from the ros params:
+        ~min_range, ~max_range: keep the points in this distance to the sensor.
+        ~scan_filter: 'stride' (keep scan_num points), 'voxel' (one point per
+            ~voxel_size voxel, then at most scan_num points) or 'none'.
+    """
+    filters = []
+    min_range = rospy.get_param("~min_range", 0.)
+    max_range = rospy.get_param("~max_range", 0.)
+    if min_range > 0 or max_range > 0:
+        max_range = max_range if max_range > 0 else np.inf
+        print("range filter: [%.1f, %.1f]" % (min_range, max_range))
+        filters.append(lambda cloud: distance_filter(
+            cloud, min_range, max_range, sensor_pos))
+    mode = rospy.get_param("~scan_filter", "stride")
+    if mode == 'voxel':
+        voxel_size = rospy.get_param("~voxel_size", 0.1)
+        print("voxel filter: %.2f m" % voxel_size)
+        filters.append(lambda cloud: voxel_filter(cloud, voxel_size))
+    if mode in ['stride', 'voxel']:
+        filters.append(lambda cloud: stride_filter(cloud, point_num_per_scan))
+    elif mode != 'none':
+        print("Unknown scan filter: %s, use 'stride', 'voxel' or 'none'." % mode)
+        filters.append(lambda cloud: stride_filter(cloud, point_num_per_scan))
+    return filters
+
+
 def image_cb(data):
     image, _ = convert_image_msg(data)
     viewer['img'].set_data(data=image)
@@ -52,6 +95,8 @@ def main():
 
     global viewer
     global point_num_per_scan
+    global scan_filters
+    global map_occupancy
     point_num_per_scan = 10000
     map_item = q3d.CloudIOItem(size=1, alpha=0.1, color_mode='I')
     scan_item = q3d.CloudItem(
@@ -69,6 +114,12 @@ def main():
 
     point_num_per_scan = rospy.get_param("scan_num", 100000)
     print("point_num_per_scan: %d" % point_num_per_scan)
+    scan_filters = make_scan_filters()
+    # ~map_voxel > 0: the map keeps one point per voxel of this size.
+    map_voxel = rospy.get_param("~map_voxel", 0.)
+    if map_voxel > 0:
+        print("map voxel: %.2f m" % map_voxel)
+        map_occupancy = VoxelOccupancy(map_voxel)
     rospy.Subscriber(
         "/cloud_registered", PointCloud2, scan_cb,
         queue_size=1, buff_size=2**24)
@@ -0,0 +1,172 @@
+"""
+Copyright 2024 Panasonic Advanced Technology Development Co.,Ltd. (Liu Yang)
+Distributed under MIT license. See LICENSE for more information.
+"""
+
+"""
+Vectorized downsampling filters for cloud arrays ([('xyz','<f4',(3,)),('irgb','<u4')]).
+
+Every filter takes a cloud and returns the kept points, so filters can be
+chained in front of CloudItem.set_data, e.g. to thin out the scans of a
+live sensor before they are appended to a map.
+"""
+
+import numpy as np
+
+
+VOXEL_BITS = 21  # bits per axis of a packed voxel key
+VOXEL_OFFSET = 1 << (VOXEL_BITS - 1)  # voxel indices in [-2^20, 2^20) are packed
+EMPTY_KEY = -1  # packed keys are never negative
+
+
+def voxel_keys(xyz, voxel_size):
+    """
+    Pack the voxel indices of the points into int64 keys.
+    Points farther than 2^20 voxels from the origin alias with other voxels.
+    """
+    idx = np.floor(xyz / voxel_size).astype(np.int64) + VOXEL_OFFSET
+    idx &= (1 << VOXEL_BITS) - 1
+    return (idx[:, 0] << (2 * VOXEL_BITS)) | (idx[:, 1] << VOXEL_BITS) | idx[:, 2]
+
+
+def finite_points(cloud):
+    # drop the nan / inf points, they have no voxel
+    mask = np.isfinite(cloud['xyz']).all(axis=1)
+    if mask.all():
+        return cloud
+    return cloud[mask]
+
+
+def voxel_filter(cloud, voxel_size):
+    """
+    Keep the first point of every voxel.
+    """
+    cloud = finite_points(cloud)
+    if cloud.shape[0] == 0:
+        return cloud
+    _, index = np.unique(voxel_keys(cloud['xyz'], voxel_size), return_index=True)
+    index.sort()  # keep the scan order
+    return cloud[index]
+
+
+def stride_filter(cloud, num):
+    """
+    Keep num points evenly spaced in the cloud (all points if there are fewer).
+    """
+    if cloud.shape[0] <= num:
+        return cloud
+    index = np.linspace(0, cloud.shape[0], num, endpoint=False).astype(np.int64)
+    return cloud[index]
+
+
+def distance_filter(cloud, min_dist=0., max_dist=np.inf, center=None):
+    """
+    Keep the points whose distance to center (the origin by default)
+    is in [min_dist, max_dist].
+    """
+    xyz = cloud['xyz']
+    if center is not None:
+        xyz = xyz - np.asarray(center, dtype=np.float32)
+    dist2 = np.einsum('ij,ij->i', xyz, xyz)
+    mask = (dist2 >= min_dist * min_dist) & (dist2 <= max_dist * max_dist)
+    return cloud[mask]
+
+
+class VoxelOccupancy:
+    """
+    The voxels filled by the points seen so far, stored in an open-addressing
+    hash set of packed voxel keys that is probed for a whole batch at once.
+    filter() keeps one point for every voxel that is not filled yet, so a map
+    fed through it grows with the explored area instead of with the time.
+    """
+    def __init__(self, voxel_size, capacity=1 << 16):
+        self.voxel_size = voxel_size
+        self.num = 0
+        self.table = np.full(max(int(capacity), 16), EMPTY_KEY, dtype=np.int64)
+
+    def __len__(self):
+        return self.num
+
+    def clear(self):
+        self.num = 0
+        self.table[:] = EMPTY_KEY
+
+    def slots(self, keys):
+        # fibonacci hashing, the top bits of key * 2^64 / phi
+        bits = self.table.shape[0].bit_length() - 1
+        h = keys.astype(np.uint64) * np.uint64(0x9e3779b97f4a7c15)
+        return (h >> np.uint64(64 - bits)).astype(np.int64)
+
+    def grow(self, num):
+        capacity = self.table.shape[0]
+        while num * 2 > capacity:  # keep the load factor under 0.5
+            capacity *= 2
+        if capacity == self.table.shape[0]:
+            return
+        keys = self.table[self.table != EMPTY_KEY]
+        self.table = np.full(capacity, EMPTY_KEY, dtype=np.int64)
+        self.num = 0
+        self.insert(keys)
+
+    def insert(self, keys):
+        """
+        Insert unique keys, return a mask of the keys that were not in the set.
+        """
+        self.grow(self.num + keys.shape[0])
+        table = self.table
+        mask = table.shape[0] - 1
+        new = np.zeros(keys.shape[0], dtype=bool)
+        pending = np.arange(keys.shape[0])
+        slots = self.slots(keys)
+        while pending.shape[0] > 0:
+            key = keys[pending]
+            slot = slots[pending]
+            cur = table[slot]
+            found = cur == key
+            empty = cur == EMPTY_KEY
+            # several keys may claim the same empty slot, the first one takes it.
+            claim = np.flatnonzero(empty)
+            _, first = np.unique(slot[claim], return_index=True)
+            taken = claim[first]
+            table[slot[taken]] = key[taken]
+            new[pending[taken]] = True
+            # linear probing: the keys that hit another key try the next slot,
+            # the keys that lost a claim retry the same slot.
+            probe = ~found & ~empty
+            slots[pending[probe]] = (slot[probe] + 1) & mask
+            done = found
+            done[taken] = True
+            pending = pending[~done]
+        self.num += int(np.count_nonzero(new))
+        return new
+
+    def contains(self, keys):
+        """
+        Return a mask of the keys that are in the set.
+        """
+        table = self.table
+        mask = table.shape[0] - 1
+        result = np.zeros(keys.shape[0], dtype=bool)
+        pending = np.arange(keys.shape[0])
+        slots = self.slots(keys)
+        while pending.shape[0] > 0:
+            cur = table[slots[pending]]
+            found = cur == keys[pending]
+            result[pending[found]] = True
+            done = found | (cur == EMPTY_KEY)
+            pending = pending[~done]
+            slots[pending] = (slots[pending] + 1) & mask
+        return result
+
+    def filter(self, cloud):
+        """
+        Keep the first point of every voxel that is not filled yet, and fill these voxels.
+        """
+        cloud = finite_points(cloud)
+        if cloud.shape[0] == 0:
+            return cloud
+        keys, index = np.unique(voxel_keys(cloud['xyz'], self.voxel_size),
+                                return_index=True)
+        index = index[self.insert(keys)]
+        index.sort()
+        return cloud[index]
@@ -128,24 +128,174 @@ def save_pcd(cloud, save_path):
     PointCloud(metadata, tmp).save(save_path)
 
 
-def load_pcd(file):
-    from pypcd4 import PointCloud
+pcd_type_table = {('F', 4): '<f4', ('F', 8): '<f8',
+                  ('U', 1): 'u1', ('U', 2): '<u2', ('U', 4): '<u4', ('U', 8): '<u8',
+                  ('I', 1): 'i1', ('I', 2): '<i2', ('I', 4): '<i4', ('I', 8): '<i8'}
+
+
+def read_pcd_header(file):
+    """
+    Read the header of a pcd file.
+    Returns a dict with the fields, the numpy dtype of a point, the number of
+    points, the data encoding (ascii, binary or binary_compressed) and the
+    byte offset of the payload.
+    """
+    header = {}
+    with open(file, 'rb') as f:
+        while True:
+            line = f.readline()
+            if not line:
+                raise ValueError("Invalid pcd file: %s" % file)
+            line = line.decode('utf-8', errors='ignore').strip()
+            if not line or line.startswith('#'):
+                continue
+            key, *values = line.split()
+            header[key.upper()] = values
+            if key.upper() == 'DATA':
+                break
+        offset = f.tell()
+    fields = header['FIELDS']
+    sizes = [int(v) for v in header['SIZE']]
+    types = header['TYPE']
+    counts = [int(v) for v in header.get('COUNT', [1] * len(fields))]
+    dtype = []
+    for i, (name, size, type, count) in enumerate(zip(fields, sizes, types, counts)):
+        if name == '_':  # padding
+            name = '_%d' % i
+        if count == 1:
+            dtype.append((name, pcd_type_table[(type, size)]))
+        else:
+            dtype.append((name, pcd_type_table[(type, size)], (count,)))
+    return {'fields': fields,
+            'dtype': np.dtype(dtype),
+            'points': int(header['POINTS'][0]),
+            'data': header['DATA'][0].lower(),
+            'offset': offset}
+
+
+def pcd_columns(file, header, start, end):
+    # get the columns of the points [start, end) of a binary pcd, without reading the file.
+    dtype = header['dtype']
+    return np.memmap(file, dtype=dtype, mode='r', shape=(end - start,),
+                     offset=header['offset'] + start * dtype.itemsize)
+
+
+def load_pcd_compressed(file, header):
+    # the lzf data is one block, it can not be decoded in chunks.
+    # return the columns as zero-copy views of the decoded block.
+    try:
+        import lzf
+    except ImportError:
+        raise ImportError('Loading a compressed pcd file needs lzf. '
+                          'Please install python-lzf.')
+    import struct
+    with open(file, 'rb') as f:
+        f.seek(header['offset'])
+        compressed_size, uncompressed_size = struct.unpack('<II', f.read(8))
+        buffer = lzf.decompress(f.read(compressed_size), uncompressed_size)
+    if buffer is None or len(buffer) != uncompressed_size:
+        raise ValueError("Failed to decompress pcd file: %s" % file)
+    columns = {}
+    offset = 0
+    num = header['points']
+    for name in header['dtype'].names:
+        dt = header['dtype'][name]
+        columns[name] = np.frombuffer(buffer, dtype=dt, count=num, offset=offset)
+        offset += dt.itemsize * num
+    return columns
+
+
+def fill_pcd_cloud(out, columns, max_intensity):
+    # convert pcd points to our cloud format in place, without temporary clouds.
+    if isinstance(columns, np.ndarray):
+        names = columns.dtype.names
+        fields = columns.dtype.fields
+        offset = fields['x'][1]
+        if all(fields[c][0] == np.float32 and fields[c][1] == offset + 4 * i
+               for i, c in enumerate(['x', 'y', 'z'])):
+            # copy x, y, z in one pass
+            xyz_type = np.dtype({'names': ['xyz'], 'formats': [('<f4', (3,))],
+                                 'offsets': [offset], 'itemsize': columns.dtype.itemsize})
+            out['xyz'] = columns.view(xyz_type)['xyz']
+        else:
+            out['xyz'] = np.stack([columns['x'], columns['y'], columns['z']], axis=1)
+    else:
+        names = columns.keys()
+        out['xyz'][:, 0] = columns['x']
+        out['xyz'][:, 1] = columns['y']
+        out['xyz'][:, 2] = columns['z']
+    irgb = out['irgb']
+    irgb[:] = 0
+    if 'intensity' in names:
+        intensity = columns['intensity'].astype(np.uint32)
+        if max_intensity > 255:
+            intensity = (intensity / max_intensity * 255).astype(np.uint32)
+        np.left_shift(intensity, 24, out=irgb)
+    if 'rgb' in names:
+        rgb = columns['rgb']
+        if rgb.dtype == np.float32:
+            # pcl packs rgb into the bits of a float
+            rgb = rgb.view(np.uint32)
+        irgb |= rgb.astype(np.uint32) & 0x00FFFFFF
+
+
+def iter_pcd(file, chunk_size=1000000, out=None):
+    """
+    Load a pcd file chunk by chunk.
+    Binary pcd files are memory mapped, so only the current chunk is read.
+    Yields clouds of at most chunk_size points. If out is given, the chunks
+    are views of out.
+    """
     dtype = [('xyz', '<f4', (3,)), ('irgb', '<u4')]
-    pc = PointCloud.from_path(file).pc_data
-    rgb = np.zeros([pc.shape[0]], dtype=np.uint32)
-    intensity = np.zeros([pc.shape[0]], dtype=np.uint32)
-    if 'intensity' in pc.dtype.names:
-        intensity = pc['intensity'].astype(np.uint32)
-        max_initensity = np.max(intensity)
-        # normalize the intensity to 0-255
-        if max_initensity > 255:
-            intensity = (intensity / max_initensity * 255).astype(np.uint32)
-    if 'rgb' in pc.dtype.names:
-        rgb = pc['rgb'].astype(np.uint32)
-    irgb = (intensity << 24) | rgb
-    xyz = np.stack([pc['x'], pc['y'], pc['z']], axis=1)
-    cloud = np.rec.fromarrays([xyz, irgb], dtype=dtype)
-    return cloud
+    header = read_pcd_header(file)
+    num = header['points']
+    if header['data'] == 'binary':
+        def get_columns(start, end):
+            return pcd_columns(file, header, start, end)
+    elif header['data'] == 'binary_compressed':
+        columns = load_pcd_compressed(file, header)
+
+        def get_columns(start, end):
+            return {name: columns[name][start:end] for name in columns}
+    else:
+        from pypcd4 import PointCloud
+        columns = PointCloud.from_path(file).pc_data
+
+        def get_columns(start, end):
+            return columns[start:end]
+
+    # normalize the intensity to 0-255
+    max_intensity = 0
+    if 'intensity' in header['fields'] and header['dtype']['intensity'].itemsize > 1:
+        for start in range(0, num, chunk_size):
+            end = min(start + chunk_size, num)
+            max_intensity = max(max_intensity, float(
+                np.max(get_columns(start, end)['intensity'].astype(np.uint32))))
+
+    for start in range(0, num, chunk_size):
+        end = min(start + chunk_size, num)
+        if out is None:
+            cloud = np.empty((end - start), dtype)
+        else:
+            cloud = out[start:end]
+        fill_pcd_cloud(cloud, get_columns(start, end), max_intensity)
+        yield cloud
+
+
+def load_pcd(file, out=None):
+    """
+    Load a pcd file into a cloud array.
+    If out is given, the points are written into it (it must be large enough),
+    and a view of out is returned.
+    """
+    dtype = [('xyz', '<f4', (3,)), ('irgb', '<u4')]
+    num = read_pcd_header(file)['points']
+    if out is None:
+        out = np.empty((num), dtype)
+    # small chunks stay in the cpu cache, and only one chunk is mapped at a time.
+    for _ in iter_pcd(file, chunk_size=262144, out=out):
+        pass
+    return out[:num]
 
 
 def save_e57(cloud, save_path):
@@ -191,32 +341,84 @@ def load_e57(file_path):
     return cloud
 
 
-def load_las(file):
+def las_to_cloud(points, dimensions, scale_intensity, scale_rgb, out):
+    # convert las points to our cloud format in place.
+    # the values are clipped to 8 bits, as the scaling is decided by the
+    # first chunk, a later chunk may have larger values.
+    out['xyz'][:, 0] = points.x
+    out['xyz'][:, 1] = points.y
+    out['xyz'][:, 2] = points.z
+    irgb = out['irgb']
+    irgb[:] = 0
+    if 'intensity' in dimensions:
+        intensity = points.intensity.astype(np.uint32)
+        if scale_intensity:
+            intensity = intensity // 255
+        irgb |= np.clip(intensity, 0, 255) << 24
+    if 'red' in dimensions and 'green' in dimensions and 'blue' in dimensions:
+        for shift, color in [(16, points.red), (8, points.green), (0, points.blue)]:
+            color = color.astype(np.uint32)
+            if scale_rgb:
+                color = color // 255
+            irgb |= np.clip(color, 0, 255) << shift
+
+
+def iter_las(file, chunk_size=1000000, out=None):
+    """
+    Load a las/laz file chunk by chunk with laspy's chunk_iterator,
+    so the memory usage is bounded by the chunk size.
+    Yields clouds of at most chunk_size points. If out is given, the chunks
+    are views of out.
+    The intensity and the colors are scaled from 16 to 8 bits if the first
+    chunk has a value larger than 255 (the whole file is not read to know
+    it). If it has not, the values of the later chunks are clipped to 255.
+    """
     import laspy
+    dtype = [('xyz', '<f4', (3,)), ('irgb', '<u4')]
     with laspy.open(file) as f:
-        las = f.read()
-        xyz = np.vstack((las.x, las.y, las.z)).transpose()
-        dimensions = list(las.point_format.dimension_names)
-        rgb = np.zeros([las.x.shape[0]], dtype=np.uint32)
-        intensity = np.zeros([las.x.shape[0]], dtype=np.uint32)
-        if 'intensity' in dimensions:
-            intensity = las.intensity.astype(np.uint32)
-        if 'red' in dimensions and 'green' in dimensions and 'blue' in dimensions:
-            red = las.red.astype(np.uint32)
-            green = las.green.astype(np.uint32)
-            blue = las.blue.astype(np.uint32)
-            if np.max([red, green, blue]) > 255:
-                red = (red / 255).astype(np.uint32)
-                green = (green / 255).astype(np.uint32)
-                blue = (blue / 255).astype(np.uint32)
-            rgb = (red << 16) | (green << 8) | blue
-        if np.max(intensity) > 255:
-            intensity = (intensity / 255).astype(np.uint32)
-            intensity = np.clip(intensity, 0, 255)
-        color = (intensity << 24) | rgb
-        dtype = [('xyz', '<f4', (3,)), ('irgb', '<u4')]
-        cloud = np.rec.fromarrays([xyz, color], dtype=dtype)
-    return cloud
+        dimensions = list(f.header.point_format.dimension_names)
+        has_rgb = 'red' in dimensions and 'green' in dimensions and 'blue' in dimensions
+        scale_intensity = None
+        scale_rgb = None
+        start = 0
+        for points in f.chunk_iterator(chunk_size):
+            num = len(points)
+            if num == 0:
+                continue
+            if scale_intensity is None:
+                scale_intensity = 'intensity' in dimensions and \
+                    np.max(points.intensity) > 255
+                scale_rgb = has_rgb and max(np.max(points.red), np.max(
+                    points.green), np.max(points.blue)) > 255
+            if out is None:
+                cloud = np.empty((num), dtype)
+            else:
+                cloud = out[start:start + num]
+            las_to_cloud(points, dimensions, scale_intensity, scale_rgb, cloud)
+            start += num
+            yield cloud
+
+
+def las_point_count(file):
+    import laspy
+    with laspy.open(file) as f:
+        return f.header.point_count
+
+
+def load_las(file, out=None):
+    """
+    Load a las/laz file into a cloud array.
+    If out is given, the points are written into it (it must be large enough),
+    and a view of out is returned.
+    """
+    dtype = [('xyz', '<f4', (3,)), ('irgb', '<u4')]
+    num = las_point_count(file)
+    if out is None:
+        out = np.empty((num), dtype)
+    num = 0
+    for cloud in iter_las(file, out=out):
+        num += cloud.shape[0]
+    return out[:num]
 
 def save_las(cloud, save_path):
     import laspy
@@ -232,6 +434,317 @@ def save_las(cloud, save_path):
     las.write(save_path)
 
 
+Q3D_MAGIC = b'Q3DCLOUD'
+Q3D_VERSION = 1
+Q3D_HEADER_SIZE = 256  # the points start at this offset
+q3d_header_type = np.dtype([('magic', 'S8'),
+                            ('version', '<u4'),
+                            ('chunk_size', '<u4'),
+                            ('points', '<u8'),
+                            ('valid', '<u8'),  # number of finite points
+                            ('bmin', '<f4', (3,)),
+                            ('bmax', '<f4', (3,)),
+                            ('center', '<f8', (3,)),  # mean of the finite points
+                            ('num_chunks', '<u8'),
+                            ('num_lod_nodes', '<u8')])
+
+
+class Q3DWriter:
+    """
+    Write a q3d cloud file, the native format of q3dviewer:
+        header (256 bytes), points ([('xyz','<f4',(3,)),('irgb','<u4')]),
+        chunk bounds (num_chunks, 2, 3) float32, lod nodes (lod_node_type).
+    The points are written as they come, the bounds and the chunk index are
+    computed in close(). The file is written to a temporary file and renamed
+    in close(), so a q3d file is always complete.
+    """
+    def __init__(self, file, chunk_size=65536):
+        import os
+        import threading
+        self.file = file
+        self.chunk_size = chunk_size
+        self.points = 0
+        self.tmp_file = "%s.%d.%d.tmp" % (file, os.getpid(), threading.get_ident())
+        self.f = open(self.tmp_file, 'wb')
+        self.f.write(bytes(Q3D_HEADER_SIZE))
+
+    def write(self, cloud):
+        dtype = [('xyz', '<f4', (3,)), ('irgb', '<u4')]
+        np.ascontiguousarray(cloud, dtype=dtype).tofile(self.f)
+        self.points += cloud.shape[0]
+
+    def close(self, lod_nodes=None):
+        import os
+        from q3dviewer.utils.octree import lod_node_type
+        self.f.flush()
+        num_chunks = -(-self.points // self.chunk_size)
+        chunk_bounds = np.zeros((num_chunks, 2, 3), np.float32)
+        xyz_sum = np.zeros(3)
+        bmin = np.full(3, np.inf)
+        bmax = np.full(3, -np.inf)
+        valid = 0
+        block = self.chunk_size * 16
+        for start in range(0, self.points, block):
+            end = min(start + block, self.points)
+            xyz = np.memmap(self.tmp_file, dtype=[('xyz', '<f4', (3,)), ('irgb', '<u4')],
+                            mode='r', offset=Q3D_HEADER_SIZE + start * 16,
+                            shape=(end - start,))['xyz']
+            starts = np.arange(0, end - start, self.chunk_size)
+            first_chunk = start // self.chunk_size
+            chunk_bounds[first_chunk:first_chunk + starts.shape[0], 0] = \
+                np.fmin.reduceat(xyz, starts, axis=0)
+            chunk_bounds[first_chunk:first_chunk + starts.shape[0], 1] = \
+                np.fmax.reduceat(xyz, starts, axis=0)
+            block_sum = xyz.sum(axis=0, dtype=np.float64)
+            if np.isfinite(block_sum).all():
+                # all the points are finite, so are the chunk bounds
+                bounds = chunk_bounds[first_chunk:first_chunk + starts.shape[0]]
+                xyz_sum += block_sum
+                valid += xyz.shape[0]
+                bmin = np.minimum(bmin, bounds[:, 0].min(axis=0))
+                bmax = np.maximum(bmax, bounds[:, 1].max(axis=0))
+            else:
+                # the bounds of the cloud skip the nan/inf points
+                finite = xyz[np.isfinite(xyz).all(axis=1)]
+                xyz_sum += finite.sum(axis=0, dtype=np.float64)
+                valid += finite.shape[0]
+                if finite.shape[0] > 0:
+                    bmin = np.minimum(bmin, finite.min(axis=0))
+                    bmax = np.maximum(bmax, finite.max(axis=0))
+        if valid == 0:
+            bmin = np.zeros(3)
+            bmax = np.zeros(3)
+        if lod_nodes is None:
+            lod_nodes = np.empty((0), lod_node_type)
+        chunk_bounds.tofile(self.f)
+        np.ascontiguousarray(lod_nodes, dtype=lod_node_type).tofile(self.f)
+
+        header = np.zeros((1), q3d_header_type)
+        header['magic'] = Q3D_MAGIC
+        header['version'] = Q3D_VERSION
+        header['chunk_size'] = self.chunk_size
+        header['points'] = self.points
+        header['valid'] = valid
+        header['bmin'] = bmin
+        header['bmax'] = bmax
+        header['center'] = xyz_sum / max(valid, 1)
+        header['num_chunks'] = num_chunks
+        header['num_lod_nodes'] = lod_nodes.shape[0]
+        self.f.seek(0)
+        self.f.write(header.tobytes())
+        self.f.close()
+        os.replace(self.tmp_file, self.file)
+
+    def abort(self):
+        import os
+        self.f.close()
+        os.remove(self.tmp_file)
+
+
+def save_q3d(cloud, save_path, lod=False, chunk_size=65536):
+    """
+    Save a cloud as a q3d file.
+    If lod is True, the points are saved in the order of a LOD octree
+    with its nodes, so CloudItem does not need to build it.
+    """
+    lod_nodes = None
+    if lod and cloud.shape[0] > 0:
+        from q3dviewer.utils.octree import build_lod
+        index, lod_nodes = build_lod(cloud['xyz'])
+        cloud = cloud[index]
+    writer = Q3DWriter(save_path, chunk_size)
+    try:
+        writer.write(cloud)
+        writer.close(lod_nodes)
+    except BaseException:
+        writer.abort()
+        raise
+
+
+def read_q3d_info(file):
+    """
+    Read the header of a q3d file, with the chunk bounds and the lod nodes.
+    """
+    from q3dviewer.utils.octree import lod_node_type
+    with open(file, 'rb') as f:
+        header = np.frombuffer(f.read(q3d_header_type.itemsize), q3d_header_type)
+    if header.shape[0] != 1 or header['magic'][0] != Q3D_MAGIC:
+        raise ValueError("%s is not a q3d file." % file)
+    if header['version'][0] != Q3D_VERSION:
+        raise ValueError("Unsupported q3d version %d: %s" % (header['version'][0], file))
+    info = {name: header[name][0] for name in q3d_header_type.names}
+    offset = Q3D_HEADER_SIZE + int(info['points']) * 16
+    info['chunk_bounds'] = np.fromfile(file, dtype=np.float32, count=int(info['num_chunks']) * 6,
+                                       offset=offset).reshape(-1, 2, 3)
+    offset += int(info['num_chunks']) * 24
+    info['lod_nodes'] = np.fromfile(file, dtype=lod_node_type,
+                                    count=int(info['num_lod_nodes']), offset=offset)
+    return info
+
+
+def load_q3d(file):
+    """
+    Memory map the points of a q3d file, no parse or conversion is needed.
+    """
+    dtype = [('xyz', '<f4', (3,)), ('irgb', '<u4')]
+    num = int(read_q3d_info(file)['points'])
+    if num == 0:
+        return np.empty((0), dtype)
+    return np.memmap(file, dtype=dtype, mode='r', offset=Q3D_HEADER_SIZE, shape=(num,))
+
+
+def cache_key(file, block_size=1 << 20):
+    """
+    A content hash of a file, used as the name of its q3d cache.
+    Only the size and 4 blocks (head, 2 middle blocks, tail) are hashed,
+    so large files are keyed quickly. The modification time and the inode
+    are hashed too, so a file rewritten in place gets a new cache.
+    """
+    import os
+    import struct
+    import hashlib
+    stat = os.stat(file)
+    size = stat.st_size
+    h = hashlib.blake2b(digest_size=16)
+    h.update(struct.pack('<QIqQ', size, Q3D_VERSION,
+                         stat.st_mtime_ns, stat.st_ino))
+    with open(file, 'rb') as f:
+        if size <= 4 * block_size:
+            h.update(f.read())
+        else:
+            for pos in [0, size // 3, 2 * size // 3, size - block_size]:
+                f.seek(pos)
+                h.update(f.read(block_size))
+    return h.hexdigest()
+
+
+def q3d_cache_path(file, cache_dir):
+    import os
+    return os.path.join(os.path.expanduser(cache_dir), cache_key(file) + '.q3d')
+
+
+def cache_cloud(file, cache_dir, lod=False):
+    """
+    Return the q3d cache of a cloud file. The file is parsed and cached
+    if the cache does not exist (or it has no LOD nodes while lod is True).
+    Returns None if the file type is not supported.
+    """
+    import os
+    cache = q3d_cache_path(file, cache_dir)
+    if os.path.exists(cache):
+        try:
+            if not lod or read_q3d_info(cache)['num_lod_nodes'] > 0:
+                return cache
+        except ValueError:
+            pass  # a broken or old cache, write it again.
+    cloud = load_cloud(file)
+    if cloud is None:
+        return None
+    os.makedirs(os.path.dirname(cache), exist_ok=True)
+    save_q3d(cloud, cache, lod=lod)
+    return cache
+
+
+def load_cloud(file, cache_dir=None):
+    """
+    Load a cloud file (pcd, ply, e57, las, laz or q3d) by its extension.
+    If cache_dir is given, the file is parsed only once and reopened from
+    its q3d cache in cache_dir.
+    Returns None if the file type is not supported.
+    """
+    lower = file.lower()
+    if lower.endswith(".q3d"):
+        return load_q3d(file)
+    if cache_dir is not None:
+        try:
+            cache = cache_cloud(file, cache_dir)
+            if cache is not None:
+                return load_q3d(cache)
+        except OSError as e:
+            print("[Cloud IO] Failed to cache %s: %s" % (file, e))
+    if lower.endswith(".pcd"):
+        return load_pcd(file)
+    elif lower.endswith(".ply"):
+        return load_ply(file)
+    elif lower.endswith(".e57"):
+        return load_e57(file)
+    elif lower.endswith((".las", ".laz")):
+        return load_las(file)
+    return None
+
+
+def load_cloud_task(file, cache_dir=None):
+    # load a cloud and sum its valid points in the worker,
+    # so the receiver does not need a full pass over the cloud.
+    cloud = load_cloud(file, cache_dir)
+    if cloud is None:
+        return None, np.zeros(3), 0
+    if isinstance(cloud, np.memmap):
+        # a q3d file, the center is in the header
+        info = read_q3d_info(cloud.filename)
+        return cloud, info['center'] * info['valid'], int(info['valid'])
+    xyz = cloud['xyz']
+    valid = np.isfinite(xyz).all(axis=1)
+    return cloud, xyz[valid].sum(axis=0, dtype=np.float64), int(np.count_nonzero(valid))
+
+
+def iter_clouds(files, max_workers=None, ordered=True, max_pending=None,
+                use_process=False, cache_dir=None):
+    """
+    Load many cloud files concurrently.
+    At most max_pending clouds (default 2 * max_workers) are loading or
+    waiting to be received, so the memory is bounded when the receiver is slower
+    than the workers.
+    Args:
+        files: the list of cloud files.
+        max_workers: the number of workers, default os.cpu_count().
+        ordered: if True, the clouds are yielded in the order of files,
+            otherwise as soon as they are loaded.
+        use_process: use a process pool instead of a thread pool. the decoding
+            does not hold the GIL, but the clouds are copied between processes.
+        cache_dir: the q3d cache directory, see load_cloud.
+    Yields:
+        (index, cloud, xyz_sum, num): index of the file, the cloud (None if the
+        file can not be loaded), the sum and the number of the valid points.
+    """
+    import os
+    from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, \
+        wait, FIRST_COMPLETED
+    max_workers = max_workers or os.cpu_count() or 1
+    max_pending = max(max_pending or 2 * max_workers, 1)
+    executor = ProcessPoolExecutor if use_process else ThreadPoolExecutor
+    with executor(max_workers=max_workers) as pool:
+        pending = {}  # future -> index
+        done = {}  # index -> future
+        num_submitted = 0
+        num_yielded = 0
+        next_index = 0
+        while num_yielded < len(files):
+            while num_submitted < len(files) and len(pending) + len(done) < max_pending:
+                future = pool.submit(load_cloud_task, files[num_submitted], cache_dir)
+                pending[future] = num_submitted
+                num_submitted += 1
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                done[pending.pop(future)] = future
+            if ordered:
+                indices = []
+                while next_index in done:
+                    indices.append(next_index)
+                    next_index += 1
+            else:
+                indices = list(done.keys())
+            for index in indices:
+                future = done.pop(index)
+                try:
+                    cloud, xyz_sum, num = future.result()
+                except Exception as e:
+                    print("[Cloud IO] Failed to load %s: %s" % (files[index], e))
+                    cloud, xyz_sum, num = None, np.zeros(3), 0
+                num_yielded += 1
+                yield index, cloud, xyz_sum, num
+
+
 def gsdata_type(sh_dim):
     return [('pw', '<f4', (3,)),
             ('rot', '<f4', (4,)),
@@ -286,7 +799,117 @@ def matrix_to_quaternion_wxyz(matrices):
     return np.array([w, x, y, z]).T
 
 
-def load_gs_ply(path, T=None):
+ply_type_table = {'char': 'i1', 'int8': 'i1', 'uchar': 'u1', 'uint8': 'u1',
+                  'short': '<i2', 'int16': '<i2', 'ushort': '<u2', 'uint16': '<u2',
+                  'int': '<i4', 'int32': '<i4', 'uint': '<u4', 'uint32': '<u4',
+                  'float': '<f4', 'float32': '<f4', 'double': '<f8', 'float64': '<f8'}
+
+
+def read_ply_header(file):
+    """
+    Read the header of a ply file.
+    Returns a dict with the format (ascii, binary_little_endian or
+    binary_big_endian), the elements as (name, count, numpy dtype) in file
+    order and the byte offset of the payload. The dtype of an element with
+    list properties is None, as its records have no fixed size.
+    """
+    elements = []
+    fmt = None
+    with open(file, 'rb') as f:
+        if f.readline().strip() != b'ply':
+            raise ValueError("Invalid ply file: %s" % file)
+        while True:
+            line = f.readline()
+            if not line:
+                raise ValueError("Invalid ply file: %s" % file)
+            words = line.decode('utf-8', errors='ignore').split()
+            if not words or words[0] in ('comment', 'obj_info'):
+                continue
+            if words[0] == 'end_header':
+                break
+            if words[0] == 'format':
+                fmt = words[1]
+            elif words[0] == 'element':
+                elements.append([words[1], int(words[2]), []])
+            elif words[0] == 'property':
+                props = elements[-1][2]
+                if words[1] == 'list' or props is None:
+                    elements[-1][2] = None
+                else:
+                    props.append((words[2], ply_type_table[words[1]]))
+        offset = f.tell()
+    elements = [(name, count, None if props is None else np.dtype(props))
+                for name, count, props in elements]
+    return {'format': fmt, 'elements': elements, 'offset': offset}
+
+
+def gs_ply_columns(names):
+    # the ply property of every float of gsdata_type, in memory order
+    rest = sorted([n for n in names if n.startswith('f_rest_')],
+                  key=lambda n: int(n[7:]))
+    rest_dim = len(rest) // 3
+    columns = ['x', 'y', 'z',
+               'rot_0', 'rot_1', 'rot_2', 'rot_3',
+               'scale_0', 'scale_1', 'scale_2',
+               'opacity',
+               'f_dc_0', 'f_dc_1', 'f_dc_2']
+    # f_rest is stored channel major (all r, all g, all b),
+    # the shader reads the coefficients interleaved (rgb, rgb, ...).
+    for i in range(rest_dim):
+        for c in range(3):
+            columns.append('f_rest_%d' % (c * rest_dim + i))
+    return columns
+
+
+def load_gs_ply(path, T=None, chunk_size=65536):
+    """
+    Load a 3DGS ply as gsdata_type.
+    The vertex block of a binary little endian ply is memory mapped and
+    converted chunk by chunk into the output array, so the only full size
+    allocation is the result. Other ply files are read by meshio.
+    """
+    header = read_ply_header(path)
+    if header['format'] != 'binary_little_endian' or not header['elements'] or \
+            header['elements'][0][0] != 'vertex' or header['elements'][0][2] is None:
+        return load_gs_ply_meshio(path)
+    _, num, dtype = header['elements'][0]
+    columns = gs_ply_columns(dtype.names)
+    sh_dim = len(columns) - 11
+    gs = np.empty(num, dtype=gsdata_type(sh_dim))
+    if num == 0:
+        return gs
+    vertices = np.memmap(path, dtype=dtype, mode='r', shape=(num,),
+                         offset=header['offset'])
+    gs_floats = gs.view(np.float32).reshape(num, -1)
+    all_float = all(dtype[n] == np.float32 for n in dtype.names)
+    if all_float:
+        # gather all columns of a chunk with one fancy index
+        index = np.array([dtype.names.index(n) for n in columns])
+        vertex_floats = vertices.view(np.float32).reshape(num, -1)
+    for start in range(0, num, chunk_size):
+        end = min(start + chunk_size, num)
+        if all_float:
+            gs_floats[start:end] = vertex_floats[start:end][:, index]
+        else:
+            chunk = vertices[start:end]
+            for i, n in enumerate(columns):
+                gs_floats[start:end, i] = chunk[n]
+        chunk = gs[start:end]
+        alpha = chunk['alpha']  # sigmoid
+        np.negative(alpha, out=alpha)
+        with np.errstate(over='ignore'):
+            np.exp(alpha, out=alpha)
+        alpha += 1
+        np.reciprocal(alpha, out=alpha)
+        scale = chunk['scale']
+        np.exp(scale, out=scale)
+        rot = chunk['rot']
+        rot /= np.linalg.norm(rot, axis=1, keepdims=True)
+    del vertices
+    return gs
+
+
+def load_gs_ply_meshio(path):
     import meshio
     mesh = meshio.read(path)
     vertices = mesh.points
@@ -351,18 +974,113 @@ def rotate_gaussian(T, gs):
     return gs
 
 
+def gs_compact_type(sh_dim):
+    """
+    The compact gaussian, decoded by gau_prep.glsl (see compress_gs).
+    The size is a multiple of 4 bytes, so it can be read as uint32 words.
+    """
+    rest = max(sh_dim - 3, 0)
+    return [('pw', '<u2', (3,)),  # unorm16 in the bounding box
+            ('scale', '<f2', (3,)),
+            ('rot', 'i1', (4,)),  # snorm8
+            ('alpha', 'u1'),  # unorm8
+            ('dc', 'u1', (3,)),  # the first 3 sh, unorm8 in the codebook range
+            ('rest', 'u1', ((rest + 3) // 4 * 4,))]  # the other sh, same as dc
+
+
+def quantize(x, vmin, vrange, vmax_q):
+    q = np.rint((x - vmin) / vrange * vmax_q)
+    return np.clip(q, 0, vmax_q)
+
+
+def compress_gs(gs):
+    """
+    Compress gaussians (gsdata_type) to a compact array (gs_compact_type)
+    and a codebook, which holds the ranges of the quantized attributes:
+    pos min (3), pos range (3), dc min (3), dc range (3),
+    rest min (sh_dim - 3), rest range (sh_dim - 3).
+    The positions are 16 bits in the bounding box, the scales are float16,
+    the rotation, alpha and sh are 8 bits. sh_dim = 48 uses 68 instead of 236 bytes.
+    """
+    sh = gs['sh'].reshape(gs.shape[0], -1)
+    sh_dim = sh.shape[1]
+    rest = sh_dim - 3
+    cgs = np.zeros(gs.shape[0], dtype=gs_compact_type(sh_dim))
+
+    pos_min = np.nanmin(gs['pw'], axis=0)
+    pos_range = np.maximum(np.nanmax(gs['pw'], axis=0) - pos_min, 1e-6)
+    cgs['pw'] = quantize(gs['pw'], pos_min, pos_range, 65535)
+    cgs['scale'] = np.minimum(gs['scale'], 65504)
+    rot = gs['rot'] / np.linalg.norm(gs['rot'], axis=1)[:, np.newaxis]
+    cgs['rot'] = np.rint(np.clip(rot, -1, 1) * 127)
+    cgs['alpha'] = quantize(gs['alpha'], 0, 1, 255)
+
+    dc_min = sh[:, :3].min(axis=0)
+    dc_range = np.maximum(sh[:, :3].max(axis=0) - dc_min, 1e-6)
+    cgs['dc'] = quantize(sh[:, :3], dc_min, dc_range, 255)
+    # a few large sh would waste the 8 bits, clip them
+    if rest > 0:
+        sample = sh[::max(sh.shape[0] // 200000, 1), 3:]
+        rest_min, rest_max = np.percentile(sample, [0.05, 99.95], axis=0)
+        rest_range = np.maximum(rest_max - rest_min, 1e-6)
+        cgs['rest'][:, :rest] = quantize(sh[:, 3:], rest_min, rest_range, 255)
+    else:
+        rest_min = rest_range = np.zeros(0)
+    codebook = np.concatenate([pos_min, pos_range, dc_min, dc_range,
+                               rest_min, rest_range]).astype(np.float32)
+    return cgs, codebook
+
+
+def decompress_gs(cgs, codebook):
+    """
+    The gaussians (gsdata_type) of a compact array made by compress_gs.
+    """
+    rest = (codebook.shape[0] - 12) // 2
+    gs = np.zeros(cgs.shape[0], dtype=gsdata_type(rest + 3))
+    gs['pw'] = codebook[0:3] + cgs['pw'] / np.float32(65535) * codebook[3:6]
+    gs['scale'] = cgs['scale']
+    rot = cgs['rot'] / np.float32(127)
+    gs['rot'] = rot / np.linalg.norm(rot, axis=1)[:, np.newaxis]
+    gs['alpha'] = cgs['alpha'] / np.float32(255)
+    gs['sh'][:, :3] = codebook[6:9] + cgs['dc'] / np.float32(255) * codebook[9:12]
+    if rest > 0:
+        rest_min = codebook[12:12 + rest]
+        rest_range = codebook[12 + rest:]
+        gs['sh'][:, 3:] = rest_min + cgs['rest'][:, :rest] / np.float32(255) * rest_range
+    return gs
+
+
+def load_gs_compact(fn):
+    """
+    Load a compact gaussian file (.npz) saved by save_gs,
+    return the compact array and the codebook (see compress_gs).
+    """
+    with np.load(fn) as f:
+        return f['gs'], f['codebook']
+
+
 def load_gs(fn):
     if fn.endswith('.ply'):
         return load_gs_ply(fn)
     elif fn.endswith('.npy'):
         return np.load(fn)
+    elif fn.endswith('.npz'):
+        return decompress_gs(*load_gs_compact(fn))
     else:
         print("%s is not a supported file." % fn)
         exit(0)
 
 
 def save_gs(fn, gs):
-    np.save(fn, gs)
+    """
+    Save gaussians (gsdata_type) to a .npy file,
+    or compressed by compress_gs to a .npz file.
+    """
+    if fn.endswith('.npz'):
+        cgs, codebook = compress_gs(gs)
+        np.savez(fn, gs=cgs, codebook=codebook)
+    else:
+        np.save(fn, gs)
 
 
 def get_example_gs():
@@ -44,28 +44,89 @@ def get_dtype(msg):
     return structured_dtype
 
 
-def convert_pointcloud2_msg(msg):
-    # Build dtype with proper offsets for PointCloud2 message
-    structured_dtype = get_dtype(msg)
-    pc = np.frombuffer(msg.data, dtype=structured_dtype)
-    # pc = PointCloud.from_msg(msg).pc_data
-    data_type = [('xyz', '<f4', (3,)), ('irgb', '<u4')]
-    rgb = np.zeros([pc.shape[0]], dtype=np.uint32)
-    intensity = np.zeros([pc.shape[0]], dtype=np.uint32)
+cloud_dtype = np.dtype([('xyz', '<f4', (3,)), ('irgb', '<u4')])
+# xyz of a cloud array as 12 raw bytes, copying them is faster than 3 floats.
+cloud_xyz_bytes = np.dtype({'names': ['xyz'], 'formats': ['V12'],
+                            'offsets': [0], 'itemsize': cloud_dtype.itemsize})
+
+# (fields, point_step) -> (dtype, fields, xyz dtype, zero copy)
+pointcloud2_layouts = {}
+
+
+def get_pointcloud2_layout(msg):
+    """
+    Get the structured dtype and the conversion layout of a PointCloud2 message.
+    The layout is cached per (fields, point_step), as a topic seldom changes it.
+    """
+    key = (tuple((f.name, f.datatype, f.offset) for f in msg.fields),
+           msg.point_step)
+    layout = pointcloud2_layouts.get(key)
+    if layout is not None:
+        return layout
+    dtype = np.dtype(get_dtype(msg))
+    names = dtype.names
     fields = ['xyz']
-    if 'intensity' in pc.dtype.names:
-        intensity = pc['intensity']
-        intensity = np.clip(intensity, 0, 255)
-        intensity = intensity.astype(np.uint32)
+    if 'intensity' in names:
         fields.append('intensity')
-    if 'rgb' in pc.dtype.names:
-        rgb = pc['rgb'].view(np.uint32)
+    if 'rgb' in names:
         fields.append('rgb')
-    irgb = (intensity << 24) | rgb
-    xyz = np.stack([pc['x'], pc['y'], pc['z']], axis=1)
-    cloud = np.rec.fromarrays([xyz, irgb], dtype=data_type)
+    xyz_dtype = None
+    offsets = [dtype.fields[c][1] if c in names else None for c in 'xyz']
+    if all(c in names and dtype[c] == np.float32 for c in 'xyz') and \
+            offsets[1] == offsets[0] + 4 and offsets[2] == offsets[0] + 8:
+        # x, y, z are packed, copy them as one 12 bytes field
+        xyz_dtype = np.dtype({'names': ['xyz'], 'formats': ['V12'],
+                              'offsets': [offsets[0]], 'itemsize': dtype.itemsize})
+    # the message is already a cloud array: x, y, z, rgb and nothing else
+    zero_copy = fields == ['xyz', 'rgb'] and offsets[0] == 0 and \
+        xyz_dtype is not None and dtype.fields['rgb'][1] == 12 and \
+        dtype['rgb'].itemsize == 4 and dtype.itemsize == cloud_dtype.itemsize
+    layout = (dtype, fields, xyz_dtype, zero_copy)
+    pointcloud2_layouts[key] = layout
+    return layout
+
+
+def convert_pointcloud2_msg(msg, out=None):
+    """
+    Convert a PointCloud2 message to a cloud array ([('xyz','<f4',(3,)),('irgb','<u4')]).
+    Args:
+        msg: a sensor_msgs/PointCloud2 message.
+        out: an optional cloud array to write the points into, e.g. a buffer reused
+            for every message. It must hold at least all the points of msg,
+            the returned cloud is then a view of its head.
+    Returns:
+        cloud, fields (the fields found in msg), stamp.
+        If msg only has x, y, z and rgb packed in 16 bytes, the returned cloud is
+        a read-only view of msg.data and out is not used.
+    """
+    dtype, fields, xyz_dtype, zero_copy = get_pointcloud2_layout(msg)
     stamp = msg.header.stamp.to_sec()
-    return cloud, fields, stamp
+    if zero_copy:
+        return np.frombuffer(msg.data, dtype=cloud_dtype), list(fields), stamp
+
+    pc = np.frombuffer(msg.data, dtype=dtype)
+    num = pc.shape[0]
+    if out is None:
+        out = np.empty(num, dtype=cloud_dtype)
+    elif out.dtype != cloud_dtype or out.shape[0] < num:
+        raise ValueError("out must be a cloud array of at least %d points." % num)
+    cloud = out[:num]
+
+    if xyz_dtype is not None:
+        cloud.view(cloud_xyz_bytes)['xyz'] = pc.view(xyz_dtype)['xyz']
+    else:
+        xyz = cloud['xyz']
+        for i, c in enumerate('xyz'):
+            xyz[:, i] = pc[c]
+    irgb = cloud['irgb']
+    if 'intensity' in fields:
+        np.clip(pc['intensity'], 0, 255, out=irgb, casting='unsafe')
+        np.left_shift(irgb, 24, out=irgb)
+    else:
+        irgb[:] = 0
+    if 'rgb' in fields:
+        np.bitwise_or(irgb, pc['rgb'].view(np.uint32), out=irgb)
+    return cloud, list(fields), stamp
 
 
 def convert_odometry_msg(msg):
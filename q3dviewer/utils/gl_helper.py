@@ -4,11 +4,47 @@ Distributed under MIT license. See LICENSE for more information.
 """
 
 from OpenGL.GL import *
+from OpenGL.GL import shaders
 import numpy as np
 
 
+def get_uniform_locations(program):
+    """
+    The locations of the active uniforms of a linked program, by name.
+    The uniforms of the uniform blocks have no location, they are skipped.
+    """
+    locations = {}
+    for i in range(glGetProgramiv(program, GL_ACTIVE_UNIFORMS)):
+        name = glGetActiveUniform(program, i)[0]
+        name = name.decode() if isinstance(name, bytes) else name
+        location = glGetUniformLocation(program, name)
+        if location == -1:
+            continue
+        locations[name] = location
+        if name.endswith('[0]'):
+            locations[name[:-3]] = location
+    return locations
+
+
+def compile_program(*shader_list):
+    """
+    Link a program (shaders.compileProgram), cache the locations of its
+    uniforms for set_uniform, and bind its camera block (see CameraBlock).
+    """
+    program = shaders.compileProgram(*shader_list)
+    block = glGetUniformBlockIndex(program, 'Camera')
+    if block != GL_INVALID_INDEX:
+        glUniformBlockBinding(program, block, CameraBlock.BINDING)
+    program.uniform_locations = get_uniform_locations(program)
+    return program
+
+
 def set_uniform(shader, content, name):
-    location = glGetUniformLocation(shader, name)
+    locations = getattr(shader, 'uniform_locations', None)
+    if locations is not None:
+        location = locations.get(name, -1)
+    else:
+        location = glGetUniformLocation(shader, name)
     if location == -1:
         raise ValueError(
             f"Uniform '{name}' not found in shader program {shader}.")
@@ -28,8 +64,9 @@ def set_uniform(shader, content, name):
                     f"Unsupported 1D array size: {content.shape}.")
         elif content.ndim == 2:
             if content.shape == (4, 4):
-                glUniformMatrix4fv(location, 1, GL_FALSE,
-                                   content.T.astype(np.float32))
+                # transposed by GL, the row major matrix is not copied
+                glUniformMatrix4fv(location, 1, GL_TRUE,
+                                   np.asarray(content, dtype=np.float32))
             else:
                 raise ValueError(
                     f"Unsupported 2D array size: {content.shape}.")
@@ -38,3 +75,190 @@ def set_uniform(shader, content, name):
     else:
         raise TypeError(
             f"Unsupported type for uniform '{name}': {type(content)}.")
+
+
+class CameraBlock:
+    """
+    The uniform buffer of the camera, shared by the programs of a context.
+    It is uploaded once per frame, so the items don't set the matrices of
+    their programs. A shader uses it by declaring:
+
+        layout(std140) uniform Camera {
+            mat4 view_matrix;
+            mat4 projection_matrix;
+            vec2 focal;     // in pixels
+            vec2 win_size;  // in pixels
+        };
+
+    and the program is linked by compile_program.
+    """
+    BINDING = 0
+
+    def __init__(self):
+        self.ubo = None
+        self.data = np.zeros(36, dtype=np.float32)
+
+    def update(self, view_matrix, projection_matrix, width, height):
+        data = np.empty_like(self.data)
+        # std140 matrices are column major
+        data[0:16] = np.asarray(view_matrix).T.ravel()
+        data[16:32] = np.asarray(projection_matrix).T.ravel()
+        data[32:34] = [projection_matrix[0, 0] * width / 2,
+                       projection_matrix[1, 1] * height / 2]
+        data[34:36] = [width, height]
+        if self.ubo is None:
+            self.ubo = glGenBuffers(1)
+            glBindBuffer(GL_UNIFORM_BUFFER, self.ubo)
+            glBufferData(GL_UNIFORM_BUFFER, data.nbytes, data, GL_DYNAMIC_DRAW)
+            glBindBuffer(GL_UNIFORM_BUFFER, 0)
+        elif np.any(data != self.data):
+            glBindBuffer(GL_UNIFORM_BUFFER, self.ubo)
+            glBufferSubData(GL_UNIFORM_BUFFER, 0, data.nbytes, data)
+            glBindBuffer(GL_UNIFORM_BUFFER, 0)
+        self.data = data
+        glBindBufferBase(GL_UNIFORM_BUFFER, self.BINDING, self.ubo)
+
+
+def resize_buffer(buffer, new_nbytes, copy_nbytes=0, usage=GL_DYNAMIC_DRAW):
+    """
+    Replace a buffer object by a larger one.
+
+    The first `copy_nbytes` of the old buffer are copied to the new buffer
+    on the GPU (glCopyBufferSubData), so the existing content does not need
+    to be uploaded from host memory again. The old buffer is deleted.
+
+    Returns:
+        The id of the new buffer.
+    """
+    new_buffer = glGenBuffers(1)
+    glBindBuffer(GL_COPY_WRITE_BUFFER, new_buffer)
+    glBufferData(GL_COPY_WRITE_BUFFER, new_nbytes, None, usage)
+    if copy_nbytes > 0 and buffer is not None:
+        glBindBuffer(GL_COPY_READ_BUFFER, buffer)
+        glCopyBufferSubData(GL_COPY_READ_BUFFER, GL_COPY_WRITE_BUFFER,
+                            0, 0, copy_nbytes)
+        glBindBuffer(GL_COPY_READ_BUFFER, 0)
+    glBindBuffer(GL_COPY_WRITE_BUFFER, 0)
+    if buffer is not None:
+        glDeleteBuffers(1, [buffer])
+    return new_buffer
+
+
+def resize_persistent_buffer(buffer, new_nbytes, copy_nbytes=0):
+    """
+    Same as resize_buffer, but the new buffer is created with immutable
+    storage (glBufferStorage) and stays persistently mapped for writing.
+    Requires OpenGL 4.4 or ARB_buffer_storage.
+
+    Returns:
+        (buffer, ptr), the id of the new buffer and the address of the
+        coherent mapping, which can be written with ctypes.memmove.
+    """
+    flags = GL_MAP_WRITE_BIT | GL_MAP_PERSISTENT_BIT | GL_MAP_COHERENT_BIT
+    new_buffer = glGenBuffers(1)
+    glBindBuffer(GL_COPY_WRITE_BUFFER, new_buffer)
+    glBufferStorage(GL_COPY_WRITE_BUFFER, new_nbytes, None, flags)
+    if copy_nbytes > 0 and buffer is not None:
+        glBindBuffer(GL_COPY_READ_BUFFER, buffer)
+        glCopyBufferSubData(GL_COPY_READ_BUFFER, GL_COPY_WRITE_BUFFER,
+                            0, 0, copy_nbytes)
+        glBindBuffer(GL_COPY_READ_BUFFER, 0)
+    ptr = glMapBufferRange(GL_COPY_WRITE_BUFFER, 0, new_nbytes, flags)
+    glBindBuffer(GL_COPY_WRITE_BUFFER, 0)
+    if buffer is not None:
+        glDeleteBuffers(1, [buffer])
+    return new_buffer, ptr
+
+
+class GLState:
+    """
+    A cache of the GL state used by the items: the capabilities, the blend
+    and depth functions, the bound program and vertex array, the line and
+    point sizes and the polygon mode. A call which does not change the
+    cached state is skipped.
+
+    The glwidget keeps one cache, and restores the default state through
+    it before every item, so the items don't need glPushAttrib/glPopAttrib.
+    The line and point sizes are not restored, the items set them before
+    drawing lines or points.
+    If the state is changed by other code (e.g. QPainter), call invalidate,
+    so the next calls are issued again.
+    """
+
+    def __init__(self):
+        self.state = {}
+        # the calls of the current frame, and of the last frame
+        self.issued = 0
+        self.skipped = 0
+        self.frame_issued = 0
+        self.frame_skipped = 0
+
+    def _set(self, key, value, func, *args):
+        if self.state.get(key) == value:
+            self.skipped += 1
+            return
+        func(*args)
+        self.state[key] = value
+        self.issued += 1
+
+    def enable(self, *caps):
+        for cap in caps:
+            self._set(int(cap), True, glEnable, cap)
+
+    def disable(self, *caps):
+        for cap in caps:
+            self._set(int(cap), False, glDisable, cap)
+
+    def blend_func(self, src, dst):
+        self._set('blend_func', (int(src), int(dst)), glBlendFunc, src, dst)
+
+    def depth_func(self, func):
+        self._set('depth_func', int(func), glDepthFunc, func)
+
+    def depth_mask(self, flag):
+        self._set('depth_mask', bool(flag), glDepthMask, flag)
+
+    def use_program(self, program):
+        self._set('program', int(program), glUseProgram, program)
+
+    def bind_vertex_array(self, vao):
+        self._set('vao', int(vao), glBindVertexArray, vao)
+
+    def line_width(self, width):
+        self._set('line_width', float(width), glLineWidth, width)
+
+    def point_size(self, size):
+        self._set('point_size', float(size), glPointSize, size)
+
+    def polygon_mode(self, mode):
+        self._set('polygon_mode', int(mode), glPolygonMode, GL_FRONT_AND_BACK, mode)
+
+    def restore_defaults(self):
+        """
+        Set the state an item expects when it starts to paint.
+        """
+        self.enable(GL_DEPTH_TEST)
+        self.disable(GL_BLEND, GL_CULL_FACE, GL_PROGRAM_POINT_SIZE, GL_POINT_SPRITE)
+        self.blend_func(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+        self.depth_func(GL_LESS)
+        self.depth_mask(GL_TRUE)
+        self.use_program(0)
+        self.bind_vertex_array(0)
+        self.polygon_mode(GL_FILL)
+
+    def invalidate(self):
+        """
+        Forget the cached state, the next calls are all issued.
+        """
+        self.state.clear()
+
+    def new_frame(self):
+        """
+        Keep the counts of the last frame and start a new one.
+        The cache is invalidated, as Qt may change the state between frames.
+        """
+        self.frame_issued = self.issued
+        self.frame_skipped = self.skipped
+        self.issued = 0
+        self.skipped = 0
+        self.invalidate()
@@ -4,7 +4,8 @@ Distributed under MIT license. See LICENSE for more information.
 """
 
 import numpy as np
-from OpenGL.GL import *
+# set_uniform was moved to gl_helper, kept here for the old imports
+from q3dviewer.utils.gl_helper import set_uniform
 
 
 def rainbow(scalars, scalar_min=0, scalar_max=255):
@@ -62,36 +63,3 @@ def text_to_rgba(color_text, flat=False):
         return falt_rgb
     else:
         return rgba
-    
-
-def set_uniform(shader, content, name):
-    location = glGetUniformLocation(shader, name)
-    if location == -1:
-        raise ValueError(
-            f"Uniform '{name}' not found in shader program {shader}.")
-
-    if isinstance(content, int):
-        glUniform1i(location, content)
-    elif isinstance(content, float):
-        glUniform1f(location, content)
-    elif isinstance(content, np.ndarray):
-        if content.ndim == 1:
-            if content.shape[0] == 2:
-                glUniform2f(location, *content)
-            elif content.shape[0] == 3:
-                glUniform3f(location, *content)
-            else:
-                raise ValueError(
-                    f"Unsupported 1D array size: {content.shape}.")
-        elif content.ndim == 2:
-            if content.shape == (4, 4):
-                glUniformMatrix4fv(location, 1, GL_FALSE,
-                                   content.T.astype(np.float32))
-            else:
-                raise ValueError(
-                    f"Unsupported 2D array size: {content.shape}.")
-        else:
-            raise ValueError(f"Unsupported array dimension: {content.ndim}.")
-    else:
-        raise TypeError(
-            f"Unsupported type for uniform '{name}': {type(content)}.")
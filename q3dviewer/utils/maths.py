@@ -158,6 +158,35 @@ def frustum(left, right, bottom, top, near, far):
     return matrix
 
 
+def frustum_planes(matrix):
+    """
+    Extract the 6 clipping planes (left, right, bottom, top, near, far)
+    from a projection @ view matrix (Gribb-Hartmann method).
+    Each plane is (a, b, c, d) with a normalized normal pointing inside,
+    so a point p is inside when a*x + b*y + c*z + d >= 0.
+    """
+    m = np.asarray(matrix, dtype=np.float64)
+    planes = np.array([m[3] + m[0], m[3] - m[0],
+                       m[3] + m[1], m[3] - m[1],
+                       m[3] + m[2], m[3] - m[2]])
+    planes /= np.linalg.norm(planes[:, :3], axis=1)[:, np.newaxis]
+    return planes
+
+
+def aabb_in_frustum(planes, bmin, bmax):
+    """
+    Test N axis aligned boxes against the frustum planes.
+    The test is conservative, boxes near the frustum corners may pass.
+    Returns a bool array, True if the box may be visible.
+    """
+    normals = planes[:, :3]
+    # the corner of each box furthest along each plane normal
+    corner = np.where(normals[np.newaxis] >= 0,
+                      bmax[:, np.newaxis], bmin[:, np.newaxis])
+    dist = np.einsum('npk,pk->np', corner, normals) + planes[:, 3]
+    return np.all(dist >= 0, axis=1)
+
+
 def euler_to_matrix(rpy):
     roll, pitch, yaw = rpy
     Rx = np.array([[1, 0, 0],
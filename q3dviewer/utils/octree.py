@@ -0,0 +1,217 @@
+"""
+Copyright 2024 Panasonic Advanced Technology Development Co.,Ltd. (Liu Yang)
+Distributed under MIT license. See LICENSE for more information.
+"""
+
+"""
+A level-of-detail octree for point clouds, similar to Potree.
+
+Every node holds a subsample of the points inside its cube: at most one
+point per cell of a (2^grid_bits)^3 grid laid over the node. A point taken
+by a node is not repeated by its children, so drawing a node and all its
+ancestors shows the cloud at the node's resolution.
+The points are reordered so that every node is a contiguous range, which
+lets us draw a cut of the tree with a single glMultiDrawArrays call.
+"""
+
+import numpy as np
+from q3dviewer.utils.maths import frustum_planes, aabb_in_frustum
+
+
+MORTON_BITS = 21  # bits per axis of a 64-bit morton code
+
+lod_node_type = [('first', '<i8'),  # first point of the node
+                 ('count', '<i8'),  # number of points of the node
+                 ('level', '<i4'),  # depth of the node, 0 for the root
+                 ('parent', '<i8'),  # index of the parent node, -1 for the root
+                 ('bmin', '<f4', (3,)),  # min corner of the node cube
+                 ('size', '<f4')]  # edge length of the node cube
+
+
+def part1by2(x):
+    # spread the lower 21 bits of x, so that there are 2 zero bits between each bit.
+    x = x.astype(np.uint64) & np.uint64(0x1fffff)
+    x = (x | (x << np.uint64(32))) & np.uint64(0x1f00000000ffff)
+    x = (x | (x << np.uint64(16))) & np.uint64(0x1f0000ff0000ff)
+    x = (x | (x << np.uint64(8))) & np.uint64(0x100f00f00f00f00f)
+    x = (x | (x << np.uint64(4))) & np.uint64(0x10c30c30c30c30c3)
+    x = (x | (x << np.uint64(2))) & np.uint64(0x1249249249249249)
+    return x
+
+
+def compact1by2(x):
+    # inverse of part1by2
+    x = x.astype(np.uint64) & np.uint64(0x1249249249249249)
+    x = (x ^ (x >> np.uint64(2))) & np.uint64(0x10c30c30c30c30c3)
+    x = (x ^ (x >> np.uint64(4))) & np.uint64(0x100f00f00f00f00f)
+    x = (x ^ (x >> np.uint64(8))) & np.uint64(0x1f0000ff0000ff)
+    x = (x ^ (x >> np.uint64(16))) & np.uint64(0x1f00000000ffff)
+    x = (x ^ (x >> np.uint64(32))) & np.uint64(0x1fffff)
+    return x
+
+
+def morton_encode(ijk):
+    return part1by2(ijk[:, 0]) | (part1by2(ijk[:, 1]) << np.uint64(1)) | \
+        (part1by2(ijk[:, 2]) << np.uint64(2))
+
+
+def morton_decode(code):
+    code = code.astype(np.uint64)
+    return np.stack([compact1by2(code),
+                     compact1by2(code >> np.uint64(1)),
+                     compact1by2(code >> np.uint64(2))], axis=1).astype(np.int64)
+
+
+def build_lod(xyz, grid_bits=7, max_depth=14, seed=0):
+    """
+    Build a LOD octree of the points.
+    Args:
+        xyz: (N, 3) point positions.
+        grid_bits: each node keeps at most one point per cell of a
+            (2^grid_bits)^3 grid.
+        max_depth: the maximum depth of the tree, the leaf nodes keep all
+            the remaining points.
+    Returns:
+        index: (N,) the new order of the points, node ranges refer to
+            the reordered points. Points with nan/inf positions are moved
+            to the end and do not belong to any node.
+        nodes: the node table (lod_node_type), sorted by level.
+    """
+    xyz = np.asarray(xyz)
+    finite = np.flatnonzero(np.isfinite(xyz).all(axis=1))
+    if finite.shape[0] == 0:
+        return np.arange(xyz.shape[0]), np.empty((0), lod_node_type)
+    pts = xyz[finite].astype(np.float64)
+    bmin = pts.min(axis=0)
+    size = max(float((pts.max(axis=0) - bmin).max()), 1e-6)
+    # quantize the points to the finest morton grid of the root cube
+    res = 1 << MORTON_BITS
+    ijk = np.clip(((pts - bmin) / size * res).astype(np.int64), 0, res - 1)
+    codes = morton_encode(ijk)
+    del pts, ijk
+    order = np.argsort(codes, kind='stable')
+    codes = codes[order]
+    order = finite[order]
+
+    depth = min(max_depth, MORTON_BITS - grid_bits)
+    rng = np.random.default_rng(seed)
+    remaining = np.arange(codes.shape[0])
+    chosen_list = []
+    node_list = []
+    num_nodes = 0
+    num_points = 0
+    prev_keys = None
+    for level in range(depth + 1):
+        if remaining.shape[0] == 0:
+            break
+        if level == depth:
+            chosen = remaining
+            remaining = remaining[:0]
+        else:
+            # take a random point from each sampling cell of this level.
+            # the points are sorted by morton code, so each cell is a run.
+            cells = codes[remaining] >> np.uint64(
+                3 * (MORTON_BITS - grid_bits - level))
+            starts = np.flatnonzero(np.r_[True, cells[1:] != cells[:-1]])
+            lengths = np.diff(np.r_[starts, remaining.shape[0]])
+            pick = starts + (rng.random(starts.shape[0]) * lengths).astype(np.int64)
+            chosen = remaining[pick]
+            mask = np.ones(remaining.shape[0], dtype=bool)
+            mask[pick] = False
+            remaining = remaining[mask]
+        # chosen is sorted by morton code, so each node is a run as well.
+        keys = codes[chosen] >> np.uint64(3 * (MORTON_BITS - level))
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        counts = np.diff(np.r_[starts, chosen.shape[0]])
+        node_keys = keys[starts]
+        # shuffle the points inside each node, so any prefix of a node is
+        # an uniform subsample of it.
+        node_ids = np.repeat(np.arange(starts.shape[0]), counts)
+        chosen = chosen[np.lexsort((rng.random(chosen.shape[0]), node_ids))]
+
+        nodes = np.empty((node_keys.shape[0]), lod_node_type)
+        nodes['first'] = num_points + starts
+        nodes['count'] = counts
+        nodes['level'] = level
+        if level == 0:
+            nodes['parent'] = -1
+        else:
+            # the parent always exists, it sampled a point from the same region.
+            nodes['parent'] = num_nodes - prev_keys.shape[0] + \
+                np.searchsorted(prev_keys, node_keys >> np.uint64(3))
+        node_size = size / (1 << level)
+        nodes['bmin'] = bmin + morton_decode(node_keys) * node_size
+        nodes['size'] = node_size
+
+        chosen_list.append(chosen)
+        node_list.append(nodes)
+        num_nodes += nodes.shape[0]
+        num_points += chosen.shape[0]
+        prev_keys = node_keys
+
+    index = order[np.concatenate(chosen_list)]
+    if finite.shape[0] != xyz.shape[0]:
+        invalid = np.ones(xyz.shape[0], dtype=bool)
+        invalid[finite] = False
+        index = np.concatenate([index, np.flatnonzero(invalid)])
+    return index, np.concatenate(node_list)
+
+
+def select_lod_nodes(nodes, view_matrix, projection_matrix, width,
+                     point_budget, spacing=1.0, grid_bits=7):
+    """
+    Select the nodes to draw for the current camera.
+    A node is drawn if it is in the view frustum, its parent is drawn and its
+    parent's point spacing on the screen is larger than `spacing` pixels.
+    If the selected nodes exceed `point_budget` points, the nodes with the
+    larger projected size are drawn first.
+    Returns:
+        first, count: int32 arrays of the point ranges for glMultiDrawArrays.
+    """
+    if nodes.shape[0] == 0:
+        return np.empty((0), np.int32), np.empty((0), np.int32)
+    bmin = nodes['bmin']
+    size = nodes['size']
+    level = nodes['level']
+    planes = frustum_planes(projection_matrix @ view_matrix)
+    visible = aabb_in_frustum(planes, bmin, bmin + size[:, np.newaxis])
+
+    cam_pos = -view_matrix[:3, :3].T @ view_matrix[:3, 3]
+    center = bmin + size[:, np.newaxis] / 2
+    dist = np.linalg.norm(center - cam_pos, axis=1) - size * 0.866
+    focal = projection_matrix[0, 0] * width / 2
+    # projected size of the node in pixels, inf if the camera is inside it.
+    projected = focal * size / np.maximum(dist, 1e-6)
+    accept = visible & ((level == 0) |
+                        (projected * 2 / (1 << grid_bits) > spacing))
+    for lv in range(1, int(level.max()) + 1):
+        idx = np.flatnonzero(level == lv)
+        accept[idx] &= accept[nodes['parent'][idx]]
+
+    idx = np.flatnonzero(accept)
+    # larger nodes on the screen first, a parent is never smaller than its child.
+    idx = idx[np.lexsort((level[idx], -projected[idx]))]
+    count = nodes['count'][idx]
+    total = np.cumsum(count)
+    # the node crossing the budget is drawn partially, the points inside
+    # a node are shuffled, so its prefix is still a uniform subsample.
+    num = min(np.searchsorted(total, point_budget, side='left') + 1,
+              idx.shape[0])
+    idx = idx[:num]
+    count = count[:num].copy()
+    if num > 0:
+        count[-1] -= max(total[num - 1] - point_budget, 0)
+    first = nodes['first'][idx]
+    keep = count > 0
+    first = first[keep]
+    count = count[keep]
+    if first.shape[0] == 0:
+        return np.empty((0), np.int32), np.empty((0), np.int32)
+
+    # merge contiguous ranges to reduce the draw count
+    order = np.argsort(first)
+    first = first[order]
+    count = count[order]
+    breaks = np.flatnonzero(np.r_[True, first[1:] != (first + count)[:-1]])
+    merged_count = np.add.reduceat(count, breaks)
+    return first[breaks].astype(np.int32), merged_count.astype(np.int32)
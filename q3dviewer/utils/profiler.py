@@ -0,0 +1,206 @@
+"""
+Copyright 2024 Panasonic Advanced Technology Development Co.,Ltd. (Liu Yang)
+Distributed under MIT license. See LICENSE for more information.
+"""
+
+import csv
+import json
+import time
+import ctypes
+import numpy as np
+from collections import deque
+from OpenGL.GL import *
+# the wrapped glGetQueryObjectui64v fails to make its output (GLuint64)
+from OpenGL.raw.GL.VERSION.GL_3_3 import glGetQueryObjectui64v
+
+
+class FrameProfiler:
+    """
+    Where the time of a frame goes, item by item:
+     - cpu_ms: the time of item.paint() on the CPU.
+     - gpu_ms: the time of its commands on the GPU (GL_TIME_ELAPSED).
+     - draws, dispatches, upload_bytes: counted by the items
+       (count_draw, count_dispatch, count_upload).
+    The queries are double buffered: the results of a frame are read two
+    frames later, so the CPU never waits for the GPU. A result which is
+    still not ready is dropped (gpu_ms is None).
+
+    The records of the last frames are kept for the overlay and dump().
+    When disabled, the counters return at once.
+
+    Attributes:
+        enabled: bool, profile the frames
+        overlay: bool, show the last frame on the glwidget
+        frames: the records of the last frames
+    """
+    FIELDS = ['frame', 'item', 'cpu_ms', 'gpu_ms', 'draws', 'dispatches',
+              'upload_bytes', 'state_calls']
+
+    def __init__(self, enabled=False, overlay=True, history=600):
+        self.enabled = enabled
+        self.overlay = overlay
+        self.frames = deque(maxlen=history)
+        self.frame_id = 0
+        self.record = None
+        self.item_record = None
+        self.t_frame = 0
+        self.t_item = 0
+        # the queries of the even and odd frames, and the (frame, item, query)
+        # waiting for their results
+        self.queries = [[], []]
+        self.pending = [[], []]
+        self.gpu_timer = None
+
+    @staticmethod
+    def new_record(**kwds):
+        record = {'cpu_ms': 0., 'gpu_ms': None, 'draws': 0,
+                  'dispatches': 0, 'upload_bytes': 0}
+        record.update(kwds)
+        return record
+
+    def begin_frame(self):
+        if not self.enabled:
+            return
+        if self.gpu_timer is None:
+            # GL_TIME_ELAPSED needs GL 3.3 (or ARB_timer_query)
+            try:
+                self.gpu_timer = glGetQueryiv(GL_TIME_ELAPSED, GL_QUERY_COUNTER_BITS) > 0
+            except Exception:
+                self.gpu_timer = False
+            if not self.gpu_timer:
+                print("[Profiler] GL_TIME_ELAPSED is not supported, only cpu time is profiled.")
+        self.read_queries(self.frame_id % 2)
+        self.record = self.new_record(frame=self.frame_id, time=time.time(),
+                                      items=[], state_calls=0, gpu_ready=False)
+        self.t_frame = time.perf_counter()
+
+    def read_queries(self, parity):
+        elapsed = ctypes.c_uint64(0)
+        for frame, item, query in self.pending[parity]:
+            if glGetQueryObjectiv(query, GL_QUERY_RESULT_AVAILABLE):
+                glGetQueryObjectui64v(query, GL_QUERY_RESULT, ctypes.byref(elapsed))
+                item['gpu_ms'] = elapsed.value / 1e6
+                frame['gpu_ms'] = (frame['gpu_ms'] or 0.) + item['gpu_ms']
+            frame['gpu_ready'] = True
+        self.pending[parity] = []
+
+    def begin_item(self, name):
+        if not self.enabled:
+            return
+        self.item_record = self.new_record(name=name)
+        self.record['items'].append(self.item_record)
+        if self.gpu_timer:
+            parity = self.frame_id % 2
+            queries = self.queries[parity]
+            i = len(self.pending[parity])
+            if i == len(queries):
+                queries.append(int(np.ravel(glGenQueries(1))[0]))
+            glBeginQuery(GL_TIME_ELAPSED, queries[i])
+            self.pending[parity].append((self.record, self.item_record, queries[i]))
+        self.t_item = time.perf_counter()
+
+    def end_item(self):
+        if not self.enabled:
+            return
+        self.item_record['cpu_ms'] = (time.perf_counter() - self.t_item) * 1e3
+        if self.gpu_timer:
+            glEndQuery(GL_TIME_ELAPSED)
+        self.item_record = None
+
+    def end_frame(self, state_calls=0):
+        if not self.enabled:
+            return
+        record = self.record
+        record['cpu_ms'] = (time.perf_counter() - self.t_frame) * 1e3
+        record['state_calls'] = state_calls
+        if not self.gpu_timer:
+            record['gpu_ready'] = True
+        self.frames.append(record)
+        self.record = None
+        self.frame_id += 1
+
+    def count(self, key, n):
+        if self.record is None:
+            return
+        self.record[key] += n
+        if self.item_record is not None:
+            self.item_record[key] += n
+
+    def count_draw(self, n=1):
+        """
+        Count the draw calls of the painted item.
+        """
+        if self.enabled:
+            self.count('draws', n)
+
+    def count_dispatch(self, n=1):
+        """
+        Count the compute dispatches of the painted item (e.g. a gpu sort).
+        """
+        if self.enabled:
+            self.count('dispatches', n)
+
+    def count_upload(self, nbytes):
+        """
+        Count the bytes uploaded to the gpu in the frame.
+        """
+        if self.enabled:
+            self.count('upload_bytes', int(nbytes))
+
+    def last_frame(self):
+        """
+        The record of the last frame with the gpu times, or None.
+        """
+        for record in reversed(self.frames):
+            if record['gpu_ready']:
+                return record
+        return None
+
+    def summary(self):
+        """
+        The last frame as text, one line per item.
+        """
+        record = self.last_frame()
+        if record is None:
+            return ''
+
+        def line(name, r):
+            gpu = '-' if r['gpu_ms'] is None else '%.2f' % r['gpu_ms']
+            return '%-16s cpu %6.2f ms  gpu %6s ms  draws %4d  dispatch %4d  upload %s' % (
+                name[:16], r['cpu_ms'], gpu, r['draws'], r['dispatches'],
+                format_bytes(r['upload_bytes']))
+        lines = [line('frame %d' % record['frame'], record)]
+        lines += [line(item['name'], item) for item in record['items']]
+        lines.append('state calls %d' % record['state_calls'])
+        return '\n'.join(lines)
+
+    def dump(self, path):
+        """
+        Save the kept frames as json (a record per frame) or csv (a row per
+        item, and a row named 'frame' for the whole frame).
+        """
+        frames = list(self.frames)
+        if path.endswith('.csv'):
+            with open(path, 'w', newline='') as f:
+                writer = csv.DictWriter(f, self.FIELDS, extrasaction='ignore')
+                writer.writeheader()
+                for record in frames:
+                    writer.writerow(dict(record, item='frame'))
+                    for item in record['items']:
+                        writer.writerow(dict(item, frame=record['frame'],
+                                             item=item['name'],
+                                             state_calls=''))
+        else:
+            with open(path, 'w') as f:
+                json.dump(frames, f, indent=1)
+        print("[Profiler] Saved %d frames to %s" % (len(frames), path))
+
+
+def format_bytes(nbytes):
+    if nbytes < 1024:
+        return '%d B' % nbytes
+    for unit in ['KB', 'MB', 'GB']:
+        nbytes /= 1024
+        if nbytes < 1024:
+            break
+    return '%.1f %s' % (nbytes, unit)
@@ -6,6 +6,7 @@ Distributed under MIT license. See LICENSE for more information.
 
 from q3dviewer.glwidget import *
 import signal
+from q3dviewer.Qt import Q3D_CONTINUOUS, Q3D_PROFILE
 from q3dviewer.Qt.QtWidgets import QMainWindow, QApplication, QHBoxLayout
 
 
@@ -14,14 +15,50 @@ def handler(signal, frame):
     print("Force close by Ctrl+C")
 
 
+class RedrawOnInput(QtCore.QObject):
+    """
+    Request a redraw of the glwidget on the user input to the glwidget and
+    the setting window (the setters of the items request their own redraw).
+    A mouse move without any button held is not an input.
+    """
+    INPUT_EVENTS = {QtCore.QEvent.MouseButtonPress, QtCore.QEvent.MouseButtonRelease,
+                    QtCore.QEvent.MouseButtonDblClick, QtCore.QEvent.MouseMove,
+                    QtCore.QEvent.Wheel, QtCore.QEvent.KeyPress, QtCore.QEvent.KeyRelease}
+
+    def __init__(self, glwidget):
+        super().__init__()
+        self.glwidget = glwidget
+
+    def eventFilter(self, obj, event):
+        if event.type() in self.INPUT_EVENTS:
+            if event.type() == QtCore.QEvent.MouseMove and \
+                    event.buttons() == QtCore.Qt.NoButton:
+                return False
+            self.glwidget.request_redraw()
+        return False
+
+
 class Viewer(QMainWindow):
     def __init__(self, name='Viewer', win_size=[1920, 1080], 
-                 gl_widget_class=GLWidget, update_interval=20):
+                 gl_widget_class=GLWidget, update_interval=20, continuous=None):
+        """
+        Args:
+            update_interval: the period of the update timer in milliseconds.
+                The scene is painted only when it is changed, unless continuous.
+            continuous: paint at every update, e.g. for profiling.
+                The default is set by the Q3D_CONTINUOUS environment variable.
+        """
         self.set_quit_handler(handler)
         super(Viewer, self).__init__()
         self.setGeometry(0, 0, win_size[0], win_size[1])
         self.gl_widget_class = gl_widget_class
         self.init_ui()
+        if continuous is None:
+            continuous = Q3D_CONTINUOUS is not None
+        self.glwidget.set_continuous(continuous)
+        self.input_filter = RedrawOnInput(self.glwidget)
+        self.glwidget.installEventFilter(self.input_filter)
+        self.glwidget.setting_window.installEventFilter(self.input_filter)
         self.update_interval = update_interval
         self.add_update_timer()
         self.setWindowTitle(name)
@@ -71,10 +108,15 @@ class Viewer(QMainWindow):
             return None
 
     def update(self):
-        # force update by timer
+        # called by the timer, the glwidget paints only if the scene is changed.
         self.glwidget.update()
 
     def closeEvent(self, event):
+        self.glwidget.removeEventFilter(self.input_filter)
+        self.glwidget.setting_window.removeEventFilter(self.input_filter)
+        # Q3D_PROFILE=profile.json (or .csv) saves the profiled frames
+        if Q3D_PROFILE is not None and Q3D_PROFILE.endswith(('.json', '.csv')):
+            self.glwidget.profiler.dump(Q3D_PROFILE)
         event.accept()
         QApplication.quit()
 
@@ -24,6 +24,7 @@ setup(
         'PyOpenGL',
         'meshio',
         'pypcd4',
+        'python-lzf',
         'pye57',
         'laspy',
         'imageio',